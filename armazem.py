@@ -0,0 +1,245 @@
+import sys
+import math
+from array import array
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timedelta
+
+# Campos de texto guardados em listas paralelas; os de poucos valores distintos são internados
+# (todos os eventos do mesmo bairro apontam para a mesma string)
+CAMPOS_TEXTO = ('id', 'titulo', 'endereco', 'data', 'descricao', 'link_ingresso')
+CAMPOS_INTERNADOS = ('local', 'categoria', 'categoria_display')
+# Um bit por flag, na ordem da tupla
+FLAGS = ('is_kids', 'is_lgbt', 'is_pet', 'is_ensaio')
+
+SEM_DATA = 2 ** 63 - 1          # evento sem data: vai para o fim na ordenação, como datetime.max
+SEM_TAMANHO = -128
+_EPOCA = datetime(1970, 1, 1)
+_UM_US = timedelta(microseconds=1)
+
+
+def em_us(dt):
+    """datetime (sem fuso) -> microssegundos desde 1970, contando como se fosse UTC"""
+    return (dt - _EPOCA) // _UM_US
+
+
+def de_us(us):
+    return _EPOCA + timedelta(microseconds=us)
+
+
+class Evento(Mapping):
+    """
+    Visão somente leitura de um evento do EventStore, com a mesma interface de um dict
+    (e['titulo'], e.get(...), dict(e), atributos no Jinja). Não guarda nada além do índice.
+    """
+    __slots__ = ('_store', '_i')
+
+    def __init__(self, store, i):
+        self._store = store
+        self._i = i
+
+    def __getitem__(self, campo):
+        return self._store.valor(self._i, campo)
+
+    def __iter__(self):
+        return iter(self._store.chaves(self._i))
+
+    def __len__(self):
+        return len(self._store.chaves(self._i))
+
+    def __repr__(self):
+        return f"Evento({dict(self)!r})"
+
+
+class Coordenadas(Sequence):
+    """(lat, lon) de cada evento direto dos arrays do store (None onde não há coordenada)"""
+    __slots__ = ('_lat', '_lon')
+
+    def __init__(self, lat, lon):
+        self._lat = lat
+        self._lon = lon
+
+    def __getitem__(self, i):
+        lat = self._lat[i]; lon = self._lon[i]
+        return (None if lat != lat else lat), (None if lon != lon else lon)
+
+    def __len__(self):
+        return len(self._lat)
+
+
+class EventStore:
+    """
+    Eventos brutos em colunas paralelas, em vez de uma lista de dicts de ~17 chaves:
+    - textos em listas (bairro e categoria internados);
+    - data de início em microssegundos (array de int64), lat/lon em arrays de double
+      (NaN = sem coordenada), tamanho em um array de bytes e as flags is_* em bits;
+    - a "forma" de cada evento (a tupla de chaves, que muda entre blocos e ensaios),
+      para que a visão devolva exatamente as chaves e a ordem do JSON original.
+    Valores que não cabem na coluna (um tamanho em texto, uma data fora do padrão,
+    um campo desconhecido) ficam num dict esparso por evento e são devolvidos como vieram.
+    Os dicts só são montados na borda (JSON e templates), a partir das visões Evento.
+    """
+
+    def __init__(self, eventos=()):
+        self._montar([], array('H'), {c: [] for c in CAMPOS_TEXTO + CAMPOS_INTERNADOS}, array('q'),
+                     array('d'), array('d'), array('b'), array('B'), [], {})
+        for e in eventos: self.adicionar(e)
+
+    @classmethod
+    def de_colunas(cls, formas, forma, textos, inicio, lat, lon, tamanho, flags, busca, extras, indice_busca=None):
+        """
+        Store sobre colunas já prontas, como as memoryviews de um arquivo mapeado (mapeado.py).
+        Qualquer sequência indexável serve; um store assim é só de leitura.
+        """
+        store = cls.__new__(cls)
+        store._montar(formas, forma, textos, inicio, lat, lon, tamanho, flags, busca, extras)
+        store.indice_busca = indice_busca
+        return store
+
+    def _montar(self, formas, forma, textos, inicio, lat, lon, tamanho, flags, busca, extras):
+        self.formas = []                # tuplas de chaves
+        self._campos_forma = []         # as mesmas, como frozenset (para o `in`)
+        self._desconhecidos = []        # campos de cada forma sem coluna própria (vão para `extras`)
+        self._indice_forma = {}         # tupla de chaves do evento (com as internas '_') -> forma
+        self.forma = forma
+        self.textos = textos
+        self.inicio = inicio
+        self.lat = lat
+        self.lon = lon
+        self.tamanho = tamanho
+        self.flags = flags
+        self.busca = busca              # texto de busca já normalizado (vem do snapshot da ingestão) ou None
+        self.extras = extras            # índice -> {campo: valor original}
+        self.indice_busca = None        # SearchIndex pronto (store mapeado); senão o FilterIndex monta um
+
+        self._leitores = {c: coluna.__getitem__ for c, coluna in self.textos.items()}
+        self._leitores.update({'dt_iso': self._ler_dt_iso, 'lat': self._ler_lat, 'lon': self._ler_lon,
+                               'tamanho': self._ler_tamanho})
+        for bit, flag in enumerate(FLAGS):
+            self._leitores[flag] = lambda i, mascara=1 << bit: bool(self.flags[i] & mascara)
+        for chaves in formas: self._id_forma(tuple(chaves))
+
+    def __len__(self):
+        return len(self.forma)
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self.forma): raise IndexError(i)
+        return Evento(self, i)
+
+    def __iter__(self):
+        return (Evento(self, i) for i in range(len(self.forma)))
+
+    def _id_forma(self, chaves):
+        forma = self._indice_forma.get(chaves)
+        if forma is None:
+            publicas = tuple(k for k in chaves if not k.startswith('_'))
+            forma = self.formas.index(publicas) if publicas in self.formas else len(self.formas)
+            if forma == len(self.formas):
+                self.formas.append(publicas)
+                self._campos_forma.append(frozenset(publicas))
+                self._desconhecidos.append(tuple(k for k in publicas if k not in self._leitores))
+            self._indice_forma[chaves] = forma
+        return forma
+
+    def adicionar(self, e):
+        """Acrescenta um evento (dict ou Evento). Chaves começando com '_' são internas e não viram campo."""
+        i = len(self.forma)
+        extras = {}
+        forma = self._id_forma(tuple(e))
+        self.forma.append(forma)
+
+        for campo, coluna in self.textos.items():
+            valor = e.get(campo)
+            if campo in CAMPOS_INTERNADOS and type(valor) is str: valor = sys.intern(valor)
+            coluna.append(valor)
+
+        dt_iso = e.get('dt_iso')
+        inicio = SEM_DATA
+        if dt_iso is not None:
+            try:
+                dt = e.get('_dt_obj') or datetime.fromisoformat(dt_iso)
+                if dt.tzinfo is None: inicio = em_us(dt)
+                if inicio == SEM_DATA or dt.isoformat() != dt_iso: extras['dt_iso'] = dt_iso
+            except (TypeError, ValueError):
+                extras['dt_iso'] = dt_iso
+        self.inicio.append(inicio)
+
+        for campo, coluna in (('lat', self.lat), ('lon', self.lon)):
+            valor = e.get(campo)
+            if valor is None: coluna.append(math.nan)
+            elif type(valor) is float and valor == valor: coluna.append(valor)
+            else:
+                # Ex.: um inteiro: o índice espacial usa o número, a saída devolve o valor como veio
+                coluna.append(float(valor) if type(valor) is int else math.nan)
+                extras[campo] = valor
+
+        tamanho = e.get('tamanho')
+        if tamanho is None: self.tamanho.append(SEM_TAMANHO)
+        elif type(tamanho) is int and SEM_TAMANHO < tamanho < 128: self.tamanho.append(tamanho)
+        else:
+            self.tamanho.append(SEM_TAMANHO)
+            extras['tamanho'] = tamanho
+
+        bits = 0
+        for bit, flag in enumerate(FLAGS):
+            valor = e.get(flag, False)
+            if valor is True: bits |= 1 << bit
+            elif valor is not False: extras[flag] = valor
+        self.flags.append(bits)
+
+        self.busca.append(e.get('_busca'))
+        for campo in self._desconhecidos[forma]: extras[campo] = e[campo]
+        if extras: self.extras[i] = extras
+
+    @classmethod
+    def juntar(cls, stores):
+        """Um store com os eventos de todos, na ordem (sem remontar evento por evento)"""
+        novo = cls()
+        for store in stores:
+            base = len(novo)
+            mapa = [novo._id_forma(chaves) for chaves in store.formas]
+            novo.forma.extend(mapa[f] for f in store.forma)
+            for campo, coluna in novo.textos.items(): coluna.extend(store.textos[campo])
+            for nome in ('inicio', 'lat', 'lon', 'tamanho', 'flags', 'busca'):
+                getattr(novo, nome).extend(getattr(store, nome))
+            for i, extras in store.extras.items(): novo.extras[base + i] = extras
+        return novo
+
+    # --- Leitura ---
+    def chaves(self, i):
+        return self.formas[self.forma[i]]
+
+    def valor(self, i, campo):
+        if campo not in self._campos_forma[self.forma[i]]: raise KeyError(campo)
+        extras = self.extras.get(i)
+        if extras is not None and campo in extras: return extras[campo]
+        return self._leitores[campo](i)
+
+    def get(self, i, campo, padrao=None):
+        try:
+            return self.valor(i, campo)
+        except KeyError:
+            return padrao
+
+    def dt(self, i):
+        """Data de início como datetime, ou None"""
+        inicio = self.inicio[i]
+        return None if inicio == SEM_DATA else de_us(inicio)
+
+    def coordenadas(self):
+        return Coordenadas(self.lat, self.lon)
+
+    def _ler_dt_iso(self, i):
+        dt = self.dt(i)
+        return None if dt is None else dt.isoformat()
+
+    def _ler_lat(self, i):
+        lat = self.lat[i]
+        return None if lat != lat else lat
+
+    def _ler_lon(self, i):
+        lon = self.lon[i]
+        return None if lon != lon else lon
+
+    def _ler_tamanho(self, i):
+        tamanho = self.tamanho[i]
+        return None if tamanho == SEM_TAMANHO else tamanho
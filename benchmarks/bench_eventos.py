@@ -0,0 +1,154 @@
+"""
+Representação dos eventos em memória: lista de dicts (um dict bruto com _dt_obj + a cópia
+com status do snapshot, como era) x EventStore em colunas com visões EventoStatus.
+Os índices (FilterIndex) ficam de fora: são os mesmos nas duas representações.
+
+Cada representação roda num processo separado; a memória é a alocada pelos eventos
+(tracemalloc) e o pico de RSS do processo. A vazão é de filtros por varredura
+(bairro + dia + flag) seguidos da serialização da primeira página em JSON.
+
+    python benchmarks/bench_eventos.py --eventos 1000 10000 100000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import subprocess
+import tracemalloc
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+BAIRROS = [f'Bairro {i}' for i in range(60)]
+ESTILOS = ['Samba', 'Axé', 'Rock', 'Marchinha', 'Funk', 'Pagode/Samba', 'Ensaio']
+PAGINA = 60
+
+
+def gerar_eventos(n, semente=1):
+    """Eventos no formato de eventos.json / ensaios.json (1 em cada 5 é ensaio, com chaves a mais)"""
+    aleatorio = random.Random(semente)
+    inicio = datetime(2026, 1, 10, 8)
+    eventos = []
+    for i in range(n):
+        dt = inicio + timedelta(hours=aleatorio.randrange(0, 24 * 45))
+        categoria = aleatorio.choice(ESTILOS)
+        e = {
+            'id': f'{aleatorio.getrandbits(63):x}', 'titulo': f'Bloco {i}', 'local': aleatorio.choice(BAIRROS),
+            'endereco': f'Rua {i % 700}, {i % 97}', 'data': dt.strftime('%d/%m - %H:%M'), 'dt_iso': dt.isoformat(),
+            'categoria': categoria, 'categoria_display': categoria, 'descricao': '', 'tamanho': aleatorio.randint(1, 3),
+            'lat': -19.9 + aleatorio.random() / 10, 'lon': -43.9 - aleatorio.random() / 10,
+            'is_kids': aleatorio.random() < .1, 'is_lgbt': aleatorio.random() < .1, 'is_pet': aleatorio.random() < .1,
+        }
+        if i % 5 == 0: e.update(link_ingresso='', is_ensaio=True)
+        eventos.append(e)
+    return eventos
+
+
+def _consultas(n=200):
+    aleatorio = random.Random(7)
+    return [(aleatorio.choice(BAIRROS), datetime(2026, 1, 10).date() + timedelta(days=aleatorio.randrange(45)),
+             aleatorio.choice(('is_kids', 'is_lgbt', 'is_pet'))) for _ in range(n)]
+
+
+def montar_dicts(brutos):
+    from snapshot import STATUS_INFO, calcular_status
+    now = datetime(2026, 2, 14, 15)
+    eventos = [dict(e) for e in brutos]
+    for e in eventos: e['_dt_obj'] = datetime.fromisoformat(e['dt_iso'])
+    copias = []
+    for e in eventos:
+        st = calcular_status(e['_dt_obj'], now)
+        c = e.copy(); c['status'] = st; c['status_label'], c['sort_weight'] = STATUS_INFO[st]
+        copias.append(c)
+    return eventos, copias
+
+
+def filtrar_dicts(dados, bairro, dia, flag):
+    _, copias = dados
+    return [e for e in copias if e['local'] == bairro and e['_dt_obj'].date() == dia and e[flag]]
+
+
+def serializar_dicts(eventos):
+    return json.dumps([{k: v for k, v in e.items() if not k.startswith('_')} for e in eventos[:PAGINA]])
+
+
+def montar_store(brutos):
+    from armazem import EventStore
+    from snapshot import EventoStatus, calcular_status
+    now = datetime(2026, 2, 14, 15)
+    store = EventStore(dict(e) for e in brutos)
+    return store, [EventoStatus(store, i, calcular_status(store.dt(i), now)) for i in range(len(store))]
+
+
+def filtrar_store(dados, bairro, dia, flag):
+    from armazem import FLAGS, em_us
+    store, visoes = dados
+    locais, inicio, flags = store.textos['local'], store.inicio, store.flags
+    mascara = 1 << FLAGS.index(flag)
+    de = em_us(datetime.combine(dia, datetime.min.time())); ate = de + 86400 * 10 ** 6
+    return [visoes[i] for i in range(len(store)) if locais[i] == bairro and de <= inicio[i] < ate and flags[i] & mascara]
+
+
+def serializar_store(eventos):
+    return json.dumps([dict(e) for e in eventos[:PAGINA]])
+
+
+MODOS = {
+    'dicts': (montar_dicts, filtrar_dicts, serializar_dicts),
+    'store': (montar_store, filtrar_store, serializar_store),
+}
+
+
+def _medir(modo, n):
+    montar, filtrar, serializar = MODOS[modo]
+    brutos = gerar_eventos(n)
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    dados = montar(brutos)
+    tempo_carga = time.perf_counter() - inicio
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del brutos
+
+    consultas = _consultas()
+    inicio = time.perf_counter()
+    encontrados = 0
+    for bairro, dia, flag in consultas:
+        eventos = filtrar(dados, bairro, dia, flag)
+        encontrados += len(eventos)
+        serializar(eventos)
+    tempo = time.perf_counter() - inicio
+
+    pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss     # KB no Linux
+    print(json.dumps({'modo': modo, 'eventos': n, 'memoria_mb': round(memoria / 1024 / 1024, 2),
+                      'carga_s': round(tempo_carga, 3), 'consultas_s': round(len(consultas) / tempo, 1),
+                      'encontrados': encontrados, 'pico_rss_mb': round(pico_kb / 1024, 1)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--eventos', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--medir', nargs=2, metavar=('MODO', 'N'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        _medir(args.medir[0], int(args.medir[1]))
+        return
+
+    print(f"{'eventos':>8} {'modo':>6} {'memória':>10} {'carga':>8} {'consultas/s':>12} {'pico RSS':>10} {'achados':>8}")
+    for n in args.eventos:
+        for modo in MODOS:
+            saida = subprocess.run([sys.executable, __file__, '--medir', modo, str(n)],
+                                   capture_output=True, text=True, check=True).stdout
+            r = json.loads(saida)
+            print(f"{n:>8} {modo:>6} {r['memoria_mb']:>8.2f}MB {r['carga_s']:>7.3f}s {r['consultas_s']:>12.1f} "
+                  f"{r['pico_rss_mb']:>8.1f}MB {r['encontrados']:>8}")
+
+
+if __name__ == '__main__':
+    main()
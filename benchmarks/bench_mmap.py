@@ -0,0 +1,88 @@
+"""
+Memória e tempo de carga com vários workers: cada um montando o próprio EventStore a partir
+dos JSON x todos mapeando o mesmo arquivo (SHARED_SNAPSHOT_FILE, mapeado.py).
+
+Os workers são processos separados rodando ao mesmo tempo sobre a mesma pasta de dados.
+A memória é o PSS (páginas compartilhadas divididas entre os processos), lido de
+/proc/self/smaps_rollup, depois da carga e do primeiro snapshot de status.
+
+    python benchmarks/bench_mmap.py --eventos 10000 50000 --workers 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def _pss_mb():
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for linha in f:
+                if linha.startswith('Pss:'): return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _medir():
+    """Roda dentro de um worker: carrega os dados como o app faria e fica esperando o sinal para sair"""
+    import main
+    inicio = time.perf_counter()
+    main.fetch_carnival_data()
+    tempo = time.perf_counter() - inicio
+    print(json.dumps({'carga_s': round(tempo, 3)}), flush=True)
+    sys.stdin.readline()        # todos vivos ao mesmo tempo na hora de medir o PSS
+    print(json.dumps({'pss_mb': _pss_mb()}), flush=True)
+
+
+def _rodar(pasta, workers, compartilhado):
+    env = dict(os.environ, VOTE_STORE='sqlite', SQLITE_PATH=os.path.join(pasta, 'votos.db'),
+               SHARED_SNAPSHOT_FILE='dados.mmap' if compartilhado else '', PYTHONPATH=RAIZ)
+    for nome in ('dados.mmap', 'dados.mmap.lock'):
+        if os.path.exists(os.path.join(pasta, nome)): os.remove(os.path.join(pasta, nome))
+
+    processos = [subprocess.Popen([sys.executable, os.path.abspath(__file__), '--medir'], cwd=pasta, env=env,
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                 for _ in range(workers)]
+    cargas = [json.loads(p.stdout.readline())['carga_s'] for p in processos]
+    pss = []
+    for p in processos:
+        p.stdin.write('\n'); p.stdin.flush()
+        pss.append(json.loads(p.stdout.readline())['pss_mb'])
+        p.wait()
+    return cargas, pss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--eventos', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--medir', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        _medir()
+        return
+
+    from bench_eventos import gerar_eventos
+    print(f"{'eventos':>8} {'modo':>13} {'carga (máx)':>12} {'PSS total':>10} {'PSS/worker':>11}")
+    for n in args.eventos:
+        with tempfile.TemporaryDirectory() as pasta:
+            eventos = gerar_eventos(n)
+            with open(os.path.join(pasta, 'eventos.json'), 'w', encoding='utf-8') as f:
+                json.dump({'revisao': 'bench', 'eventos': eventos, 'estilos': []}, f, ensure_ascii=False)
+            for compartilhado in (False, True):
+                cargas, pss = _rodar(pasta, args.workers, compartilhado)
+                modo = 'mmap' if compartilhado else 'por worker'
+                total = sum(p or 0 for p in pss)
+                print(f"{n:>8} {modo:>13} {max(cargas):>11.2f}s {total:>8.1f}MB {total / len(pss):>9.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
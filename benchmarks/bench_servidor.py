@@ -0,0 +1,236 @@
+"""
+Suíte de benchmarks do caminho quente do servidor, sobre dados sintéticos (sinteticos.py).
+
+Etapas medidas por tamanho de dados:
+- carga:        _recarregar_dados() a frio (JSON -> EventStore);
+- status:       construir_snapshot() do zero (status, ordenação e índices);
+- filtros:      filtrar_eventos() com cache vazio, para um conjunto fixo de consultas;
+- render_index: render_template('index.html') da primeira página;
+- json_eventos: serialização da resposta de /api/eventos sem filtros;
+- e2e_*:        carga de requisições pelo test client do Flask (páginas, API, busca e
+                curtidas gravadas no SQLite local), latência por rota.
+
+Cada tamanho roda num processo separado, numa pasta temporária com o voto em SQLite.
+O resultado é um JSON (--saida) que pode ser comparado com o de outro commit:
+
+    python benchmarks/bench_servidor.py --tamanhos 1000 10000 100000 --saida atual.json
+    python benchmarks/bench_servidor.py --tamanhos 1000 10000 --saida novo.json --comparar atual.json --limite 0.2
+
+Com --comparar, sai com código 1 se alguma mediana piorou mais que o limite
+(--limite-etapa filtros=0.5 ajusta uma etapa específica).
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, AQUI)
+
+FORMATO = 1
+AGORA = datetime(2026, 2, 14, 15, 0)     # relógio fixo: sábado de Carnaval à tarde
+MINIMO_MS = 0.05                        # abaixo disso a diferença é ruído de medição
+
+
+def _estatisticas(tempos):
+    tempos = sorted(t * 1000 for t in tempos)
+    p95 = tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))]
+    return {'n': len(tempos), 'mediana_ms': round(tempos[len(tempos) // 2], 3),
+            'p95_ms': round(p95, 3), 'min_ms': round(tempos[0], 3)}
+
+
+def _cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return _estatisticas(tempos)
+
+
+def _consultas(bairros, n=40, semente=3):
+    """Parâmetros de filtro no formato da query string, sempre os mesmos para a mesma semente"""
+    aleatorio = random.Random(semente)
+    rapidos = ['sab_oficial', 'dom_oficial', 'hoje', 'amanha', 'em-andamento', 'em-breve',
+               'grande', 'medio', 'pequeno', 'manha', 'tarde', 'noite']
+    consultas = []
+    for _ in range(n):
+        args = [('quick_filter', q) for q in aleatorio.sample(rapidos, aleatorio.randint(0, 2))]
+        if aleatorio.random() < .4: args.append(('bairro', aleatorio.choice(bairros)))
+        if aleatorio.random() < .3: args.append(('categoria', aleatorio.choice(['samba', 'axé', 'ensaio', 'variado'])))
+        if aleatorio.random() < .3: args.append(('q', aleatorio.choice(['bloco', 'samba', 'lagoa', 'tereza', 'ba'])))
+        if aleatorio.random() < .2: args += [('sw_lat', '-19.97'), ('ne_lat', '-19.88'), ('sw_lng', '-43.99'), ('ne_lng', '-43.90')]
+        consultas.append(args)
+    return consultas
+
+
+def medir(n, requisicoes):
+    """Roda dentro do processo filho, já na pasta com os dados: devolve {etapa: estatísticas}"""
+    from werkzeug.datastructures import MultiDict
+    from flask import render_template
+    import main
+    from snapshot import construir_snapshot
+    from indices import normalizar_consulta
+
+    main.get_brasilia_time = lambda: AGORA
+    main.STATUS_ENGINE._relogio = lambda: AGORA
+    inicial = dict(main.DATA_CACHE)
+    repeticoes = max(2, min(20, 20000 // n))
+    resultados = {}
+
+    def carga():
+        main.DATA_CACHE = dict(inicial)
+        main._recarregar_dados()
+    resultados['carga'] = _cronometrar(carga, repeticoes)
+    store, estilos, versao = main.load_raw_data_cached()
+
+    resultados['status'] = _cronometrar(lambda: construir_snapshot(store, versao, 1, AGORA), repeticoes)
+    snapshot, _ = main.fetch_carnival_data()
+
+    consultas = [normalizar_consulta(MultiDict(args), AGORA) for args in _consultas(list(snapshot.bairros))]
+    def filtros():
+        for consulta in consultas:
+            main.FILTROS_CACHE.clear()
+            main.filtrar_eventos(snapshot, consulta)
+    tempos = _cronometrar(filtros, repeticoes)
+    resultados['filtros'] = {k: (round(v / len(consultas), 3) if k.endswith('_ms') else v) for k, v in tempos.items()}
+
+    pagina, _, proximo, _ = main.pagina_eventos(snapshot.eventos, None,
+                                                main.marca_lista(snapshot, normalizar_consulta(MultiDict(), AGORA)))
+    with main.app.test_request_context('/'):
+        resultados['render_index'] = _cronometrar(lambda: render_template(
+            'index.html', eventos=pagina, inicio=0, proximo_cursor=proximo, bairros=snapshot.bairros,
+            estilos=estilos, total=len(snapshot.eventos), has_filters=False, versao_dados=snapshot.versao,
+            google_maps_api_key=None), repeticoes)
+        resultados['json_eventos'] = _cronometrar(lambda: main.app.json.dumps(
+            [main.evento_publico(e) for e in snapshot.eventos if e['lat'] and e['lon']]), repeticoes)
+
+    resultados.update(_carga_e2e(main, snapshot, requisicoes))
+    main.FILA_VOTOS.flush()
+    return resultados
+
+
+def _carga_e2e(main, snapshot, requisicoes, semente=5):
+    """Mistura de requisições pelo test client; latência por rota (com o cache de respostas ativo)"""
+    from werkzeug.datastructures import MultiDict
+    from indices import normalizar_consulta
+    aleatorio = random.Random(semente)
+    cliente = main.app.test_client()
+    ids = [e['id'] for e in snapshot.eventos[:500]]
+    consultas = ['&'.join(f'{k}={v}' for k, v in args) for args in _consultas(list(snapshot.bairros), n=20)]
+    # Cursores da lista sem filtros, com a marca atual (uma marca velha faria o servidor recomeçar a lista)
+    marca = main.marca_lista(snapshot, normalizar_consulta(MultiDict(), AGORA))
+    rotas = [
+        ('e2e_index', 0.15, lambda: cliente.get('/?' + aleatorio.choice(consultas))),
+        ('e2e_api_eventos', 0.35, lambda: cliente.get('/api/eventos?' + aleatorio.choice(consultas))),
+        ('e2e_api_pagina', 0.15, lambda: cliente.get(f'/api/eventos?cursor={aleatorio.choice((60, 120, 180))}.{marca}')),
+        ('e2e_busca', 0.2, lambda: cliente.get('/api/busca?q=' + aleatorio.choice(['bl', 'blo', 'samba', 'lagoa d', 'ter']))),
+        ('e2e_like', 0.15, lambda: cliente.post(f'/api/like/{aleatorio.choice(ids)}',
+                                                json={'user_id': str(uuid.UUID(int=aleatorio.getrandbits(128))), 'acao': 'add'})),
+    ]
+    tempos = {nome: [] for nome, _, _ in rotas}
+    erros = 0
+    inicio_total = time.perf_counter()
+    for _ in range(requisicoes):
+        nome, _, chamar = aleatorio.choices(rotas, weights=[p for _, p, _ in rotas])[0]
+        inicio = time.perf_counter()
+        resposta = chamar()
+        resposta.get_data()
+        tempos[nome].append(time.perf_counter() - inicio)
+        if resposta.status_code >= 500: erros += 1
+    total = time.perf_counter() - inicio_total
+
+    resultados = {nome: _estatisticas(t) for nome, t in tempos.items() if t}
+    resultados['e2e_total'] = {'n': requisicoes, 'req_s': round(requisicoes / total, 1), 'erros': erros}
+    return resultados
+
+
+def _rodar_tamanho(n, requisicoes):
+    with tempfile.TemporaryDirectory() as pasta:
+        from sinteticos import gravar
+        gravar(n, pasta)
+        env = dict(os.environ, VOTE_STORE='sqlite', SQLITE_PATH=os.path.join(pasta, 'votos.db'),
+                   SHARED_SNAPSHOT_FILE='', PYTHONPATH=RAIZ)
+        for nome in ('RATE_LIMIT_SEED', 'RATE_LIMIT_DB'): env.pop(nome, None)
+        saida = subprocess.run([sys.executable, os.path.abspath(__file__), '--medir', str(n), str(requisicoes)],
+                               cwd=pasta, env=env, capture_output=True, text=True)
+        if saida.returncode != 0:
+            raise RuntimeError(f"benchmark com {n} eventos falhou:\n{saida.stderr}")
+        return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def comparar(atual, base, limite, limites_etapa, minimo_ms=MINIMO_MS):
+    """Linhas (tamanho, etapa, base, atual, variação, regrediu) das medianas presentes nos dois resultados"""
+    linhas = []
+    for tamanho, etapas in atual['tamanhos'].items():
+        for etapa, stats in etapas.items():
+            anterior = base.get('tamanhos', {}).get(tamanho, {}).get(etapa)
+            if not anterior or 'mediana_ms' not in stats or 'mediana_ms' not in anterior: continue
+            antes, agora = anterior['mediana_ms'], stats['mediana_ms']
+            variacao = (agora - antes) / antes if antes else 0.0
+            regrediu = variacao > limites_etapa.get(etapa, limite) and agora - antes > minimo_ms
+            linhas.append((tamanho, etapa, antes, agora, variacao, regrediu))
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--requisicoes', type=int, default=300, help='requisições do teste ponta a ponta')
+    parser.add_argument('--saida', help='grava o resultado em JSON')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior (ex.: do commit base)')
+    parser.add_argument('--limite', type=float, default=0.2, help='piora relativa tolerada na mediana (0.2 = 20%%)')
+    parser.add_argument('--limite-etapa', action='append', default=[], metavar='ETAPA=LIMITE')
+    parser.add_argument('--medir', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(int(args.medir[0]), int(args.medir[1]))))
+        return
+
+    resultado = {'formato': FORMATO, 'commit': _commit(), 'python': platform.python_version(),
+                 'gerado_em': datetime.now().isoformat(timespec='seconds'), 'tamanhos': {}}
+    for n in args.tamanhos:
+        etapas = resultado['tamanhos'][str(n)] = _rodar_tamanho(n, args.requisicoes)
+        print(f"\n{n} eventos")
+        for etapa, stats in etapas.items():
+            if 'mediana_ms' in stats:
+                print(f"  {etapa:<16} mediana {stats['mediana_ms']:>10.3f} ms   p95 {stats['p95_ms']:>10.3f} ms   (n={stats['n']})")
+            else:
+                print(f"  {etapa:<16} {stats}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        limites_etapa = {k: float(v) for k, v in (item.split('=', 1) for item in args.limite_etapa)}
+        linhas = comparar(resultado, base, args.limite, limites_etapa)
+        print(f"\nComparação com {args.comparar} (commit {base.get('commit')}):")
+        for tamanho, etapa, antes, agora, variacao, regrediu in linhas:
+            marca = 'REGRESSÃO' if regrediu else ''
+            print(f"  {tamanho:>7} {etapa:<16} {antes:>10.3f} -> {agora:>10.3f} ms  {variacao:+7.1%}  {marca}")
+        if any(linha[-1] for linha in linhas): sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Pico de curtidas contra um Supabase local (postgrest_local.py) com latência de rede simulada.
+
+O app roda num servidor WSGI com threads (werkzeug) num processo filho, com o cliente do
+Supabase apontando para a imitação local, e `--clientes` threads deste processo
+disparam POST /api/like ao mesmo tempo (IPs e UUIDs aleatórios, ~10% desfazendo uma curtida anterior).
+Para cada VOTE_FLUSH_CONCURRENCY mede a vazão e a latência do endpoint, o tempo até a fila
+esvaziar (desde o início e depois do último POST), os votos gravados por segundo, quantas
+conexões HTTP o banco recebeu e se a contagem final no banco bate com os votos aceitos.
+
+    python benchmarks/bench_votos.py --requisicoes 5000 --clientes 64 --latencia 0.08 --concorrencia 1 4 8
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, AQUI)
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))] if valores else 0.0
+
+
+def _servir():
+    """Roda dentro do processo filho: sobe o app, avisa a porta e, no sinal, espera a fila esvaziar"""
+    import logging
+    from werkzeug.serving import make_server
+    import main
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)     # sem uma linha de log por requisição
+    servidor = make_server('127.0.0.1', 0, main.app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    print(json.dumps({'porta': servidor.server_port}), flush=True)
+
+    sys.stdin.readline()        # o pico acabou
+    while main.FILA_VOTOS.pendentes() or any(l.locked() for l in main.FILA_VOTOS._flush_locks):
+        time.sleep(0.005)
+    print(json.dumps({'gravados': main.FILA_VOTOS.gravados}), flush=True)
+    servidor.shutdown()
+
+
+def _pico(base, requisicoes, clientes, blocos):
+    """Dispara as curtidas de `clientes` threads ao mesmo tempo; devolve latências, status e votos aceitos"""
+    import requests
+
+    latencias, status = [], {}
+    aceitos = {'add': 0, 'remove': 0}
+    lock = threading.Lock()
+
+    def cliente(semente):
+        aleatorio = random.Random(semente)
+        sessao = requests.Session()
+        meus = []          # votos aceitos deste cliente, candidatos a serem desfeitos
+        for _ in range(requisicoes // clientes):
+            if meus and aleatorio.random() < 0.1:
+                user_id, bloco, ip = meus.pop(aleatorio.randrange(len(meus)))
+                acao = 'remove'
+            else:
+                user_id, bloco = str(uuid.UUID(int=aleatorio.getrandbits(128), version=4)), str(aleatorio.randrange(blocos))
+                ip, acao = f"10.{aleatorio.randrange(256)}.{aleatorio.randrange(256)}.{aleatorio.randrange(256)}", 'add'
+            inicio = time.perf_counter()
+            r = sessao.post(f"{base}/api/like/{bloco}", json={'user_id': user_id, 'acao': acao},
+                            headers={'X-Forwarded-For': ip})
+            duracao = time.perf_counter() - inicio
+            ok = r.status_code == 200 and r.json().get('status') == 'ok'
+            if ok and acao == 'add': meus.append((user_id, bloco, ip))
+            with lock:
+                latencias.append(duracao)
+                status[r.status_code] = status.get(r.status_code, 0) + 1
+                if ok: aceitos[acao] += 1
+
+    threads = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return latencias, status, aceitos
+
+
+def _rodar(url, concorrencia, args):
+    with tempfile.TemporaryDirectory() as pasta:
+        env = dict(os.environ, VOTE_STORE='supabase', SUPABASE_URL=url, SUPABASE_KEY='local',
+                   VOTE_FLUSH_CONCURRENCY=str(concorrencia), VOTE_QUEUE_MAX=str(args.fila),
+                   SHARED_SNAPSHOT_FILE='', PYTHONPATH=RAIZ)
+        for nome in ('RATE_LIMIT_SEED', 'RATE_LIMIT_DB', 'NEXT_PUBLIC_SUPABASE_URL', 'NEXT_PUBLIC_SUPABASE_ANON_KEY'):
+            env.pop(nome, None)
+        app = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--servir'], cwd=pasta, env=env,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        try:
+            porta = json.loads(app.stdout.readline())['porta']
+            inicio = time.perf_counter()
+            latencias, status, aceitos = _pico(f"http://127.0.0.1:{porta}", args.requisicoes, args.clientes, args.blocos)
+            fim_pico = time.perf_counter()
+            app.stdin.write('\n'); app.stdin.flush()
+            gravados = json.loads(app.stdout.readline())['gravados']
+            fim_fila = time.perf_counter()
+        finally:
+            app.kill()
+            app.wait()
+
+    return {
+        'req_s': len(latencias) / (fim_pico - inicio),
+        'p50_ms': _percentil(latencias, 0.5) * 1000,
+        'p95_ms': _percentil(latencias, 0.95) * 1000,
+        'status': status,
+        'esperado': aceitos['add'] - aceitos['remove'],
+        'drenagem_s': fim_fila - inicio,
+        'resto_s': fim_fila - fim_pico,        # o que a fila ainda levou depois do último POST
+        'votos_s': gravados / (fim_fila - inicio),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requisicoes', type=int, default=5000)
+    parser.add_argument('--clientes', type=int, default=64, help='requisições simultâneas')
+    parser.add_argument('--blocos', type=int, default=300)
+    parser.add_argument('--latencia', type=float, default=0.08, help='segundos por chamada ao banco')
+    parser.add_argument('--concorrencia', type=int, nargs='+', default=[1, 4, 8], help='valores de VOTE_FLUSH_CONCURRENCY')
+    parser.add_argument('--fila', type=int, default=10000, help='VOTE_QUEUE_MAX')
+    parser.add_argument('--servir', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.servir:
+        _servir()
+        return
+
+    from postgrest_local import iniciar
+    print(f"{'lotes':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'503':>6} {'drenagem':>9} {'resto':>7} {'votos/s':>8} {'conexões':>9} {'chamadas':>9}  contagem")
+    for concorrencia in args.concorrencia:
+        servidor, url = iniciar(latencia=args.latencia, variacao=args.latencia / 4)
+        r = _rodar(url, concorrencia, args)
+        banco = servidor.banco
+        confere = 'ok' if banco.total_curtidas() == r['esperado'] else f"DIVERGE ({banco.total_curtidas()} x {r['esperado']})"
+        print(f"{concorrencia:>5} {r['req_s']:>8.0f} {r['p50_ms']:>6.1f}ms {r['p95_ms']:>6.1f}ms {r['status'].get(503, 0):>6} "
+              f"{r['drenagem_s']:>8.2f}s {r['resto_s']:>6.2f}s {r['votos_s']:>8.0f} {banco.conexoes:>9} {banco.requisicoes:>9}  {confere}")
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
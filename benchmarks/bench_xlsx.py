@@ -0,0 +1,95 @@
+"""
+Leitura da planilha de ensaios: carga completa do openpyxl (caminho antigo) x streaming
+em read_only com hyperlinks lidos do XML (planilha.linhas_xlsx).
+
+Cada caminho roda num processo separado para medir o pico de RSS de forma isolada.
+
+    python benchmarks/bench_xlsx.py --linhas 1000 10000 50000
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+from io import BytesIO
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def gerar_planilha(caminho, linhas):
+    """Planilha no formato da de ensaios: título, cabeçalho e um terço das linhas com hyperlink"""
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Ensaios')
+    ws.append(['ENSAIOS'])
+    ws.append(['BLOCO', 'DATA', 'HORÁRIO', 'LOCAL', 'VALOR'])
+    for i in range(linhas):
+        valor = WriteOnlyCell(ws, value=f'R$ {i % 30}')
+        if i % 3 == 0: valor.hyperlink = f'https://ingresso.example/{i}'
+        ws.append([f'Bloco {i}', datetime(2026, 1, 1 + i % 28), '15h30', f'Rua {i % 500}, {i % 9}', valor])
+    wb.save(caminho)
+
+
+def ler_completo(caminho):
+    """O caminho antigo: bytes inteiros na memória + load_workbook sem read_only"""
+    import openpyxl
+    with open(caminho, 'rb') as f:
+        conteudo = f.read()
+    wb = openpyxl.load_workbook(filename=BytesIO(conteudo))
+    linhas = links = 0
+    for row in wb.active.iter_rows():
+        linhas += 1
+        links += sum(1 for cell in row if cell.hyperlink)
+    return linhas, links
+
+
+def ler_streaming(caminho):
+    from planilha import linhas_xlsx
+    linhas = links = 0
+    with open(caminho, 'rb') as f:
+        for _, links_linha in linhas_xlsx(f):
+            linhas += 1
+            links += len(links_linha)
+    return linhas, links
+
+
+def _medir(modo, caminho):
+    inicio = time.perf_counter()
+    linhas, links = (ler_completo if modo == 'completo' else ler_streaming)(caminho)
+    tempo = time.perf_counter() - inicio
+    pico_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss     # KB no Linux
+    print(json.dumps({'modo': modo, 'linhas': linhas, 'links': links, 'tempo_s': round(tempo, 3), 'pico_rss_mb': round(pico_kb / 1024, 1)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--medir', nargs=2, metavar=('MODO', 'ARQUIVO'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        _medir(*args.medir)
+        return
+
+    with tempfile.TemporaryDirectory() as pasta:
+        print(f"{'linhas':>8} {'arquivo':>9} {'modo':>10} {'tempo':>8} {'pico RSS':>10} {'links':>7}")
+        for n in args.linhas:
+            caminho = os.path.join(pasta, f'ensaios_{n}.xlsx')
+            gerar_planilha(caminho, n)
+            tamanho = os.path.getsize(caminho) / 1024 / 1024
+            for modo in ('completo', 'streaming'):
+                saida = subprocess.run([sys.executable, __file__, '--medir', modo, caminho],
+                                       capture_output=True, text=True, check=True).stdout
+                r = json.loads(saida)
+                print(f"{n:>8} {tamanho:>7.1f}MB {modo:>10} {r['tempo_s']:>7.2f}s {r['pico_rss_mb']:>8.1f}MB {r['links']:>7}")
+
+
+if __name__ == '__main__':
+    main()
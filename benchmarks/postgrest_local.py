@@ -0,0 +1,193 @@
+"""
+Imitação local da API REST do Supabase (PostgREST em /rest/v1), só com o que o app usa:
+tabelas votos e likes, com a mesma regra do trigger de contagem do setup_db.py.
+Cada requisição espera `latencia` segundos antes de responder, para simular o banco remoto.
+
+    python benchmarks/postgrest_local.py --porta 54321 --latencia 0.08
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=local python main.py
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+
+def _agora():
+    return datetime.now(timezone.utc).isoformat()
+
+
+_VALOR = re.compile(r'"((?:[^"\\]|\\.)*)"|([^,]+)')
+
+
+def _lista(texto):
+    """in.(a,"b,c") -> ['a', 'b,c']"""
+    return [re.sub(r'\\(.)', r'\1', entre_aspas) if entre_aspas or not solto else solto.strip()
+            for entre_aspas, solto in _VALOR.findall(texto.strip('()'))]
+
+
+_GRUPO = re.compile(r'and\(bloco_id\.eq\.("(?:[^"\\]|\\.)*"|[^,()]+),user_id\.in\.(\((?:"(?:[^"\\]|\\.)*"|[^()"])*\))\)')
+
+
+def _pares(filtro):
+    """or=(and(bloco_id.eq."b",user_id.in.("u1","u2")),...) -> {(bloco_id, user_id)} (só o formato que o app gera)"""
+    return {(_lista(bloco)[0], user_id) for bloco, usuarios in _GRUPO.findall(filtro) for user_id in _lista(usuarios)}
+
+
+def _filtrar(linhas, filtros):
+    """Filtros do PostgREST (coluna=operador.valor) que o cliente do Supabase gera: eq, gte, in e or=(and(...))"""
+    for campo, condicao in filtros.items():
+        if campo == 'or':
+            pares = _pares(condicao)
+            linhas = [l for l in linhas if (str(l['bloco_id']), str(l['user_id'])) in pares]
+            continue
+        operador, _, valor = condicao.partition('.')
+        if operador == 'gte': linhas = [l for l in linhas if str(l[campo]) >= valor]
+        elif operador == 'eq': linhas = [l for l in linhas if str(l[campo]) == valor]
+        elif operador == 'in':
+            valores = set(_lista(valor))
+            linhas = [l for l in linhas if str(l[campo]) in valores]
+    return linhas
+
+
+class Banco:
+    """Estado em memória das duas tabelas, protegido por um lock (como uma transação por requisição)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.votos = {}          # (user_id, bloco_id) -> {'ip_address', 'created_at'}
+        self.likes = {}          # id -> {'count', 'updated_at'}
+        self.requisicoes = 0
+        self.conexoes = 0
+
+    def _contar(self, bloco_id, delta):
+        linha = self.likes.setdefault(bloco_id, {'count': 0})
+        linha['count'] = max(0, linha['count'] + delta)
+        linha['updated_at'] = _agora()
+
+    def inserir(self, linhas):
+        """ON CONFLICT DO NOTHING: devolve só as linhas inseridas"""
+        inseridas = []
+        with self.lock:
+            for linha in linhas:
+                chave = (linha['user_id'], linha['bloco_id'])
+                if chave in self.votos: continue
+                self.votos[chave] = {'ip_address': linha.get('ip_address'), 'created_at': _agora()}
+                self._contar(linha['bloco_id'], 1)
+                inseridas.append(dict(linha, created_at=self.votos[chave]['created_at']))
+        return inseridas
+
+    def _votos(self):
+        return [{'user_id': u, 'bloco_id': b, **v} for (u, b), v in self.votos.items()]
+
+    def remover(self, filtros):
+        """DELETE ... WHERE <filtros>: devolve as linhas removidas"""
+        with self.lock:
+            removidas = _filtrar(self._votos(), filtros)
+            for linha in removidas:
+                del self.votos[(linha['user_id'], linha['bloco_id'])]
+                self._contar(linha['bloco_id'], -1)
+        return removidas
+
+    def selecionar(self, tabela, filtros):
+        with self.lock:
+            linhas = [{'id': i, **v} for i, v in self.likes.items()] if tabela == 'likes' else self._votos()
+        return _filtrar(linhas, filtros)
+
+    def total_curtidas(self):
+        with self.lock:
+            return sum(v['count'] for v in self.likes.values())
+
+
+def criar_servidor(porta=0, latencia=0.0, variacao=0.0, banco=None):
+    """ThreadingHTTPServer com keep-alive (HTTP/1.1); `servidor.banco` guarda as tabelas e os contadores"""
+    banco = banco or Banco()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            with banco.lock: banco.conexoes += 1
+
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, status, corpo=None):
+            dados = json.dumps(corpo).encode('utf-8') if corpo is not None else b''
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def _rota(self):
+            # Lê o corpo sempre (o cliente manda {} até no DELETE): sobras quebrariam a próxima requisição da conexão
+            self.corpo = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if latencia or variacao: time.sleep(max(0.0, latencia + random.uniform(-variacao, variacao)))
+            with banco.lock: banco.requisicoes += 1
+            partes = urlsplit(self.path)
+            if not partes.path.startswith('/rest/v1/'): return None, None
+            tabela = partes.path[len('/rest/v1/'):]
+            if tabela not in ('votos', 'likes'): return None, None
+            return tabela, dict(parse_qsl(partes.query))
+
+        def do_GET(self):
+            tabela, params = self._rota()
+            if tabela is None: return self._responder(404, {'message': 'not found'})
+            campos = params.pop('select', '*')
+            ordem = params.pop('order', None)
+            offset, limite = int(params.pop('offset', 0)), params.pop('limit', None)
+            if self.headers.get('Range'):       # versões antigas do cliente paginam pelo cabeçalho Range: a-b
+                inicio, _, fim = self.headers['Range'].partition('-')
+                offset, limite = int(inicio), int(fim) - int(inicio) + 1
+            linhas = banco.selecionar(tabela, params)
+            if ordem: linhas.sort(key=lambda l: l[ordem.split('.')[0]])
+            linhas = linhas[offset:offset + int(limite) if limite else None]
+            if campos != '*': linhas = [{c.strip(): l.get(c.strip()) for c in campos.split(',')} for l in linhas]
+            self._responder(200, linhas)
+
+        def do_POST(self):
+            tabela, _ = self._rota()
+            if tabela != 'votos': return self._responder(404, {'message': 'not found'})
+            # on_conflict=user_id,bloco_id com resolution=ignore-duplicates: a chave primária é o par
+            corpo = json.loads(self.corpo or b'[]')
+            linhas = corpo if isinstance(corpo, list) else [corpo]
+            if any(not l.get('user_id') or not l.get('bloco_id') for l in linhas):
+                return self._responder(400, {'message': 'null value violates not-null constraint'})
+            inseridas = banco.inserir(linhas)
+            self._responder(201, inseridas if 'return=representation' in self.headers.get('Prefer', '') else None)
+
+        def do_DELETE(self):
+            tabela, params = self._rota()
+            if tabela != 'votos': return self._responder(404, {'message': 'not found'})
+            if not params: return self._responder(400, {'message': 'DELETE requires a WHERE clause'})
+            removidas = banco.remover(params)
+            self._responder(200, removidas if 'return=representation' in self.headers.get('Prefer', '') else None)
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', porta), Handler)
+    servidor.daemon_threads = True
+    servidor.banco = banco
+    return servidor
+
+
+def iniciar(porta=0, latencia=0.0, variacao=0.0):
+    """Sobe o servidor numa thread; devolve (servidor, url base)"""
+    servidor = criar_servidor(porta, latencia, variacao)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--porta', type=int, default=54321)
+    parser.add_argument('--latencia', type=float, default=0.05, help='segundos por requisição')
+    parser.add_argument('--variacao', type=float, default=0.0, help='± segundos aleatórios sobre a latência')
+    args = parser.parse_args()
+    servidor = criar_servidor(args.porta, args.latencia, args.variacao)
+    print(f"PostgREST local em http://127.0.0.1:{args.porta}/rest/v1 (latência {args.latencia * 1000:.0f} ms)")
+    servidor.serve_forever()
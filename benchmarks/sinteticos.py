@@ -0,0 +1,132 @@
+"""
+Dados sintéticos no formato de eventos.json / ensaios.json, em qualquer tamanho.
+
+As distribuições vêm dos arquivos reais do repositório (eventos_mock.json e ensaios.json):
+peso de cada bairro e a nuvem de coordenadas dele, datas e horários, categorias, tamanhos,
+frequência das flags e a proporção de ensaios. Mesma semente, mesmos dados.
+
+    python benchmarks/sinteticos.py 10000 pasta/     (grava pasta/eventos.json e pasta/ensaios.json)
+"""
+import os
+import sys
+import json
+import random
+import statistics
+from collections import Counter
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from ingestao import formatar_data
+
+RUAS = ('Rua', 'Av.', 'Praça', 'Alameda', 'Travessa')
+NOMES = ('Bloco', 'Cordão', 'Banda', 'Baianas', 'Turma', 'Fanfarra', 'Unidos', 'Batucada')
+COMPLEMENTOS = ('do Samba', 'da Lagoa', 'Ozadas', 'do Leão', 'da Serra', 'Mamãe', 'Tereza', 'do Funk', 'Ziriguidum')
+
+
+def _ler(nome):
+    with open(os.path.join(RAIZ, nome), 'r', encoding='utf-8') as f:
+        return json.load(f).get('eventos', [])
+
+
+class Modelo:
+    """Distribuições empíricas dos eventos reais, para sortear eventos parecidos"""
+
+    def __init__(self):
+        blocos = _ler('eventos_mock.json')
+        ensaios = _ler('ensaios.json')
+        self.forma_bloco = list(blocos[0]) if blocos else []
+        self.forma_ensaio = [k for k in ensaios[0] if k != 'status'] if ensaios else self.forma_bloco
+        self.proporcao_ensaios = len(ensaios) / max(1, len(blocos) + len(ensaios))
+
+        self.bairros, self.pesos_bairros, self.nuvens = [], [], {}
+        por_bairro = {}
+        for e in blocos:
+            if e.get('lat') and e.get('lon'): por_bairro.setdefault(e['local'], []).append((e['lat'], e['lon']))
+        for bairro, pontos in sorted(por_bairro.items()):
+            lats, lons = [p[0] for p in pontos], [p[1] for p in pontos]
+            desvio = max(statistics.pstdev(lats) if len(lats) > 1 else 0, 0.004)
+            self.bairros.append(bairro)
+            self.pesos_bairros.append(len(pontos))
+            self.nuvens[bairro] = (statistics.fmean(lats), statistics.fmean(lons), desvio)
+        self.pontos_ensaios = [(e['lat'], e['lon']) for e in ensaios if e.get('lat') and e.get('lon')]
+
+        def datas(eventos):
+            return Counter(e['dt_iso'][:10] for e in eventos if e.get('dt_iso'))
+        def horas(eventos):
+            return Counter(e['dt_iso'][11:16] for e in eventos if e.get('dt_iso'))
+        self.datas_blocos, self.horas_blocos = datas(blocos), horas(blocos)
+        self.datas_ensaios, self.horas_ensaios = datas(ensaios), horas(ensaios)
+        self.categorias = Counter(e['categoria'] for e in blocos)
+        self.tamanhos = Counter(e['tamanho'] for e in blocos)
+        self.flags = {f: sum(1 for e in blocos if e.get(f)) / max(1, len(blocos)) for f in ('is_kids', 'is_lgbt', 'is_pet')}
+
+    @staticmethod
+    def _sortear(aleatorio, contagem):
+        return aleatorio.choices(list(contagem), weights=list(contagem.values()))[0]
+
+    def _dt(self, aleatorio, datas, horas):
+        dia = datetime.fromisoformat(self._sortear(aleatorio, datas))
+        # Espalha em volta das datas reais (±3 dias), mantendo os picos do Carnaval
+        dia += timedelta(days=aleatorio.choice((0, 0, 0, -1, 1, -2, 2, -3, 3)))
+        hora, minuto = map(int, self._sortear(aleatorio, horas).split(':'))
+        return dia.replace(hour=hora, minute=minuto)
+
+    def evento(self, aleatorio, n):
+        ensaio = aleatorio.random() < self.proporcao_ensaios
+        if ensaio:
+            dt = self._dt(aleatorio, self.datas_ensaios, self.horas_ensaios)
+            lat, lon = aleatorio.choice(self.pontos_ensaios)
+            lat += aleatorio.gauss(0, 0.002); lon += aleatorio.gauss(0, 0.002)
+            bairro, categoria, tamanho = 'Belo Horizonte', 'Ensaio', 2
+        else:
+            dt = self._dt(aleatorio, self.datas_blocos, self.horas_blocos)
+            bairro = aleatorio.choices(self.bairros, weights=self.pesos_bairros)[0]
+            c_lat, c_lon, desvio = self.nuvens[bairro]
+            lat, lon = c_lat + aleatorio.gauss(0, desvio), c_lon + aleatorio.gauss(0, desvio)
+            categoria, tamanho = self._sortear(aleatorio, self.categorias), self._sortear(aleatorio, self.tamanhos)
+
+        e = {
+            'id': str(aleatorio.getrandbits(63)),
+            'titulo': f"{aleatorio.choice(NOMES)} {aleatorio.choice(COMPLEMENTOS)} {n}",
+            'local': bairro,
+            'endereco': f"{aleatorio.choice(RUAS)} {aleatorio.choice(COMPLEMENTOS)}, {aleatorio.randint(1, 2000)}, {bairro}",
+            'data': formatar_data(dt), 'dt_iso': dt.isoformat(),
+            'categoria': categoria, 'categoria_display': categoria, 'descricao': '',
+            'link_ingresso': '', 'tamanho': tamanho,
+            'lat': round(lat, 7), 'lon': round(lon, 7),
+            'is_ensaio': ensaio,
+        }
+        for flag, taxa in self.flags.items(): e[flag] = not ensaio and aleatorio.random() < taxa
+        if not ensaio and aleatorio.random() < 0.02: e['lat'] = e['lon'] = None     # endereço sem geocoding
+        return e, ensaio
+
+
+def gerar(n, semente=1, modelo=None):
+    """(blocos, ensaios): n eventos no total, cada um com as chaves e a ordem do arquivo de origem"""
+    modelo = modelo or Modelo()
+    aleatorio = random.Random(semente)
+    blocos, ensaios = [], []
+    for i in range(n):
+        e, ensaio = modelo.evento(aleatorio, i)
+        forma = modelo.forma_ensaio if ensaio else modelo.forma_bloco
+        (ensaios if ensaio else blocos).append({k: e[k] for k in forma if k in e})
+    return blocos, ensaios
+
+
+def gravar(n, pasta, semente=1):
+    """Grava eventos.json e ensaios.json em `pasta`, como os scripts de ingestão fariam"""
+    blocos, ensaios = gerar(n, semente)
+    estilos = sorted({e['categoria'] for e in blocos})
+    for nome, eventos, extra in (('eventos.json', blocos, {'estilos': estilos}), ('ensaios.json', ensaios, {})):
+        with open(os.path.join(pasta, nome), 'w', encoding='utf-8') as f:
+            json.dump({'revisao': f'sintetico-{n}-{semente}', 'eventos': eventos, **extra}, f, ensure_ascii=False)
+    return blocos, ensaios
+
+
+if __name__ == '__main__':
+    n, pasta = int(sys.argv[1]), sys.argv[2]
+    os.makedirs(pasta, exist_ok=True)
+    blocos, ensaios = gravar(n, pasta)
+    print(f"{len(blocos)} blocos e {len(ensaios)} ensaios em {pasta}")
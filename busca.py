@@ -0,0 +1,119 @@
+import re
+import heapq
+import unicodedata
+from bisect import bisect_left
+
+CAMPOS_BUSCA = ('titulo', 'endereco', 'local', 'categoria', 'descricao')
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e com espaços colapsados ('São  João' -> 'sao joao')"""
+    if not texto: return ''
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class SearchIndex:
+    """
+    Índice de busca montado na carga dos dados:
+    - trigramas do texto normalizado de todos os campos (busca por substring);
+    - vocabulário ordenado de palavras (busca por prefixo, para o autocomplete).
+    Os documentos são os índices dos eventos na lista bruta.
+    """
+
+    def __init__(self, store):
+        self.textos = []
+        self.titulos = []
+        self.por_trigrama = {}
+        self.por_token = {}
+
+        colunas = [store.textos[c] for c in CAMPOS_BUSCA]
+        for i in range(len(store)):
+            # '\n' separa os campos para que nenhum trecho da busca atravesse dois deles.
+            # O snapshot do pipeline de ingestão já traz esse texto pronto (store.busca)
+            texto = store.busca[i]
+            if texto is None: texto = '\n'.join(normalizar(coluna[i]) for coluna in colunas)
+            self.textos.append(texto)
+            self.titulos.append(texto.split('\n', 1)[0])
+
+            for tri in trigramas(texto): self.por_trigrama.setdefault(tri, set()).add(i)
+            for tok in _TOKEN_RE.findall(texto): self.por_token.setdefault(tok, set()).add(i)
+
+        self.vocabulario = sorted(self.por_token)
+
+    @classmethod
+    def de_postings(cls, textos, titulos, por_trigrama, por_token):
+        """
+        Índice já montado em outro lugar (ex.: postings de um arquivo mapeado). Os postings
+        podem ser qualquer sequência de índices, não só sets.
+        """
+        indice = cls.__new__(cls)
+        indice.textos = textos
+        indice.titulos = titulos
+        indice.por_trigrama = por_trigrama
+        indice.por_token = por_token
+        indice.vocabulario = sorted(por_token)
+        return indice
+
+    def contem(self, termo, ids=None):
+        """Eventos cujo texto normalizado contém o termo, restritos a `ids` quando informado"""
+        termo = normalizar(termo)
+        if not termo: return set(range(len(self.textos))) if ids is None else set(ids)
+
+        if len(termo) < 3:
+            base = range(len(self.textos)) if ids is None else ids
+            return {i for i in base if termo in self.textos[i]}
+
+        candidatos = None
+        for tri in sorted(trigramas(termo), key=lambda t: len(self.por_trigrama.get(t, ()))):
+            posting = self.por_trigrama.get(tri)
+            if not posting: return set()
+            candidatos = set(posting) if candidatos is None else candidatos.intersection(posting)
+            if not candidatos: return set()
+
+        if ids is not None: candidatos.intersection_update(ids)
+        return {i for i in candidatos if termo in self.textos[i]}
+
+    def prefixo(self, prefixo):
+        """Eventos com alguma palavra começando por `prefixo` (já normalizado)"""
+        resultado = set()
+        pos = bisect_left(self.vocabulario, prefixo)
+        while pos < len(self.vocabulario) and self.vocabulario[pos].startswith(prefixo):
+            resultado.update(self.por_token[self.vocabulario[pos]])
+            pos += 1
+        return resultado
+
+    def sugerir(self, consulta, limite=10, desempate=None):
+        """
+        Candidatos para o autocomplete: todas as palavras digitadas precisam casar como prefixo.
+        Retorna os `limite` índices brutos mais relevantes; `desempate(i)` ordena os empates.
+        """
+        termo = normalizar(consulta)
+        tokens = _TOKEN_RE.findall(termo)
+        if not tokens: return []
+
+        candidatos = None
+        for tok in tokens:
+            hit = self.prefixo(tok)
+            candidatos = hit if candidatos is None else candidatos & hit
+            if not candidatos: return []
+
+        pontuados = []
+        for i in candidatos:
+            titulo = self.titulos[i]
+            if titulo.startswith(termo): score = 4
+            elif termo in titulo: score = 3
+            elif all(any(p.startswith(t) for p in titulo.split()) for t in tokens): score = 2
+            elif termo in self.textos[i]: score = 1
+            else: score = 0
+            pontuados.append((score, i))
+
+        desempate = desempate or (lambda i: i)
+        melhores = heapq.nsmallest(limite, pontuados, key=lambda x: (-x[0], desempate(x[1])))
+        return [i for _, i in melhores]
@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Cache LRU limitado por quantidade de itens e, opcionalmente, por bytes
+    (`tamanho(valor)` diz quanto cada valor ocupa). Seguro para várias threads.
+    """
+
+    def __init__(self, max_itens=256, max_bytes=None, tamanho=len):
+        self.max_itens = max_itens
+        self.max_bytes = max_bytes
+        self._tamanho = tamanho
+        self._dados = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, chave, padrao=None):
+        with self._lock:
+            try:
+                valor = self._dados[chave]
+            except KeyError:
+                self.misses += 1
+                return padrao
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def set(self, chave, valor):
+        peso = self._tamanho(valor) if self.max_bytes else 0
+        # Um valor maior que o orçamento inteiro não vale a pena guardar
+        if self.max_bytes and peso > self.max_bytes: return
+
+        with self._lock:
+            antigo = self._dados.pop(chave, None)
+            if antigo is not None and self.max_bytes: self._bytes -= self._tamanho(antigo)
+            self._dados[chave] = valor
+            self._bytes += peso
+            while len(self._dados) > self.max_itens or (self.max_bytes and self._bytes > self.max_bytes):
+                _, removido = self._dados.popitem(last=False)
+                if self.max_bytes: self._bytes -= self._tamanho(removido)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._dados)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'itens': len(self._dados),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+        }
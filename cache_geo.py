@@ -0,0 +1,128 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:     # Windows: sem trava entre processos
+    fcntl = None
+
+from busca import normalizar
+
+COMPACTAR_A_CADA = 500   # entradas no log antes de reescrever o JSON principal
+
+
+class GeocodeCache:
+    """
+    Cache de coordenadas em dois arquivos:
+    - `latlon_cache.json`: o snapshot compactado (o mesmo formato de sempre);
+    - `latlon_cache.jsonl`: log só de append, uma linha por endereço novo.
+
+    Cada inserção é um append (O(1) e durável); de tempos em tempos o log é
+    incorporado ao JSON, que é trocado atomicamente (arquivo temporário + os.replace).
+    Uma trava de arquivo deixa gerar_dados.py e gerar_ensaios.py rodarem ao mesmo tempo.
+    As chaves são normalizadas (acentos, caixa e espaços), então 'Praça  Sete' e 'praca sete' são a mesma.
+    """
+
+    def __init__(self, caminho, compactar_a_cada=COMPACTAR_A_CADA):
+        self.caminho = caminho
+        self.caminho_log = caminho + 'l'
+        self.caminho_trava = caminho + '.lock'
+        self.compactar_a_cada = compactar_a_cada
+        self._dados = {}
+        self._no_log = 0
+        self._lock = threading.Lock()
+        with self._trava():
+            self._dados, self._no_log = self._ler_disco()
+
+    @staticmethod
+    def chave(texto):
+        return normalizar(texto)
+
+    @contextmanager
+    def _trava(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.caminho_trava, 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _ler_disco(self):
+        """Snapshot + log, com as chaves normalizadas (a primeira ocorrência de cada chave vence)"""
+        dados = {}
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                for chave, coords in json.load(f).items():
+                    dados.setdefault(self.chave(chave), coords)
+        except (OSError, ValueError):
+            pass
+
+        linhas = 0
+        try:
+            # Em bytes: uma linha cortada no meio de um caractere UTF-8 não derruba a leitura do resto
+            with open(self.caminho_log, 'rb') as f:
+                for linha in f:
+                    try:
+                        item = json.loads(linha)
+                        chave, coords = self.chave(item['k']), {'lat': item['lat'], 'lon': item['lon']}
+                    except (ValueError, KeyError, TypeError):
+                        continue    # linha cortada por uma queda no meio da escrita, ou lixo
+                    dados.setdefault(chave, coords)
+                    linhas += 1
+        except OSError:
+            pass
+        return dados, linhas
+
+    def __contains__(self, chave):
+        return self.chave(chave) in self._dados
+
+    def __getitem__(self, chave):
+        return self._dados[self.chave(chave)]
+
+    def get(self, chave, padrao=None):
+        return self._dados.get(self.chave(chave), padrao)
+
+    def __len__(self):
+        return len(self._dados)
+
+    def __setitem__(self, chave, coords):
+        chave = self.chave(chave)
+        linha = (json.dumps({'k': chave, 'lat': coords['lat'], 'lon': coords['lon']}, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._trava():
+            # Sem buffer: a linha inteira sai num único write(). Se uma queda deixou a última linha
+            # sem '\n', começa uma nova para o registro não grudar no pedaço cortado
+            with open(self.caminho_log, 'ab+', buffering=0) as f:
+                if f.seek(0, os.SEEK_END):
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n': linha = b'\n' + linha
+                f.write(linha)
+                os.fsync(f.fileno())
+            self._dados[chave] = coords
+            self._no_log += 1
+            compactar = self._no_log >= self.compactar_a_cada
+        if compactar: self.compactar()
+
+    def compactar(self):
+        """Incorpora o log ao JSON principal e zera o log"""
+        with self._trava():
+            # Relê do disco: outro processo pode ter gravado entradas que não estão na memória
+            dados, _ = self._ler_disco()
+            for chave, coords in self._dados.items(): dados.setdefault(chave, coords)
+
+            temporario = f"{self.caminho}.{os.getpid()}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(dados, f, ensure_ascii=False, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.caminho)
+            # Só depois da troca: se cair antes disso, o log ainda tem tudo
+            open(self.caminho_log, 'w').close()
+
+            self._dados = dados
+            self._no_log = 0
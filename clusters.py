@@ -0,0 +1,129 @@
+import math
+import threading
+
+from snapshot import STATUS_INFO
+
+ZOOM_MIN = 0
+ZOOM_MAX = 17
+PIXELS_CELULA = 64      # lado da célula de agrupamento na tela, em pixels
+
+
+def _pixel_mundo(lat, lon, zoom):
+    """Projeção Web Mercator (a mesma do Leaflet) em pixels absolutos no zoom informado"""
+    escala = 256 * (2 ** zoom)
+    x = (lon + 180.0) / 360.0 * escala
+    s = math.sin(math.radians(max(min(lat, 85.0511), -85.0511)))
+    y = (0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)) * escala
+    return x, y
+
+
+def _tamanho(valor):
+    """Tamanho como inteiro; texto fora do padrão (ex.: 'enorme', guardado como veio no store) vale 0"""
+    try:
+        return int(valor or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class Cluster:
+    __slots__ = ('count', 'soma_lat', 'soma_lon', 'status', 'tamanho', 'id')
+
+    def __init__(self):
+        self.count = 0
+        self.soma_lat = 0.0
+        self.soma_lon = 0.0
+        self.status = {}
+        self.tamanho = 0
+        self.id = None
+
+    def adicionar(self, lat, lon, status, tamanho, eid):
+        self.count += 1
+        self.soma_lat += lat; self.soma_lon += lon
+        self.status[status] = self.status.get(status, 0) + 1
+        self.tamanho = max(self.tamanho, _tamanho(tamanho))
+        self.id = eid if self.count == 1 else None
+
+    def juntar(self, outro):
+        self.id = outro.id if self.count == 0 and outro.count == 1 else None
+        self.count += outro.count
+        self.soma_lat += outro.soma_lat; self.soma_lon += outro.soma_lon
+        for st, n in outro.status.items(): self.status[st] = self.status.get(st, 0) + n
+        self.tamanho = max(self.tamanho, outro.tamanho)
+
+    def status_dominante(self):
+        # Mais frequente; no empate vence o mais "urgente" (menor peso de ordenação)
+        return min(self.status, key=lambda st: (-self.status[st], STATUS_INFO[st][1]))
+
+    def to_dict(self):
+        item = {
+            'lat': self.soma_lat / self.count,
+            'lon': self.soma_lon / self.count,
+            'count': self.count,
+            'status': self.status_dominante(),
+            'tamanho': self.tamanho,
+        }
+        if self.id is not None: item['id'] = self.id
+        return item
+
+
+def agrupar(snapshot, ids, zoom):
+    """Clusters de um único zoom, pulando eventos sem coordenadas ou já encerrados"""
+    niveis = {}
+    coords = snapshot.indice.coords
+    for i in ids:
+        lat, lon = coords[i]
+        if not (lat and lon): continue
+        st = snapshot.status[i]
+        if st == 'encerrado': continue
+        x, y = _pixel_mundo(lat, lon, zoom)
+        chave = (int(x // PIXELS_CELULA), int(y // PIXELS_CELULA))
+        e = snapshot.eventos[snapshot.posicao[i]]
+        cl = niveis.get(chave)
+        if cl is None: cl = niveis[chave] = Cluster()
+        cl.adicionar(lat, lon, st, e.get('tamanho'), e['id'])
+    return niveis
+
+
+def hierarquia(snapshot, ids):
+    """
+    Monta os clusters de todos os zooms de uma vez: agrupa no zoom máximo e sobe
+    nível a nível juntando as células filhas (no zoom z-1 a célula é a do zoom z dividida por 2).
+    """
+    niveis = {ZOOM_MAX: agrupar(snapshot, ids, ZOOM_MAX)}
+    for z in range(ZOOM_MAX - 1, ZOOM_MIN - 1, -1):
+        atual = {}
+        for (cx, cy), filho in niveis[z + 1].items():
+            chave = (cx >> 1, cy >> 1)
+            cl = atual.get(chave)
+            if cl is None: cl = atual[chave] = Cluster()
+            cl.juntar(filho)
+        niveis[z] = atual
+    return niveis
+
+
+class ClusterCache:
+    """Guarda a hierarquia completa (sem filtros) do snapshot atual"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._geracao = None
+        self._niveis = None
+
+    def niveis(self, snapshot):
+        with self._lock:
+            if self._geracao != snapshot.geracao:
+                self._niveis = hierarquia(snapshot, range(snapshot.indice.total))
+                self._geracao = snapshot.geracao
+            return self._niveis
+
+
+def clusters_visiveis(niveis, bbox):
+    """Clusters cujo centróide cai dentro de (oeste, sul, leste, norte), ou todos se bbox for None"""
+    resultado = []
+    for cl in niveis.values():
+        item = cl.to_dict()
+        if bbox is not None:
+            oeste, sul, leste, norte = bbox
+            if not (sul <= item['lat'] <= norte and oeste <= item['lon'] <= leste): continue
+        resultado.append(item)
+    return resultado
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import database
+
+INTERVALO_POLL = float(os.environ.get("LIKES_POLL_INTERVAL", 15))
+# updated_at recebe now() do início da transação: um commit lento aparece com horário anterior
+# ao cursor. Cada rodada volta essa margem e relê o trecho (contagens absolutas, reaplicar não muda nada)
+MARGEM_POLL = float(os.environ.get("LIKES_POLL_MARGIN", 10))
+
+
+class LikesStore:
+    """
+    Contagem de curtidas em memória, separada do cache de eventos.
+    Um poller em background busca só as linhas de `likes` alteradas desde a última
+    consulta (menos uma margem), e os votos aceitos localmente são aplicados na hora (otimista).
+    A primeira carga roda na própria requisição, para a página não sair com tudo zerado.
+    """
+
+    def __init__(self, intervalo=INTERVALO_POLL, margem=MARGEM_POLL):
+        self.intervalo = intervalo
+        self.margem = margem
+        self.contagens = {}
+        self.versao = 0           # muda sempre que alguma contagem muda
+        self._desde = None        # maior updated_at já visto (relógio do banco)
+        self._lock = threading.RLock()     # garantir_poller faz a primeira carga com ele adquirido
+        self._thread = None
+        self._pid = None
+
+    def get(self, bloco_id, padrao=0):
+        return self.contagens.get(bloco_id, padrao)
+
+    def aplicar(self, bloco_id, delta):
+        with self._lock:
+            self.contagens[bloco_id] = max(0, self.contagens.get(bloco_id, 0) + delta)
+            self.versao += 1
+
+    def atualizar(self):
+        """Uma rodada do poller: incremental quando possível, completa na primeira vez"""
+        consulta = self._desde
+        if consulta: consulta = (datetime.fromisoformat(consulta) - timedelta(seconds=self.margem)).isoformat()
+        novos, desde = database.get_likes_since(consulta)
+
+        with self._lock:
+            mudou = False
+            for bloco_id, count in novos.items():
+                if self.contagens.get(bloco_id) != count:
+                    self.contagens[bloco_id] = count
+                    mudou = True
+            if mudou: self.versao += 1
+            # Sem linhas novas o banco devolve o próprio cursor recuado: mantém o anterior
+            if desde is None or self._desde is None or \
+                    datetime.fromisoformat(desde) > datetime.fromisoformat(self._desde):
+                self._desde = desde
+
+    def _loop(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.atualizar()
+            except Exception as e:
+                print(f"Erro ao atualizar curtidas: {e}")
+
+    def garantir_poller(self):
+        # Confere o pid porque threads não sobrevivem ao fork dos workers
+        if self._thread is not None and self._pid == os.getpid(): return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid(): return
+            try:
+                self.atualizar()
+            except Exception as e:
+                print(f"Erro ao carregar curtidas: {e}")
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
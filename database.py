@@ -1,66 +1,342 @@
 import os
-from supabase import create_client, Client
+import sqlite3
+import threading
+
+from metricas import medir_banco, erro_banco
+from fila_votos import CONCORRENCIA
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY") or os.environ.get("NEXT_PUBLIC_SUPABASE_ANON_KEY")
 
-supabase: Client = None
+# Onde ficam votos e contagens: 'supabase' (padrão) ou 'sqlite' (arquivo local em SQLITE_PATH)
+VOTE_STORE = os.environ.get("VOTE_STORE", "supabase").lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "carnaval.db")
+# Pool HTTP do cliente do Supabase: uma conexão por pista da fila de votos, mais o poller de curtidas e
+# a semeadura do limitador. O keep-alive passa do intervalo do poller, então a conexão não é refeita a cada rodada.
+POOL_CONEXOES = int(os.environ.get("VOTE_POOL_SIZE", CONCORRENCIA + 2))
+POOL_KEEPALIVE = float(os.environ.get("VOTE_POOL_KEEPALIVE", 60))
+POOL_TIMEOUT = float(os.environ.get("VOTE_DB_TIMEOUT", 10))
+PARES_POR_DELETE = 50      # pares (bloco, UUID) por DELETE; a URL não pode passar do limite dos proxies
+# Classes SQLSTATE de dado inválido (22) e de restrição violada (23): culpa das linhas enviadas, não do banco
+CLASSES_ERRO_DADOS = ('22', '23')
 
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    except Exception as e:
-        print(f"Erro Supabase: {e}")
 
-def get_all_likes():
-    """Retorna contagem total para o cache"""
-    if not supabase: return {}
+def _opcoes_supabase():
+    """ClientOptions com o pool acima; None (padrões do cliente) em versões do supabase sem a opção httpx_client"""
     try:
-        response = supabase.table('likes').select('id, count').execute()
-        return {item['id']: item['count'] for item in response.data}
-    except: return {}
+        import httpx
+        from supabase import ClientOptions
+        limites = httpx.Limits(max_connections=POOL_CONEXOES, max_keepalive_connections=POOL_CONEXOES,
+                               keepalive_expiry=POOL_KEEPALIVE)
+        # Mesmos http2/redirects do cliente padrão do postgrest
+        return ClientOptions(httpx_client=httpx.Client(limits=limites, timeout=POOL_TIMEOUT, http2=True,
+                                                       follow_redirects=True))
+    except (ImportError, TypeError):
+        return None
 
-def update_like(bloco_id, user_id, ip_address, action='add'):
+
+def _erro_de_dados(e):
     """
-    Controla o Like com regras rígidas:
-    1. Unicidade de UUID (Database constraint)
-    2. Limite de 20 votos por IP neste bloco (Lógica Python)
+    Erro do Postgres causado pelas linhas do lote (APIError do postgrest com código SQLSTATE).
+    Conexão, timeout e 5xx não entram: esses sobem para a fila de votos tentar de novo o lote inteiro.
     """
-    if not supabase: return False
+    codigo = getattr(e, 'code', None)
+    return isinstance(codigo, str) and codigo[:2] in CLASSES_ERRO_DADOS
 
-    try:
-        if action == 'add':
-            # --- REGRA DO IP ---
-            # Verifica quantos votos este IP já deu NESTE bloco específico
-            # Se quiser limitar 20 votos no site todo, tire o .eq('bloco_id', bloco_id)
-            check_ip = supabase.table('votos') \
-                .select('*', count='exact') \
-                .eq('ip_address', ip_address) \
-                .eq('bloco_id', bloco_id) \
-                .execute()
-            
-            # Se já tem 20 ou mais, rejeita silenciosamente
-            if check_ip.count >= 20:
-                print(f"[Anti-Spam] IP {ip_address} atingiu limite para bloco {bloco_id}")
-                return False 
-
-            # --- INSERÇÃO ---
-            # Tenta inserir. Se o user_id já votou, o banco lança erro (Unique Violation)
-            supabase.table('votos').insert({
-                'user_id': user_id, 
-                'bloco_id': bloco_id,
-                'ip_address': ip_address
-            }).execute()
-            
-        elif action == 'remove':
-            # Remove o voto daquele UUID
-            supabase.table('votos').delete().match({
-                'user_id': user_id, 
-                'bloco_id': bloco_id
-            }).execute()
-            
-        return True
-    except Exception as e:
-        # Erros normais (duplicidade de UUID) são ignorados
-        # print(f"Log Database: {e}")
-        return False
\ No newline at end of file
+
+def _valor_postgrest(valor):
+    """Valor entre aspas para os filtros do PostgREST (ids podem ter vírgula/parênteses)"""
+    return '"' + str(valor).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _filtro_pares(pares):
+    """[(user_id, bloco_id)] -> or=(and(bloco_id.eq."b",user_id.in.("u1","u2")),...), um and() por bloco"""
+    por_bloco = {}
+    for user_id, bloco_id in pares: por_bloco.setdefault(bloco_id, []).append(user_id)
+    return '(' + ','.join(f"and(bloco_id.eq.{_valor_postgrest(b)},user_id.in.({','.join(map(_valor_postgrest, usuarios))}))"
+                          for b, usuarios in por_bloco.items()) + ')'
+
+
+class SupabaseVoteStore:
+    """Votos no Supabase (Postgres). O schema e o trigger de contagem estão em setup_db.py."""
+
+    def __init__(self, url=SUPABASE_URL, key=SUPABASE_KEY):
+        self.cliente = None
+        if url and key:
+            try:
+                from supabase import create_client
+                self.cliente = create_client(url, key, options=_opcoes_supabase())
+            except Exception as e:
+                print(f"Erro Supabase: {e}")
+
+    def get_all_likes(self):
+        """Retorna contagem total para o cache"""
+        if not self.cliente: return {}
+        try:
+            response = self.cliente.table('likes').select('id, count').execute()
+            return {item['id']: item['count'] for item in response.data}
+        except:
+            erro_banco('get_all_likes', 'supabase')
+            return {}
+
+    def get_likes_since(self, desde=None, pagina=1000):
+        """
+        Contagens da tabela likes alteradas desde `desde` (coluna updated_at) e o novo cursor.
+        Sem `desde` traz tudo. Se a consulta incremental falhar (ex.: coluna updated_at
+        ainda não criada), cai na contagem completa e devolve cursor None.
+        """
+        if not self.cliente: return {}, desde
+        try:
+            rows = []
+            while True:
+                query = self.cliente.table('likes').select('id, count, updated_at')
+                if desde: query = query.gte('updated_at', desde)
+                lote = query.order('updated_at').range(len(rows), len(rows) + pagina - 1).execute().data
+                rows.extend(lote)
+                if len(lote) < pagina: break
+        except Exception:
+            erro_banco('get_likes_since', 'supabase')
+            return self.get_all_likes(), None
+
+        cursor = rows[-1]['updated_at'] if rows else desde
+        return {item['id']: item['count'] for item in rows}, cursor
+
+    def update_like(self, bloco_id, user_id, ip_address, action='add'):
+        """
+        Controla o Like com regras rígidas:
+        1. Unicidade de UUID (Database constraint)
+        2. Limite de votos por IP neste bloco: checado antes, em memória (limitador.py)
+        """
+        if not self.cliente: return False
+
+        try:
+            if action == 'add':
+                # --- INSERÇÃO ---
+                # Tenta inserir. Se o user_id já votou, o banco lança erro (Unique Violation)
+                self.cliente.table('votos').insert({
+                    'user_id': user_id, 
+                    'bloco_id': bloco_id,
+                    'ip_address': ip_address
+                }).execute()
+                
+            elif action == 'remove':
+                # Remove o voto daquele UUID (só conta se havia voto para remover)
+                removidos = self.cliente.table('votos').delete().match({
+                    'user_id': user_id, 
+                    'bloco_id': bloco_id
+                }).execute()
+                return bool(removidos.data)
+                
+            return True
+        except Exception as e:
+            # Erros normais (duplicidade de UUID) são ignorados
+            # print(f"Log Database: {e}")
+            erro_banco('update_like', 'supabase')
+            return False
+
+    def get_votos_recentes(self, desde, pagina=1000):
+        """(ip_address, bloco_id, created_at) dos votos desde `desde` (ISO), para semear o limitador"""
+        if not self.cliente: return []
+        rows = []
+        try:
+            while True:
+                lote = self.cliente.table('votos').select('ip_address, bloco_id, created_at') \
+                    .gte('created_at', desde).order('created_at') \
+                    .range(len(rows), len(rows) + pagina - 1).execute().data
+                rows.extend(lote)
+                if len(lote) < pagina: break
+        except Exception as e:
+            erro_banco('get_votos_recentes', 'supabase')
+            print(f"Erro ao carregar votos recentes: {e}")
+        return [(r['ip_address'], r['bloco_id'], r['created_at']) for r in rows]
+
+    def aplicar_votos(self, adds, removes):
+        """
+        Grava um lote de votos (usado pela fila write-behind).
+        adds: [(user_id, bloco_id, ip_address)], removes: [(user_id, bloco_id)].
+        Os adds já passaram pelo limite por IP (limitador.py), então aqui não há contagem.
+        Retorna (inseridos, removidos) com o que de fato mudou no banco: pares (user_id, bloco_id)
+        inseridos e (user_id, bloco_id, ip_address) removidos, com o IP que estava gravado no voto.
+        Falhas de conexão/timeout sobem (a fila devolve o lote e tenta de novo); erro de dados
+        cai para linha a linha, e só as linhas recusadas ficam de fora.
+        """
+        if not self.cliente: return [], []
+
+        aceitos = [{'user_id': u, 'bloco_id': b, 'ip_address': ip} for u, b, ip in adds]
+        inseridos = []
+        if aceitos:
+            try:
+                # Votos repetidos do mesmo UUID são ignorados pelo banco (ON CONFLICT DO NOTHING)
+                res = self.cliente.table('votos').upsert(aceitos, on_conflict='user_id,bloco_id', ignore_duplicates=True).execute()
+                inseridos = [(r['user_id'], r['bloco_id']) for r in res.data]
+            except Exception as e:
+                if not _erro_de_dados(e): raise
+                erro_banco('aplicar_votos', 'supabase')
+                # Uma linha inválida derruba o lote inteiro: tenta uma a uma
+                for voto in aceitos:
+                    try:
+                        self.cliente.table('votos').insert(voto).execute()
+                        inseridos.append((voto['user_id'], voto['bloco_id']))
+                    except Exception as e:
+                        if not _erro_de_dados(e): raise
+
+        # --- REMOÇÃO --- (um DELETE com or=(and(...),...) para até PARES_POR_DELETE pares, em vez de um por bloco)
+        removidos = []
+        removes = sorted(removes, key=lambda par: par[1])     # pares do mesmo bloco juntos, no mesmo and()
+        for inicio in range(0, len(removes), PARES_POR_DELETE):
+            fatia = removes[inicio:inicio + PARES_POR_DELETE]
+            try:
+                res = self.cliente.table('votos').delete().or_(_filtro_pares(fatia)).execute()
+                removidos.extend((r['user_id'], r['bloco_id'], r.get('ip_address')) for r in res.data)
+            except Exception as e:
+                if not _erro_de_dados(e): raise
+                erro_banco('aplicar_votos', 'supabase')
+                # Ex.: um user_id que não é UUID: remove os outros um a um
+                for user_id, bloco_id in fatia:
+                    try:
+                        res = self.cliente.table('votos').delete().eq('bloco_id', bloco_id).eq('user_id', user_id).execute()
+                        removidos.extend((r['user_id'], r['bloco_id'], r.get('ip_address')) for r in res.data)
+                    except Exception as e:
+                        if not _erro_de_dados(e): raise
+
+        return inseridos, removidos
+
+
+# Mesmo schema do setup_db.py, em SQLite. Datas em ISO 8601 UTC (ordenáveis como texto).
+AGORA_SQLITE = "strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')"
+SCHEMA_SQLITE = f"""
+CREATE TABLE IF NOT EXISTS votos (
+  user_id TEXT NOT NULL,
+  bloco_id TEXT NOT NULL,
+  ip_address TEXT,
+  created_at TEXT NOT NULL DEFAULT ({AGORA_SQLITE}),
+  PRIMARY KEY (user_id, bloco_id)
+);
+CREATE INDEX IF NOT EXISTS votos_created_at_idx ON votos (created_at);
+
+CREATE TABLE IF NOT EXISTS likes (
+  id TEXT PRIMARY KEY,
+  count INTEGER NOT NULL DEFAULT 0,
+  updated_at TEXT NOT NULL DEFAULT ({AGORA_SQLITE})
+);
+CREATE INDEX IF NOT EXISTS likes_updated_at_idx ON likes (updated_at);
+
+CREATE TRIGGER IF NOT EXISTS trigger_contar_voto_insert AFTER INSERT ON votos
+BEGIN
+  INSERT INTO likes (id, count, updated_at) VALUES (NEW.bloco_id, 1, {AGORA_SQLITE})
+  ON CONFLICT (id) DO UPDATE SET count = likes.count + 1, updated_at = {AGORA_SQLITE};
+END;
+
+CREATE TRIGGER IF NOT EXISTS trigger_contar_voto_delete AFTER DELETE ON votos
+BEGIN
+  UPDATE likes SET count = MAX(0, likes.count - 1), updated_at = {AGORA_SQLITE} WHERE id = OLD.bloco_id;
+END;
+"""
+
+
+class SqliteVoteStore:
+    """
+    Votos num SQLite local em modo WAL, para rodar em um só nó (ou testar carga) sem o Supabase.
+    Cada thread tem sua conexão (o pool), e o sqlite3 reaproveita os statements já preparados.
+    """
+
+    def __init__(self, caminho=SQLITE_PATH):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA_SQLITE)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_all_likes(self):
+        """Retorna contagem total para o cache"""
+        return dict(self._conn().execute("SELECT id, count FROM likes"))
+
+    def get_likes_since(self, desde=None, pagina=None):
+        """Contagens alteradas desde `desde` (updated_at) e o novo cursor; sem `desde` traz tudo"""
+        if desde:
+            rows = self._conn().execute(
+                "SELECT id, count, updated_at FROM likes WHERE updated_at >= ? ORDER BY updated_at", (desde,)).fetchall()
+        else:
+            rows = self._conn().execute("SELECT id, count, updated_at FROM likes ORDER BY updated_at").fetchall()
+        cursor = rows[-1][2] if rows else desde
+        return {bloco_id: count for bloco_id, count, _ in rows}, cursor
+
+    def update_like(self, bloco_id, user_id, ip_address, action='add'):
+        """Mesmas regras do Supabase: um voto por UUID/bloco, e remove só conta se havia voto"""
+        conn = self._conn()
+        try:
+            if action == 'add':
+                cur = conn.execute("INSERT OR IGNORE INTO votos (user_id, bloco_id, ip_address) VALUES (?, ?, ?)",
+                                   (user_id, bloco_id, ip_address))
+                return cur.rowcount > 0
+            elif action == 'remove':
+                cur = conn.execute("DELETE FROM votos WHERE user_id = ? AND bloco_id = ?", (user_id, bloco_id))
+                return cur.rowcount > 0
+        except sqlite3.Error as e:
+            erro_banco('update_like', 'sqlite')
+            print(f"Erro SQLite: {e}")
+        return False
+
+    def get_votos_recentes(self, desde, pagina=None):
+        """(ip_address, bloco_id, created_at) dos votos desde `desde` (ISO), para semear o limitador"""
+        return self._conn().execute(
+            "SELECT ip_address, bloco_id, created_at FROM votos WHERE created_at >= ? ORDER BY created_at",
+            (desde,)).fetchall()
+
+    def aplicar_votos(self, adds, removes):
+        """Grava o lote inteiro numa única transação. Retorna (inseridos, removidos) como no Supabase."""
+        conn = self._conn()
+        inseridos, removidos = [], []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for user_id, bloco_id, ip_address in adds:
+                cur = conn.execute("INSERT OR IGNORE INTO votos (user_id, bloco_id, ip_address) VALUES (?, ?, ?)",
+                                   (user_id, bloco_id, ip_address))
+                if cur.rowcount > 0: inseridos.append((user_id, bloco_id))
+            for user_id, bloco_id in removes:
+                voto = conn.execute("SELECT ip_address FROM votos WHERE user_id = ? AND bloco_id = ?",
+                                    (user_id, bloco_id)).fetchone()
+                if voto is None: continue
+                conn.execute("DELETE FROM votos WHERE user_id = ? AND bloco_id = ?", (user_id, bloco_id))
+                removidos.append((user_id, bloco_id, voto[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return inseridos, removidos
+
+
+def criar_store(tipo=VOTE_STORE):
+    if tipo == 'sqlite': return SqliteVoteStore(SQLITE_PATH)
+    return SupabaseVoteStore()
+
+STORE = criar_store()
+
+# Funções de módulo: o resto do app continua chamando database.<função>
+# (cada uma com latência e falhas medidas em metricas.py, por operação e tipo de store)
+@medir_banco('get_all_likes', VOTE_STORE)
+def get_all_likes():
+    return STORE.get_all_likes()
+
+@medir_banco('get_likes_since', VOTE_STORE)
+def get_likes_since(desde=None, pagina=1000):
+    return STORE.get_likes_since(desde, pagina)
+
+@medir_banco('update_like', VOTE_STORE)
+def update_like(bloco_id, user_id, ip_address, action='add'):
+    return STORE.update_like(bloco_id, user_id, ip_address, action)
+
+@medir_banco('get_votos_recentes', VOTE_STORE)
+def get_votos_recentes(desde, pagina=1000):
+    return STORE.get_votos_recentes(desde, pagina)
+
+@medir_banco('aplicar_votos', VOTE_STORE)
+def aplicar_votos(adds, removes):
+    return STORE.aplicar_votos(adds, removes)
@@ -0,0 +1,110 @@
+import math
+import heapq
+
+TAMANHO_CELULA = 0.01      # graus (~1,1 km em BH)
+METROS_POR_GRAU = 111320.0
+
+
+def distancia_metros(lat1, lon1, lat2, lon2):
+    """Distância de haversine em metros"""
+    p1 = math.radians(lat1); p2 = math.radians(lat2)
+    dp = p2 - p1; dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(a))
+
+
+class GridIndex:
+    """
+    Grade uniforme de lat/lon montada na carga dos dados.
+    Cada célula guarda os índices brutos dos eventos geocodificados que caem nela.
+    """
+
+    def __init__(self, coords, tamanho=TAMANHO_CELULA):
+        self.tamanho = tamanho
+        self.coords = coords
+        self.celulas = {}
+        for i, (lat, lon) in enumerate(coords):
+            if lat and lon: self.celulas.setdefault(self._celula(lat, lon), []).append(i)
+        # Células extremas ocupadas (x0, x1, y0, y1): além delas os anéis de perto() só teriam células vazias
+        if self.celulas:
+            xs = [cx for cx, _ in self.celulas]; ys = [cy for _, cy in self.celulas]
+            self.extensao = (min(xs), max(xs), min(ys), max(ys))
+        else:
+            self.extensao = None
+
+    def _celula(self, lat, lon):
+        return (math.floor(lat / self.tamanho), math.floor(lon / self.tamanho))
+
+    def bbox(self, s_lat, n_lat, s_lng, n_lng):
+        """Eventos dentro do retângulo (bordas inclusivas)"""
+        if s_lat > n_lat or s_lng > n_lng: return set()
+
+        c0 = self._celula(s_lat, s_lng)
+        c1 = self._celula(n_lat, n_lng)
+        area = (c1[0] - c0[0] + 1) * (c1[1] - c0[1] + 1)
+
+        # Retângulo enorme (mapa muito afastado): sai mais barato varrer só as células ocupadas
+        if area > len(self.celulas):
+            celulas = [ids for (cx, cy), ids in self.celulas.items() if c0[0] <= cx <= c1[0] and c0[1] <= cy <= c1[1]]
+        else:
+            celulas = [self.celulas[(cx, cy)] for cx in range(c0[0], c1[0] + 1) for cy in range(c0[1], c1[1] + 1)
+                       if (cx, cy) in self.celulas]
+
+        resultado = set()
+        coords = self.coords
+        for ids in celulas:
+            for i in ids:
+                lat, lon = coords[i]
+                if s_lat <= lat <= n_lat and s_lng <= lon <= n_lng: resultado.add(i)
+        return resultado
+
+    def _anel(self, centro, r):
+        cx, cy = centro
+        if r == 0:
+            yield centro
+            return
+        for dx in range(-r, r + 1):
+            yield (cx + dx, cy - r)
+            yield (cx + dx, cy + r)
+        for dy in range(-r + 1, r):
+            yield (cx - r, cy + dy)
+            yield (cx + r, cy + dy)
+
+    def perto(self, lat, lon, raio, limite, aceitar=None):
+        """
+        Os `limite` eventos mais próximos dentro de `raio` metros, como pares (distância, índice bruto).
+        Percorre a grade em anéis e para assim que nenhum anel ainda não visitado pode ter algo mais perto.
+        """
+        if self.extensao is None: return []
+        centro = self._celula(lat, lon)
+        # Menor lado da célula em metros (a longitude encolhe com o cosseno da latitude)
+        lado = self.tamanho * METROS_POR_GRAU * max(math.cos(math.radians(lat)), 0.01)
+        x0, x1, y0, y1 = self.extensao
+        alcance = max(abs(centro[0] - x0), abs(centro[0] - x1), abs(centro[1] - y0), abs(centro[1] - y1))
+        max_aneis = min(int(raio // lado) + 1, alcance)
+        melhores = []   # heap de (-distância, índice) com os `limite` mais próximos até agora
+
+        def visitar(ids):
+            for i in ids:
+                if aceitar is not None and not aceitar(i): continue
+                d = distancia_metros(lat, lon, *self.coords[i])
+                if d > raio: continue
+                if len(melhores) < limite: heapq.heappush(melhores, (-d, i))
+                elif d < -melhores[0][0]: heapq.heapreplace(melhores, (-d, i))
+
+        # Mais células no caminho do que ocupadas (raio grande, ou célula estreita perto dos polos):
+        # sai mais barato olhar só as ocupadas do que andar pelos anéis vazios
+        if (2 * max_aneis + 1) ** 2 > len(self.celulas):
+            cx, cy = centro
+            for (x, y), ids in self.celulas.items():
+                if max(abs(x - cx), abs(y - cy)) <= max_aneis: visitar(ids)
+            return sorted((-d, i) for d, i in melhores)
+
+        for r in range(max_aneis + 1):
+            for cel in self._anel(centro, r):
+                visitar(self.celulas.get(cel, ()))
+
+            # Tudo que está além do anel r fica a pelo menos r * lado de distância
+            if len(melhores) >= limite and -melhores[0][0] <= r * lado: break
+
+        return sorted((-d, i) for d, i in melhores)
@@ -0,0 +1,56 @@
+import os
+import hashlib
+
+# Arquivos com hash no nome nunca mudam de conteúdo: o navegador pode guardar para sempre
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+
+
+def _com_hash(nome, digest):
+    base, ext = os.path.splitext(nome)
+    return f"{base}.{digest}{ext}"
+
+
+class Manifesto:
+    """
+    Nome com hash do conteúdo para cada arquivo de static/ (style.css -> style.3f2a1b9c4d5e.css),
+    montado uma vez na inicialização. As URLs saem do dicionário, sem stat por render;
+    o caminho inverso (nome com hash -> arquivo real) é usado para servir.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self.montar()
+
+    def montar(self):
+        nomes, originais, mtimes = {}, {}, {}
+        for raiz, _, arquivos in os.walk(self.pasta):
+            for arquivo in sorted(arquivos):
+                caminho = os.path.join(raiz, arquivo)
+                nome = os.path.relpath(caminho, self.pasta).replace(os.sep, '/')
+                with open(caminho, 'rb') as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()[:12]
+                nomes[nome] = _com_hash(nome, digest)
+                originais[nomes[nome]] = nome
+                mtimes[nome] = os.path.getmtime(caminho)
+        self.nomes, self.originais, self._mtimes = nomes, originais, mtimes
+        # Muda sempre que algum arquivo muda: vira a versão do cache do service worker
+        self.versao = hashlib.sha256(repr(sorted(nomes.items())).encode('utf-8')).hexdigest()[:12]
+
+    def nome(self, arquivo):
+        """Nome com hash (ou o próprio nome, para arquivos fora do manifesto)"""
+        return self.nomes.get(arquivo, arquivo)
+
+    def original(self, nome):
+        return self.originais.get(nome)
+
+    def verificar(self):
+        """Remonta se algum arquivo mudou (usado só em modo debug, onde os arquivos são editados com o app rodando)"""
+        for nome, mtime in self._mtimes.items():
+            try:
+                if os.path.getmtime(os.path.join(self.pasta, nome)) != mtime: break
+            except OSError:
+                break
+        else:
+            return False
+        self.montar()
+        return True
@@ -0,0 +1,183 @@
+import os
+import time
+import atexit
+import threading
+
+INTERVALO_FLUSH = float(os.environ.get("VOTE_FLUSH_INTERVAL", 0.3))
+TAMANHO_LOTE = int(os.environ.get("VOTE_BATCH_SIZE", 200))
+MAX_PENDENTES = int(os.environ.get("VOTE_QUEUE_MAX", 10000))
+# Lotes gravando ao mesmo tempo: com o banco remoto, cada lote passa a maior parte do tempo esperando a rede
+CONCORRENCIA = int(os.environ.get("VOTE_FLUSH_CONCURRENCY", 4))
+# Falhas seguidas do banco antes de desistir de um lote; a espera dobra a cada uma, até ESPERA_MAXIMA
+TENTATIVAS = int(os.environ.get("VOTE_FLUSH_RETRIES", 5))
+ESPERA_MAXIMA = float(os.environ.get("VOTE_RETRY_MAX_WAIT", 30))
+
+
+class VoteQueue:
+    """
+    Fila write-behind dos votos: o request só valida e enfileira, e uma thread
+    grava no banco em lote a cada INTERVALO_FLUSH segundos ou TAMANHO_LOTE votos.
+
+    Votos do mesmo (user_id, bloco_id) ainda pendentes são coalescidos: vale a última
+    ação, que é o estado final que o usuário quer (add→remove vira remove, remove→add vira add).
+    Cada add aceito ocupou uma vaga no limitador por IP; a fila lembra os IPs dessas vagas e
+    devolve (ao_liberar) as que não viraram linha no banco: adds coalescidos, adds que o banco
+    ignorou por duplicidade e votos removidos. A vaga de um voto removido é devolvida ao IP gravado
+    com o add (quem a ocupou), não ao IP de quem pediu a remoção.
+
+    Os votos são divididos em `concorrencia` pistas pelo hash de (user_id, bloco_id), cada
+    uma com sua thread: vários lotes ficam em voo ao mesmo tempo, e o mesmo voto cai sempre
+    na mesma pista, então as ações de um usuário num bloco continuam gravadas em ordem.
+
+    Se o banco falha, o lote volta para a pista e a próxima tentativa espera o dobro da anterior;
+    depois de `tentativas` falhas seguidas ele é descartado (contado em `descartados`, com as vagas devolvidas).
+    """
+
+    def __init__(self, gravar, ao_confirmar=None, ao_liberar=None, intervalo=INTERVALO_FLUSH, lote=TAMANHO_LOTE,
+                 max_pendentes=MAX_PENDENTES, concorrencia=CONCORRENCIA, tentativas=TENTATIVAS, espera_maxima=ESPERA_MAXIMA):
+        self._gravar = gravar                  # gravar(adds, removes) -> (inseridos, removidos com o ip_address do add)
+        self._ao_confirmar = ao_confirmar      # ao_confirmar(bloco_id, delta) para cada voto aplicado
+        self._ao_liberar = ao_liberar          # ao_liberar(ip_address, bloco_id) para cada vaga do limitador devolvida
+        self.intervalo = intervalo
+        self.lote = lote
+        self.max_pendentes = max_pendentes
+        self.tentativas = tentativas
+        self.espera_maxima = espera_maxima
+        self._pistas = [{} for _ in range(max(1, concorrencia))]
+        self._flush_locks = [threading.Lock() for _ in self._pistas]
+        self._falhas = [0 for _ in self._pistas]         # falhas seguidas de cada pista
+        self._retomar = [0.0 for _ in self._pistas]      # time.monotonic() da próxima tentativa depois de uma falha
+        self._total = 0
+        self._cond = threading.Condition()
+        self._threads = []
+        self._pid = None
+        self._parando = False
+        self.rejeitados = 0
+        self.gravados = 0
+        self.descartados = 0
+
+    def enfileirar(self, bloco_id, user_id, ip_address, acao):
+        """False quando a fila está cheia (backpressure: o chamador deve pedir para tentar de novo)"""
+        self._garantir_flusher()
+        chave = (user_id, bloco_id)
+        pista = self._pistas[hash(chave) % len(self._pistas)]
+        with self._cond:
+            if chave not in pista:
+                if self._total >= self.max_pendentes:
+                    self.rejeitados += 1
+                    return False
+                self._total += 1
+            anterior = pista.get(chave)
+            vagas = anterior[2] if anterior else ()
+            if acao == 'add': vagas += (ip_address,)
+            pista[chave] = (acao, ip_address, vagas)
+            if len(pista) >= self.lote: self._cond.notify_all()
+        return True
+
+    def pendentes(self):
+        return self._total
+
+    def flush(self):
+        """Grava tudo o que está pendente, pista por pista. Usado no encerramento do processo."""
+        for i in range(len(self._pistas)): self._flush_pista(i)
+
+    def _flush_pista(self, i):
+        with self._flush_locks[i]:
+            with self._cond:
+                lote, self._pistas[i] = self._pistas[i], {}
+                self._total -= len(lote)
+            if not lote: return
+
+            adds = [(user_id, bloco_id, ip) for (user_id, bloco_id), (acao, ip, _) in lote.items() if acao == 'add']
+            removes = [(user_id, bloco_id) for (user_id, bloco_id), (acao, _, _) in lote.items() if acao == 'remove']
+            try:
+                inseridos, removidos = self._gravar(adds, removes)
+            except Exception:
+                # A falha em si já é contada pelo database (carnaval_banco_erros_total)
+                self._devolver(i, lote)
+                return
+
+            with self._cond:
+                self._falhas[i] = 0
+                self.gravados += len(inseridos) + len(removidos)
+            if self._ao_confirmar:
+                for _, bloco_id in inseridos: self._ao_confirmar(bloco_id, 1)
+                for _, bloco_id, _ in removidos: self._ao_confirmar(bloco_id, -1)
+            if self._ao_liberar:
+                for ip, bloco_id in self._vagas_livres(lote, inseridos, removidos): self._ao_liberar(ip, bloco_id)
+
+    def _devolver(self, i, lote):
+        """Lote que o banco recusou: volta para a pista com backoff, ou é descartado depois de `tentativas` falhas"""
+        with self._cond:
+            self._falhas[i] += 1
+            if self._falhas[i] > self.tentativas:
+                self._falhas[i] = 0
+                self.descartados += len(lote)
+            else:
+                espera = min(self.intervalo * 2 ** self._falhas[i], self.espera_maxima)
+                self._retomar[i] = time.monotonic() + espera
+                pista = self._pistas[i]
+                for chave, (acao, ip, vagas) in lote.items():
+                    recente = pista.get(chave)
+                    if recente is None:
+                        pista[chave] = (acao, ip, vagas)
+                        self._total += 1
+                    else:
+                        # Voto novo da mesma chave chegou durante a gravação: a ação dele vence, as vagas se somam
+                        pista[chave] = (recente[0], recente[1], vagas + recente[2])
+                return
+        self._descartar(lote)
+
+    def _descartar(self, lote):
+        """Votos que não vão mais ser gravados: nenhuma das vagas deles fica ocupada"""
+        if self._ao_liberar:
+            for ip, bloco_id in self._vagas_livres(lote, (), ()): self._ao_liberar(ip, bloco_id)
+
+    @staticmethod
+    def _vagas_livres(lote, inseridos, removidos):
+        """(ip, bloco_id) das vagas do limitador que o lote não ocupou de fato"""
+        inseridos = set(inseridos)
+        for (user_id, bloco_id), (acao, _, vagas) in lote.items():
+            # Só o último add de um voto que virou linha continua ocupando vaga
+            if acao == 'add' and (user_id, bloco_id) in inseridos: vagas = vagas[:-1]
+            for ip in vagas: yield ip, bloco_id
+        for _, bloco_id, ip in removidos:
+            if ip: yield ip, bloco_id
+
+    def _loop(self, i):
+        while True:
+            with self._cond:
+                if len(self._pistas[i]) < self.lote and not self._parando:
+                    self._cond.wait(self.intervalo)
+                # Depois de uma falha espera o backoff inteiro (o notify de outra pista cheia também acorda esta)
+                while not self._parando and time.monotonic() < self._retomar[i]:
+                    self._cond.wait(self._retomar[i] - time.monotonic())
+                parando = self._parando
+            self._flush_pista(i)
+            if parando: return
+
+    def _garantir_flusher(self):
+        # Confere o pid porque threads não sobrevivem ao fork dos workers
+        if self._threads and self._pid == os.getpid(): return
+        with self._cond:
+            if self._threads and self._pid == os.getpid(): return
+            self._pid = os.getpid()
+            self._threads = [threading.Thread(target=self._loop, args=(i,), daemon=True) for i in range(len(self._pistas))]
+            for thread in self._threads: thread.start()
+            atexit.register(self.parar)
+
+    def parar(self, timeout=5):
+        """Encerramento: acorda a thread, espera o último flush e garante que nada ficou para trás"""
+        with self._cond:
+            self._parando = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            if thread.is_alive(): thread.join(timeout)
+        self.flush()
+        # O que voltou para a fila numa falha do último flush não tem mais quem grave
+        for i in range(len(self._pistas)):
+            with self._cond:
+                lote, self._pistas[i] = self._pistas[i], {}
+                self._total -= len(lote)
+                self.descartados += len(lote)
+            self._descartar(lote)
@@ -0,0 +1,113 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+# Endpoint injetável: aponte GEOCODE_URL para um servidor local para testar sem a API do Google
+GEOCODE_URL = os.environ.get("GEOCODE_URL", "https://maps.googleapis.com/maps/api/geocode/json")
+GEOCODE_WORKERS = int(os.environ.get("GEOCODE_WORKERS", 8))
+GEOCODE_QPS = float(os.environ.get("GEOCODE_QPS", 10))       # requisições por segundo, somando todas as threads
+GEOCODE_TENTATIVAS = 5
+
+
+class TokenBucket:
+    """Limita a taxa de chamadas compartilhada entre as threads (`taxa` por segundo, rajada de `capacidade`)"""
+
+    def __init__(self, taxa, capacidade=None):
+        self.taxa = taxa
+        self.capacidade = capacidade or max(1.0, taxa)
+        self._tokens = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.taxa
+            time.sleep(espera)
+
+    def esvaziar(self):
+        """Depois de um OVER_QUERY_LIMIT ninguém deve sair atirando: zera a rajada acumulada"""
+        with self._lock:
+            self._tokens = min(self._tokens, 0)
+
+
+class Geocoder:
+    """
+    Resolve endereços em lote: recebe {chave: texto de busca}, ignora o que já está
+    no cache e busca o resto em paralelo, respeitando o limite de taxa da API.
+    """
+
+    def __init__(self, api_key, criar_sessao=requests.Session, base_url=GEOCODE_URL,
+                 workers=GEOCODE_WORKERS, qps=GEOCODE_QPS, tentativas=GEOCODE_TENTATIVAS):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.workers = workers
+        self.tentativas = tentativas
+        self.bucket = TokenBucket(qps)
+        self._criar_sessao = criar_sessao
+        self._local = threading.local()
+
+    def _sessao(self):
+        # Uma sessão por thread: requests.Session não garante uso concorrente
+        sessao = getattr(self._local, 'sessao', None)
+        if sessao is None: sessao = self._local.sessao = self._criar_sessao()
+        return sessao
+
+    def buscar(self, consulta):
+        """(lat, lon) do primeiro resultado, ou None"""
+        for tentativa in range(self.tentativas):
+            self.bucket.adquirir()
+            try:
+                response = self._sessao().get(self.base_url, params={'address': consulta, 'key': self.api_key}, timeout=10)
+                data = response.json()
+                # Páginas de erro e respostas de cota podem vir sem 'status' (ou sem resultados)
+                status = data.get('status')
+                if status == 'OK':
+                    loc = data['results'][0]['geometry']['location']
+                    return loc['lat'], loc['lng']
+            except Exception as e:
+                print(f"   [x] Erro API para '{consulta}': {e}")
+                return None
+
+            if status != 'OVER_QUERY_LIMIT':
+                print(f"   [x] API retornou status {status} para '{consulta}'")
+                return None
+
+            # Backoff exponencial com jitter antes de tentar de novo
+            self.bucket.esvaziar()
+            time.sleep(min(30, 0.5 * 2 ** tentativa) * (0.5 + random.random()))
+
+        print(f"   [!] Cota de API excedida ou rate limit: desistindo de '{consulta}'")
+        return None
+
+    def resolver(self, pedidos, cache):
+        """
+        pedidos: {chave: texto de busca}. As coordenadas novas entram em `cache[chave]`
+        como {'lat', 'lon'}. Retorna quantas chamadas à API deram certo.
+        """
+        faltando = {chave: consulta for chave, consulta in pedidos.items() if chave and chave not in cache}
+        if not faltando: return 0
+        if not self.api_key:
+            print(f"   [!] Sem API Key. Ignorando coordenadas de {len(faltando)} endereços.")
+            return 0
+
+        print(f"   >>> Buscando {len(faltando)} endereços na API ({len(pedidos) - len(faltando)} já no cache)...")
+        sucesso = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futuros = {pool.submit(self.buscar, consulta): chave for chave, consulta in faltando.items()}
+            for futuro in as_completed(futuros):
+                coords = futuro.result()
+                if coords is None: continue
+                cache[futuros[futuro]] = {'lat': coords[0], 'lon': coords[1]}
+                sucesso += 1
+        return sucesso
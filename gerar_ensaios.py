@@ -1,228 +1,191 @@
-import os
-import json
-import requests
-import time
+import sys
 import re
+import tempfile
 from datetime import datetime
-from io import BytesIO
-from dotenv import load_dotenv
-import openpyxl 
 
-# Imports para Retry
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from ingestao import Fonte, Coleta, executar, formatar_data
+from incremental import Incremental, hash_conteudo
+from planilha import linhas_xlsx
 
-# Carrega variáveis de ambiente
-load_dotenv()
-
-GOOGLE_MAPS_API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY")
 SHEET_ID = "1THVJ8O_P19UkHq6DMgcfNF77fyD4lNWlmZA_rOM9FY4"
 SHEET_XLSX_URL = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/export?format=xlsx"
-CACHE_FILE = 'latlon_cache.json'
 OUTPUT_FILE = 'ensaios.json'
 
-# --- SESSÃO COM RETRY ---
-def get_retry_session(retries=3, backoff_factor=1, status_forcelist=(500, 502, 503, 504)):
-    session = requests.Session()
-    retry = Retry(
-        total=retries,
-        read=retries,
-        connect=retries,
-        backoff_factor=backoff_factor,
-        status_forcelist=status_forcelist,
-    )
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-    return session
-
-def load_cache():
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_cache(cache_data):
-    with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(cache_data, f, ensure_ascii=False, indent=4)
-
-def get_google_coords(local_text, cache, session):
-    key = local_text.strip()
-    if not key: return None, None, False
-    if key in cache: return cache[key]['lat'], cache[key]['lon'], False
-    if not GOOGLE_MAPS_API_KEY: return None, None, False
-
-    search_query = f"{key}, Belo Horizonte, MG"
-    url = f"https://maps.googleapis.com/maps/api/geocode/json?address={search_query}&key={GOOGLE_MAPS_API_KEY}"
-    
-    try:
-        response = session.get(url, timeout=10)
-        data = response.json()
-        if data['status'] == 'OK':
-            loc = data['results'][0]['geometry']['location']
-            cache[key] = {'lat': loc['lat'], 'lon': loc['lng']}
-            return loc['lat'], loc['lng'], True
-    except Exception as e:
-        print(f"   [x] Erro API para '{key}': {e}")
-    return None, None, False
-
-def extract_hyperlink(cell):
-    if cell.hyperlink:
-        return cell.hyperlink.target
-    if cell.value and isinstance(cell.value, str) and str(cell.value).upper().startswith('=HYPERLINK'):
-        match = re.search(r'"(http[^"]+)"', cell.value)
+def extract_hyperlink(valor, link):
+    """Link da célula: o hyperlink dela ou, se não tiver, a URL de uma fórmula =HYPERLINK(...)"""
+    if link:
+        return link
+    if valor and isinstance(valor, str) and str(valor).upper().startswith('=HYPERLINK'):
+        match = re.search(r'"(http[^"]+)"', valor)
         if match:
             return match.group(1)
     return ""
 
-def processar_ensaios():
-    print(">>> 1. Iniciando Sessão Segura e baixando Excel...")
-    session = get_retry_session()
+class FonteEnsaios(Fonte):
+    """Planilha XLSX dos ensaios (lida em streaming)"""
+    nome = 'ensaios'
+    output_file = OUTPUT_FILE
+    minimo = 3
+
+    def coletar(self, session, cache_geo, completo=False):
+        print(">>> 1. Iniciando Sessão Segura e baixando Excel...")
+        # IDs estáveis (nome + data) e hash por linha: só o que mudou é reprocessado
+        incremental = Incremental(self.output_file, lambda e: (e['titulo'], e['data'], 'ensaio'))
     
-    try:
-        response = session.get(SHEET_XLSX_URL, timeout=20)
-        if response.status_code != 200:
-            print(f"   [ERRO] Status Code: {response.status_code}")
-            return
-    except Exception as e:
-        print(f"   [ERRO] Falha no download: {e}")
-        return
-
-    print(">>> 2. Lendo arquivo Excel em memória...")
-    try:
-        wb = openpyxl.load_workbook(filename=BytesIO(response.content))
-        ws = wb.active 
-    except Exception as e:
-        print(f"   [ERRO] Falha ao abrir Excel: {e}")
-        return
-
-    cache_geo = load_cache()
-    ensaios_processados = []
-    api_calls = 0
-    dias_semana = {0: 'Seg', 1: 'Ter', 2: 'Qua', 3: 'Qui', 4: 'Sex', 5: 'Sáb', 6: 'Dom'}
-
-    idx_map = {} 
-    header_found = False
-
-    for row in ws.iter_rows():
-        row_text = [str(cell.value).upper() if cell.value else "" for cell in row]
+        try:
+            response = incremental.baixar(session, SHEET_XLSX_URL, timeout=20, completo=completo, stream=True)
+            if response is None:
+                print("   - Planilha sem alterações desde a última execução (304). Nada a fazer.")
+                return None
+            if response.status_code != 200:
+                print(f"   [ERRO] Status Code: {response.status_code}")
+                return None
+            # Vai direto para um arquivo temporário, em blocos: o download inteiro nunca fica na memória
+            planilha = tempfile.TemporaryFile()
+            with response:
+                for bloco in response.iter_content(chunk_size=64 * 1024): planilha.write(bloco)
+        except Exception as e:
+            print(f"   [ERRO] Falha no download: {e}")
+            return None
+
+        with planilha:
+            return self._ler(planilha, incremental, cache_geo)
+
+    def _ler(self, planilha, incremental, cache_geo):
+        print(">>> 2. Lendo arquivo Excel em modo streaming...")
+
+        ensaios_processados = []
+        pedidos_geo = {}          # endereço -> texto de busca (endereços repetidos viram um só)
+        chaves_geo = []           # chave de cada ensaio, na mesma ordem de ensaios_processados
+        reaproveitados = 0
+
+        idx_map = {} 
+        header_found = False
+
+        try:
+            linhas = linhas_xlsx(planilha)
+        except Exception as e:
+            print(f"   [ERRO] Falha ao abrir Excel: {e}")
+            return None
+
+        for row, links in linhas:
+            row_text = [str(valor).upper() if valor else "" for valor in row]
         
-        # Detecção de cabeçalho
-        keywords_found = 0
-        if any("BLOCO" in t for t in row_text): keywords_found += 1
-        if any("DATA" in t for t in row_text): keywords_found += 1
+            # Detecção de cabeçalho
+            keywords_found = 0
+            if any("BLOCO" in t for t in row_text): keywords_found += 1
+            if any("DATA" in t for t in row_text): keywords_found += 1
         
-        if keywords_found >= 2:
-            print("   - Cabeçalho detectado!")
-            for i, text in enumerate(row_text):
-                if "BLOCO" in text: idx_map['BLOCO'] = i
-                elif "DATA" in text: idx_map['DATA'] = i
-                elif "HORÁRIO" in text or "HORARIO" in text: idx_map['HORA'] = i
-                elif "LOCAL" in text: idx_map['LOCAL'] = i
-                elif "VALOR" in text: idx_map['VALOR'] = i
-            header_found = True
-            continue
-
-        if not header_found: continue
+            if keywords_found >= 2:
+                print("   - Cabeçalho detectado!")
+                for i, text in enumerate(row_text):
+                    if "BLOCO" in text: idx_map['BLOCO'] = i
+                    elif "DATA" in text: idx_map['DATA'] = i
+                    elif "HORÁRIO" in text or "HORARIO" in text: idx_map['HORA'] = i
+                    elif "LOCAL" in text: idx_map['LOCAL'] = i
+                    elif "VALOR" in text: idx_map['VALOR'] = i
+                header_found = True
+                continue
+
+            if not header_found: continue
 
-        try:
-            if len(row) <= max(idx_map.values(), default=0): continue
+            try:
+                if len(row) <= max(idx_map.values(), default=0): continue
 
-            cell_bloco = row[idx_map['BLOCO']]
-            nome = str(cell_bloco.value).strip() if cell_bloco.value else ""
+                valor_bloco = row[idx_map['BLOCO']]
+                nome = str(valor_bloco).strip() if valor_bloco else ""
             
-            if not nome or "responsável" in nome.lower() or "VOU PRO BLOCO" in nome.upper(): continue
+                if not nome or "responsável" in nome.lower() or "VOU PRO BLOCO" in nome.upper(): continue
 
-            cell_local = row[idx_map['LOCAL']]
-            local_raw = str(cell_local.value).strip() if cell_local.value else ""
+                valor_local = row[idx_map['LOCAL']]
+                local_raw = str(valor_local).strip() if valor_local else ""
             
-            cell_data = row[idx_map['DATA']]
-            data_raw = str(cell_data.value).strip() if cell_data.value else ""
+                valor_data = row[idx_map['DATA']]
+                data_raw = str(valor_data).strip() if valor_data else ""
             
-            cell_hora = row[idx_map['HORA']]
-            hora_raw = str(cell_hora.value).strip() if cell_hora.value else ""
+                valor_hora = row[idx_map['HORA']]
+                hora_raw = str(valor_hora).strip() if valor_hora else ""
             
-            link_ingresso = ""
-            if 'VALOR' in idx_map:
-                cell_valor = row[idx_map['VALOR']]
-                link_ingresso = extract_hyperlink(cell_valor)
-
-        except Exception as e:
-            continue
-
-        # --- Tratamento de Data ---
-        dt_iso = None
-        data_display = f"{data_raw} - {hora_raw}"
+                link_ingresso = ""
+                if 'VALOR' in idx_map:
+                    link_ingresso = extract_hyperlink(row[idx_map['VALOR']], links.get(idx_map['VALOR']))
+
+            except Exception as e:
+                continue
+
+            # --- Linha idêntica à da última execução: reaproveita o ensaio já processado ---
+            hash_linha = hash_conteudo(list(row) + [link_ingresso])
+            anterior = incremental.reaproveitar(hash_linha)
+            geo_key = cache_geo.chave(local_raw)
+            if anterior is not None:
+                if geo_key: pedidos_geo[geo_key] = f"{local_raw}, Belo Horizonte, MG"
+                chaves_geo.append(geo_key)
+                ensaios_processados.append(dict(anterior))
+                reaproveitados += 1
+                continue
+
+            # --- Tratamento de Data ---
+            dt_iso = None
+            data_display = f"{data_raw} - {hora_raw}"
         
-        try:
-            if isinstance(cell_data.value, datetime):
-                dia = cell_data.value.day
-                mes = cell_data.value.month
-            else:
-                dia, mes = map(int, data_raw.split('/'))
+            try:
+                if isinstance(valor_data, datetime):
+                    dia = valor_data.day
+                    mes = valor_data.month
+                else:
+                    dia, mes = map(int, data_raw.split('/'))
             
-            ano = 2025 if mes > 6 else 2026
+                ano = 2025 if mes > 6 else 2026
             
-            hora_clean = hora_raw.lower().replace('h', ':').replace('30:00', '30')
-            if hora_clean.endswith(':'): hora_clean += "00"
-            if ':' not in hora_clean and hora_clean.isdigit(): hora_clean += ":00"
+                hora_clean = hora_raw.lower().replace('h', ':').replace('30:00', '30')
+                if hora_clean.endswith(':'): hora_clean += "00"
+                if ':' not in hora_clean and hora_clean.isdigit(): hora_clean += ":00"
             
-            dt_obj = datetime(ano, mes, dia)
-            try:
-                parts = hora_clean.split(':')
-                h = int(parts[0])
-                m = int(parts[1]) if len(parts) > 1 and parts[1] else 0
-                dt_obj = dt_obj.replace(hour=h, minute=m)
+                dt_obj = datetime(ano, mes, dia)
+                try:
+                    parts = hora_clean.split(':')
+                    h = int(parts[0])
+                    m = int(parts[1]) if len(parts) > 1 and parts[1] else 0
+                    dt_obj = dt_obj.replace(hour=h, minute=m)
+                except: pass
+
+                dt_iso = dt_obj.isoformat()
+                data_display = formatar_data(dt_obj)
             except: pass
 
-            dt_iso = dt_obj.isoformat()
-            nome_dia = dias_semana[dt_obj.weekday()]
-            hora_formatada = dt_obj.strftime('%H:%M')
-            data_display = f"{dia:02d}/{mes:02d} ({nome_dia}) - {hora_formatada}"
-        except: pass
-
-        # --- Geolocalização com Retry ---
-        lat, lon, used = get_google_coords(local_raw, cache_geo, session)
-        if used:
-            api_calls += 1
-            save_cache(cache_geo)
-            time.sleep(0.2)
-
-        ensaios_processados.append({
-            "id": str(hash(nome + data_display + "ensaio")),
-            "titulo": nome,
-            "endereco": local_raw,
-            "local": "Belo Horizonte",
-            "data": data_display,
-            "dt_iso": dt_iso,
-            "categoria": "Ensaio", 
-            "categoria_display": "Ensaio",
-            "descricao": "", 
-            "link_ingresso": link_ingresso, 
-            "tamanho": 2, 
-            "lat": lat,
-            "lon": lon,
-            "is_ensaio": True,
-            "is_kids": False,
-            "is_lgbt": False,
-            "is_pet": False,
-            "status": "futuro"
-        })
-
-    # --- TRAVA DE SEGURANÇA ---
-    if len(ensaios_processados) < 3:
-        print(f"\n[!!!] ALERTA: Apenas {len(ensaios_processados)} ensaios encontrados.")
-        print("[!!!] Abortando salvamento.")
-        return
-
-    print(f"\n>>> 3. Salvando {len(ensaios_processados)} ensaios em '{OUTPUT_FILE}'...")
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump({"eventos": ensaios_processados}, f, ensure_ascii=False, indent=4)
-        
-    print(f"   - Chamadas API Google: {api_calls}")
+            # --- Geolocalização --- (só anota o endereço; a busca é feita em lote depois do loop)
+            if geo_key: pedidos_geo[geo_key] = f"{local_raw}, Belo Horizonte, MG"
+            chaves_geo.append(geo_key)
+
+            ensaio = {
+                "id": incremental.id_para({"titulo": nome, "data": data_display}),
+                "titulo": nome,
+                "endereco": local_raw,
+                "local": "Belo Horizonte",
+                "data": data_display,
+                "dt_iso": dt_iso,
+                "categoria": "Ensaio", 
+                "categoria_display": "Ensaio",
+                "descricao": "", 
+                "link_ingresso": link_ingresso, 
+                "tamanho": 2, 
+                "lat": None,
+                "lon": None,
+                "is_ensaio": True,
+                "is_kids": False,
+                "is_lgbt": False,
+                "is_pet": False,
+                "status": "futuro"
+            }
+            incremental.registrar(hash_linha, ensaio)
+            ensaios_processados.append(ensaio)
+
+        return Coleta(ensaios_processados, chaves_geo, pedidos_geo, None, reaproveitados, incremental)
+
+def processar_ensaios(completo=False):
+    # Só os ensaios, sem o snapshot combinado (para tudo de uma vez: python ingestao.py)
+    executar([FonteEnsaios()], completo=completo, snapshot=None)
 
 if __name__ == "__main__":
-    processar_ensaios()
\ No newline at end of file
+    # --completo ignora o ETag/Last-Modified salvo e baixa a planilha de qualquer forma
+    processar_ensaios(completo="--completo" in sys.argv)
@@ -0,0 +1,133 @@
+import os
+import re
+import json
+import hashlib
+
+from busca import normalizar
+
+_REVISAO_RE = re.compile(rb'"revisao"\s*:\s*"([0-9a-f]+)"')
+
+
+def id_estavel(*campos):
+    """ID determinístico (o hash() do Python muda a cada processo) a partir dos campos normalizados"""
+    chave = '|'.join(normalizar(str(c)) for c in campos)
+    return hashlib.sha1(chave.encode('utf-8')).hexdigest()[:16]
+
+
+def hash_conteudo(valor):
+    """Hash de qualquer coisa serializável em JSON (linha bruta da planilha, lista de eventos)"""
+    texto = json.dumps(valor, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+def arquivo_mudancas(output_file):
+    """'eventos.json' -> 'eventos.changes.json'"""
+    return re.sub(r'\.json$', '', output_file) + '.changes.json'
+
+
+def ler_revisao(caminho):
+    """Revisão gravada no topo do JSON, sem precisar carregar o arquivo inteiro"""
+    try:
+        with open(caminho, 'rb') as f:
+            m = _REVISAO_RE.search(f.read(512))
+    except OSError:
+        return None
+    return m.group(1).decode() if m else None
+
+
+def _gravar_json(caminho, dados):
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=4)
+    os.replace(temporario, caminho)
+
+
+class Incremental:
+    """
+    Estado da ingestão incremental de um arquivo de saída (eventos.json / ensaios.json):
+    - validadores HTTP da última planilha baixada (ETag / Last-Modified);
+    - hash do conteúdo de cada linha -> ID do evento gerado, para só reprocessar o que mudou;
+    - IDs já publicados, reaproveitados quando a chave natural do evento é a mesma
+      (assim as curtidas, gravadas por bloco_id, continuam valendo).
+    No fim, grava o JSON com uma `revisao` e um manifesto de mudanças para o app.
+    """
+
+    def __init__(self, output_file, chave_natural):
+        self.output_file = output_file
+        self.arquivo_estado = re.sub(r'\.json$', '', output_file) + '.estado.json'
+        self._chave_natural = chave_natural        # chave_natural(evento) -> tupla de campos
+
+        try:
+            with open(self.arquivo_estado, 'r', encoding='utf-8') as f:
+                self.estado = json.load(f)
+        except (OSError, ValueError):
+            self.estado = {}
+        self.hashes = self.estado.get('hashes', {})
+        self._validadores = None
+
+        try:
+            with open(output_file, 'r', encoding='utf-8') as f:
+                self.dados_anteriores = json.load(f)
+        except (OSError, ValueError):
+            self.dados_anteriores = {}
+        self.anteriores = {e['id']: e for e in self.dados_anteriores.get('eventos', [])}
+        self._ids_por_chave = {self._chave(e): e['id'] for e in self.anteriores.values()}
+        self.novos_hashes = {}
+
+    def _chave(self, evento):
+        return tuple(normalizar(str(c)) for c in self._chave_natural(evento))
+
+    def baixar(self, session, url, timeout=20, completo=False, **kwargs):
+        """
+        GET condicional. Retorna None quando a planilha não mudou (304) desde a última execução,
+        ou a resposta. `completo` ignora os validadores e baixa de qualquer forma.
+        """
+        headers = {}
+        if not completo:
+            if self.estado.get('etag'): headers['If-None-Match'] = self.estado['etag']
+            if self.estado.get('last_modified'): headers['If-Modified-Since'] = self.estado['last_modified']
+        response = session.get(url, headers=headers, timeout=timeout, **kwargs)
+        if response.status_code == 304: return None
+        self._validadores = {'etag': response.headers.get('ETag'),
+                             'last_modified': response.headers.get('Last-Modified')}
+        return response
+
+    def id_para(self, evento):
+        """ID publicado antes para esta chave natural, ou um novo ID estável"""
+        chave = self._chave(evento)
+        return self._ids_por_chave.get(chave) or id_estavel(*chave)
+
+    def reaproveitar(self, hash_linha):
+        """Evento da execução anterior se a mesma linha já foi processada (None = precisa processar)"""
+        evento = self.anteriores.get(self.hashes.get(hash_linha))
+        if evento is not None: self.novos_hashes[hash_linha] = evento['id']
+        return evento
+
+    def registrar(self, hash_linha, evento):
+        self.novos_hashes[hash_linha] = evento['id']
+
+    def salvar(self, eventos, **extra):
+        """Grava manifesto, JSON de saída (com `revisao`) e estado. Retorna o manifesto."""
+        revisao = hash_conteudo(eventos)[:16]
+        atuais = {e['id']: e for e in eventos}
+        manifesto = {
+            'base': self.dados_anteriores.get('revisao'),
+            'revisao': revisao,
+            'adicionados': [e for i, e in atuais.items() if i not in self.anteriores],
+            'atualizados': [e for i, e in atuais.items() if i in self.anteriores and self.anteriores[i] != e],
+            'removidos': [i for i in self.anteriores if i not in atuais],
+            'ordem': [e['id'] for e in eventos],
+            **{k: v for k, v in extra.items() if k != 'atualizado_em'},
+        }
+
+        # Nada mudou: não mexe nos arquivos (e o app nem percebe a execução)
+        if revisao != manifesto['base']:
+            # O app só aplica o manifesto se a `revisao` dele bater com a do JSON; se ler
+            # os dois no meio da troca, as revisões divergem e ele relê o JSON inteiro
+            _gravar_json(arquivo_mudancas(self.output_file), manifesto)
+            _gravar_json(self.output_file, {'revisao': revisao, 'eventos': eventos, **extra})
+
+        estado = dict(self._validadores or {k: self.estado.get(k) for k in ('etag', 'last_modified')})
+        estado['hashes'] = self.novos_hashes
+        _gravar_json(self.arquivo_estado, estado)
+        return manifesto
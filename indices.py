@@ -0,0 +1,142 @@
+import math
+from collections import namedtuple
+from datetime import datetime, timedelta
+from busca import SearchIndex, normalizar
+from espacial import GridIndex
+
+# Dias oficiais do Carnaval usados pelos filtros rápidos
+DIAS_OFICIAIS = {
+    'sab_oficial': datetime(2026, 2, 14).date(),
+    'dom_oficial': datetime(2026, 2, 15).date(),
+    'seg_oficial': datetime(2026, 2, 16).date(),
+    'ter_oficial': datetime(2026, 2, 17).date(),
+}
+TAMANHOS = {'grande': 3, 'medio': 2, 'pequeno': 1}
+PERIODOS = ('manha', 'tarde', 'noite')
+STATUS_RAPIDOS = ('em-andamento', 'em-breve', 'encerrando')
+
+_MAX_MEMO_CATEGORIA = 512
+
+
+def periodo_do_horario(h):
+    if 5 <= h < 12: return 'manha'
+    if 12 <= h < 18: return 'tarde'
+    return 'noite'
+
+
+class FilterIndex:
+    """
+    Índice invertido dos eventos brutos (EventStore), montado uma vez a cada carga de dados.
+    Cada posting é um set com os índices dos eventos no store.
+    """
+
+    def __init__(self, store):
+        self.total = len(store)
+        self.por_data = {}
+        self.por_bairro = {}
+        self.por_tamanho = {}
+        self.por_periodo = {p: set() for p in PERIODOS}
+        self.por_categoria = {}
+        self.coords = store.coordenadas()     # lê direto dos arrays de lat/lon do store
+        self._memo_categoria = {}
+
+        locais = store.textos['local']
+        categorias = store.textos['categoria']
+        for i in range(self.total):
+            dt = store.dt(i)
+            if dt:
+                self.por_data.setdefault(dt.date(), set()).add(i)
+                self.por_periodo[periodo_do_horario(dt.hour)].add(i)
+            self.por_bairro.setdefault(locais[i], set()).add(i)
+            self.por_tamanho.setdefault(store.get(i, 'tamanho'), set()).add(i)
+            self.por_categoria.setdefault((categorias[i] or '').lower(), set()).add(i)
+
+        self.busca = store.indice_busca if store.indice_busca is not None else SearchIndex(store)
+        self.espacial = GridIndex(self.coords)
+
+    def categoria(self, termo):
+        """Mantém a regra de substring (ex.: 'samba' casa com 'Pagode/Samba')"""
+        termo = termo.lower()
+        hit = self._memo_categoria.get(termo)
+        if hit is not None: return hit
+
+        hit = set()
+        for cat, ids in self.por_categoria.items():
+            if termo in cat: hit |= ids
+        if len(self._memo_categoria) < _MAX_MEMO_CATEGORIA: self._memo_categoria[termo] = hit
+        return hit
+
+
+def _uniao(postings):
+    resultado = set()
+    for p in postings: resultado.update(p)
+    return resultado
+
+
+def _intersecao(atual, novo):
+    if atual is None: return set(novo)
+    return atual.intersection(novo)
+
+
+def candidatos_filtros(indice, por_status, consulta):
+    """
+    Resolve quick filters, data, bairro e estilo como interseção de postings.
+    Retorna None quando nenhum desses filtros está ativo (todos os eventos servem).
+    """
+    quick_filters = consulta.quick_filters
+    ids = None
+
+    if quick_filters:
+        datas = [d for k, d in DIAS_OFICIAIS.items() if k in quick_filters]
+        if 'hoje' in quick_filters: datas.append(consulta.dia)
+        if 'amanha' in quick_filters: datas.append(consulta.dia + timedelta(days=1))
+        status = [s for s in STATUS_RAPIDOS if s in quick_filters]
+        tamanhos = [t for k, t in TAMANHOS.items() if k in quick_filters]
+        periodos = [p for p in PERIODOS if p in quick_filters]
+
+        if datas: ids = _intersecao(ids, _uniao(indice.por_data.get(d, ()) for d in datas))
+        if status: ids = _intersecao(ids, _uniao(por_status.get(s, ()) for s in status))
+        if tamanhos: ids = _intersecao(ids, _uniao(indice.por_tamanho.get(t, ()) for t in tamanhos))
+        if periodos: ids = _intersecao(ids, _uniao(indice.por_periodo[p] for p in periodos))
+
+    if consulta.data_filtro:
+        try:
+            target = datetime.strptime(consulta.data_filtro, '%Y-%m-%d').date()
+            ids = _intersecao(ids, indice.por_data.get(target, ()))
+        except ValueError: pass
+
+    if consulta.bairro: ids = _intersecao(ids, indice.por_bairro.get(consulta.bairro, ()))
+    if consulta.categoria: ids = _intersecao(ids, indice.categoria(consulta.categoria))
+    return ids
+
+
+# Forma canônica dos filtros: requisições equivalentes geram a mesma Consulta (e a mesma chave de cache)
+Consulta = namedtuple('Consulta', 'quick_filters dia data_filtro bairro categoria busca bbox tem_filtros')
+
+CASAS_BBOX = 4  # ~11 m: arredonda o retângulo do mapa para que pequenos arrastes reaproveitem o cache
+
+
+def normalizar_consulta(args, now):
+    quick_filters = tuple(sorted(set(args.getlist('quick_filter'))))
+    # 'hoje' e 'amanhã' mudam de sentido à meia-noite
+    dia = now.date() if ('hoje' in quick_filters or 'amanha' in quick_filters) else None
+    data_filtro = args.get('data_filtro') or ''
+    bairro = args.get('bairro') or ''
+    categoria = (args.get('categoria') or '').lower()
+    busca = normalizar(args.get('q', ''))
+
+    bbox = None
+    valores = [args.get(k) for k in ('sw_lat', 'ne_lat', 'sw_lng', 'ne_lng')]
+    if all(valores):
+        try:
+            s_lat, n_lat, s_lng, n_lng = (float(v) for v in valores)
+            if all(math.isfinite(v) for v in (s_lat, n_lat, s_lng, n_lng)):
+                # Arredonda sempre para fora: nunca some um bloco que estava na tela
+                f = 10 ** CASAS_BBOX
+                bbox = (math.floor(s_lat * f) / f, math.ceil(n_lat * f) / f,
+                        math.floor(s_lng * f) / f, math.ceil(n_lng * f) / f)
+        except ValueError:
+            pass
+
+    tem_filtros = bool(data_filtro or bairro or categoria or quick_filters or busca or args.get('ne_lat'))
+    return Consulta(quick_filters, dia, data_filtro, bairro, categoria, busca, bbox, tem_filtros)
@@ -0,0 +1,184 @@
+import os
+import sys
+import json
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from dotenv import load_dotenv
+# Imports para Retry (Tratamento de Erros de Rede)
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from geocoding import Geocoder
+from cache_geo import GeocodeCache
+from incremental import hash_conteudo
+from snapshot_dados import SNAPSHOT_FILE, salvar_snapshot
+
+# Carrega variáveis de ambiente
+load_dotenv()
+
+GOOGLE_MAPS_API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY")
+CACHE_FILE = 'latlon_cache.json'
+DIAS_SEMANA = {0: 'Seg', 1: 'Ter', 2: 'Qua', 3: 'Qui', 4: 'Sex', 5: 'Sáb', 6: 'Dom'}
+
+# O que uma fonte entrega para o pipeline:
+# - eventos: dicts já montados, ainda sem lat/lon;
+# - chaves_geo: chave do cache de coordenadas de cada evento (mesma ordem; '' = sem endereço);
+# - pedidos_geo: {chave: texto de busca} para o geocoding;
+# - estilos: lista de estilos musicais (ou None), reaproveitados: linhas que não mudaram;
+# - incremental: estado da ingestão incremental da fonte (None para fontes sem saída própria).
+Coleta = namedtuple('Coleta', 'eventos chaves_geo pedidos_geo estilos reaproveitados incremental')
+
+
+# --- SESSÃO COM RETRY (ROBUSTEZ) ---
+def get_retry_session(retries=3, backoff_factor=1, status_forcelist=(500, 502, 503, 504)):
+    """Cria uma sessão Requests que tenta novamente em caso de falha."""
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        read=retries,
+        connect=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+    )
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def formatar_data(dt_obj, com_hora=True):
+    """'14/02 (Sáb) - 10:00' (ou só '14/02 (Sáb)')"""
+    texto = f"{dt_obj.strftime('%d/%m')} ({DIAS_SEMANA[dt_obj.weekday()]})"
+    return f"{texto} - {dt_obj.strftime('%H:%M')}" if com_hora else texto
+
+
+class Fonte:
+    """
+    Uma origem de eventos. `coletar` baixa e interpreta os dados e devolve uma Coleta,
+    ou None quando não há nada novo (planilha sem alterações) ou deu erro.
+    """
+    nome = 'fonte'
+    output_file = None      # JSON próprio da fonte (estado incremental, IDs, manifesto)
+    minimo = 1              # menos eventos que isso = planilha quebrada, não salva
+
+    def coletar(self, session, cache_geo, completo=False):
+        raise NotImplementedError
+
+    def publicado(self):
+        """JSON já publicado pela fonte, usado no snapshot quando ela não trouxe nada novo"""
+        if not self.output_file: return {}
+        try:
+            with open(self.output_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+class FonteMock(Fonte):
+    """Eventos de um JSON local (ex.: eventos_mock.json), para rodar tudo sem rede"""
+
+    def __init__(self, caminho='eventos_mock.json'):
+        self.nome = f"mock ({caminho})"
+        self.caminho = caminho
+
+    def coletar(self, session, cache_geo, completo=False):
+        with open(self.caminho, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        eventos = [dict(e) for e in data.get('eventos', [])]
+        # Coordenadas já vêm no arquivo: nada para geocodificar
+        return Coleta(eventos, [''] * len(eventos), {}, data.get('estilos'), 0, None)
+
+
+def _coletar(fonte, completo, cache_geo):
+    print(f">>> [{fonte.nome}] Coletando...")
+    try:
+        return fonte.coletar(get_retry_session(), cache_geo, completo)
+    except Exception as e:
+        print(f"   [x] [{fonte.nome}] Falha na coleta: {e}")
+        return None
+
+
+def _desatualizado(snapshot, fontes):
+    """Snapshot ausente ou mais velho que o JSON de alguma fonte (ex.: gerar_dados.py rodou sozinho)"""
+    try:
+        gerado = os.path.getmtime(snapshot)
+    except OSError:
+        return True
+    return any(os.path.exists(f.output_file) and os.path.getmtime(f.output_file) > gerado
+               for f in fontes if f.output_file)
+
+
+def executar(fontes, completo=False, snapshot=SNAPSHOT_FILE):
+    """
+    Roda as fontes em paralelo, faz um único geocoding para todas (endereços repetidos
+    entre fontes viram uma chamada só), salva o JSON de cada fonte e, se `snapshot`
+    for informado, o snapshot compacto com todos os eventos que o app carrega.
+    """
+    cache_geo = GeocodeCache(CACHE_FILE)
+    with ThreadPoolExecutor(max_workers=len(fontes)) as pool:
+        coletas = list(pool.map(lambda f: _coletar(f, completo, cache_geo), fontes))
+
+    # --- GEOCODING EM LOTE --- (só as chaves fora do cache vão para a API, em paralelo)
+    pedidos_geo = {}
+    for coleta in coletas:
+        if coleta is not None: pedidos_geo.update(coleta.pedidos_geo)
+    geocoder = Geocoder(GOOGLE_MAPS_API_KEY, criar_sessao=get_retry_session)
+    api_calls = geocoder.resolver(pedidos_geo, cache_geo)
+    if api_calls: cache_geo.compactar()
+
+    todos_eventos, estilos, mudou = [], set(), False
+    for fonte, coleta in zip(fontes, coletas):
+        if coleta is None:
+            publicado = fonte.publicado()
+            todos_eventos.extend(publicado.get('eventos', []))
+            estilos.update(publicado.get('estilos', []))
+            continue
+
+        for evento, geo_key in zip(coleta.eventos, coleta.chaves_geo):
+            coords = cache_geo.get(geo_key) if geo_key else None
+            if coords: evento['lat'], evento['lon'] = coords['lat'], coords['lon']
+
+        # --- TRAVA DE SEGURANÇA (CRÍTICO) ---
+        # Se a planilha veio vazia ou deu erro de parseamento, NÃO sobrescreva o JSON antigo.
+        if len(coleta.eventos) < fonte.minimo:
+            print(f"\n[!!!] ALERTA: [{fonte.nome}] Apenas {len(coleta.eventos)} eventos encontrados.")
+            print("[!!!] Abortando salvamento para proteger os dados existentes.")
+            publicado = fonte.publicado()
+            todos_eventos.extend(publicado.get('eventos', []))
+            estilos.update(publicado.get('estilos', []))
+            continue
+
+        if coleta.incremental is not None:
+            extra = {'estilos': coleta.estilos} if coleta.estilos is not None else {}
+            print(f"\n>>> [{fonte.nome}] Salvando '{fonte.output_file}' e o manifesto de mudanças...")
+            mudancas = coleta.incremental.salvar(coleta.eventos, **extra, atualizado_em=datetime.now().isoformat())
+            print(f"    - Processados: {len(coleta.eventos)} ({coleta.reaproveitados} sem alteração)"
+                  f"\n    - Novos: {len(mudancas['adicionados'])}, alterados: {len(mudancas['atualizados'])}, removidos: {len(mudancas['removidos'])}")
+        todos_eventos.extend(coleta.eventos)
+        estilos.update(coleta.estilos or ())
+        mudou = True
+
+    print(f"\n>>> Chamadas API Google: {api_calls}")
+
+    if snapshot and (mudou or _desatualizado(snapshot, fontes)):
+        print(f">>> Gravando snapshot '{snapshot}' com {len(todos_eventos)} eventos...")
+        salvar_snapshot(snapshot, todos_eventos, sorted(estilos), hash_conteudo(todos_eventos)[:16])
+    return api_calls
+
+
+def main(argv):
+    from gerar_dados import FonteBlocos
+    from gerar_ensaios import FonteEnsaios
+
+    disponiveis = {'blocos': FonteBlocos, 'ensaios': FonteEnsaios, 'mock': FonteMock}
+    nomes = [a.split('=', 1)[1] for a in argv if a.startswith('--fontes=')]
+    nomes = nomes[0].split(',') if nomes else ['blocos', 'ensaios']
+    executar([disponiveis[n]() for n in nomes], completo="--completo" in argv)
+
+
+if __name__ == "__main__":
+    # python ingestao.py [--fontes=blocos,ensaios,mock] [--completo]
+    main(sys.argv[1:])
@@ -0,0 +1,158 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+
+LIMITE_VOTOS_IP = int(os.environ.get("RATE_LIMIT_VOTES", 20))
+JANELA = float(os.environ.get("RATE_LIMIT_WINDOW", 30 * 24 * 3600))   # temporada inteira, na prática
+MAX_CHAVES = int(os.environ.get("RATE_LIMIT_MAX_KEYS", 200000))
+LIMPEZA = float(os.environ.get("RATE_LIMIT_PRUNE_INTERVAL", 3600))   # segundos entre limpezas do SQLite
+
+
+class SlidingWindowLimiter:
+    """
+    Janela deslizante por chave (ex.: (ip, bloco_id)) guardada em memória.
+    As chaves são divididas em shards, cada um com seu lock, e cada shard é um LRU:
+    chaves sem votos dentro da janela saem primeiro e o total de chaves é limitado.
+    """
+
+    def __init__(self, limite=LIMITE_VOTOS_IP, janela=JANELA, shards=16, max_chaves=MAX_CHAVES):
+        self.limite = limite
+        self.janela = janela
+        self.max_por_shard = max(1, max_chaves // shards)
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+
+    def _shard(self, chave):
+        return self._shards[hash(chave) % len(self._shards)]
+
+    def _expirar(self, dados, agora):
+        # O início do OrderedDict tem as chaves usadas há mais tempo
+        while dados:
+            chave, marcas = next(iter(dados.items()))
+            if marcas and marcas[-1] > agora - self.janela and len(dados) <= self.max_por_shard: break
+            dados.popitem(last=False)
+
+    def permitir(self, chave, agora=None):
+        """Registra um voto e diz se ele cabe no limite da janela"""
+        agora = time.time() if agora is None else agora
+        lock, dados = self._shard(chave)
+        with lock:
+            marcas = dados.get(chave)
+            if marcas is None: marcas = dados[chave] = deque()
+            else: dados.move_to_end(chave)
+            while marcas and marcas[0] <= agora - self.janela: marcas.popleft()
+
+            permitido = len(marcas) < self.limite
+            if permitido: marcas.append(agora)
+            self._expirar(dados, agora)
+            return permitido
+
+    def liberar(self, chave):
+        """Devolve uma vaga (o voto mais recente foi removido)"""
+        lock, dados = self._shard(chave)
+        with lock:
+            marcas = dados.get(chave)
+            if marcas: marcas.pop()
+
+    def semear(self, votos):
+        """Carrega votos já existentes: iterável de (chave, timestamp)"""
+        for chave, ts in sorted(votos, key=lambda v: v[1]):
+            lock, dados = self._shard(chave)
+            with lock:
+                dados.setdefault(chave, deque()).append(ts)
+                dados.move_to_end(chave)
+
+
+class SqliteWindowLimiter:
+    """
+    Mesma regra, mas guardada num SQLite local compartilhado por todos os workers
+    da máquina (RATE_LIMIT_DB). O BEGIN IMMEDIATE serializa a checagem entre processos.
+    O permitir() só expira as marcas da própria chave; as de chaves que não votam mais
+    saem numa limpeza geral a cada `limpeza` segundos.
+    """
+
+    def __init__(self, caminho, limite=LIMITE_VOTOS_IP, janela=JANELA, limpeza=LIMPEZA):
+        self.caminho = caminho
+        self.limite = limite
+        self.janela = janela
+        self.limpeza = limpeza
+        self._proxima_limpeza = 0.0
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS limite_votos (chave TEXT NOT NULL, ts REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS limite_votos_chave_ts ON limite_votos (chave, ts)")
+        conn.execute("CREATE INDEX IF NOT EXISTS limite_votos_ts ON limite_votos (ts)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _texto(chave):
+        return '|'.join(str(p) for p in chave) if isinstance(chave, tuple) else str(chave)
+
+    def permitir(self, chave, agora=None):
+        agora = time.time() if agora is None else agora
+        if agora >= self._proxima_limpeza: self._limpar(agora)
+        chave = self._texto(chave)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM limite_votos WHERE chave = ? AND ts <= ?", (chave, agora - self.janela))
+            (usados,) = conn.execute("SELECT COUNT(*) FROM limite_votos WHERE chave = ?", (chave,)).fetchone()
+            permitido = usados < self.limite
+            if permitido: conn.execute("INSERT INTO limite_votos (chave, ts) VALUES (?, ?)", (chave, agora))
+            conn.execute("COMMIT")
+            return permitido
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _limpar(self, agora):
+        # Cada processo limpa no seu ritmo; repetir a limpeza de outro worker não custa quase nada
+        self._proxima_limpeza = agora + self.limpeza
+        self._conn().execute("DELETE FROM limite_votos WHERE ts <= ?", (agora - self.janela,))
+
+    def liberar(self, chave):
+        chave = self._texto(chave)
+        self._conn().execute(
+            "DELETE FROM limite_votos WHERE rowid = (SELECT rowid FROM limite_votos WHERE chave = ? ORDER BY ts DESC LIMIT 1)",
+            (chave,))
+
+    def semear(self, votos):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        # Outro worker pode ter semeado antes: só carrega se a tabela estiver vazia
+        if conn.execute("SELECT 1 FROM limite_votos LIMIT 1").fetchone() is None:
+            conn.executemany("INSERT INTO limite_votos (chave, ts) VALUES (?, ?)",
+                             ((self._texto(chave), ts) for chave, ts in votos))
+        conn.execute("COMMIT")
+
+
+def criar_limitador():
+    caminho = os.environ.get("RATE_LIMIT_DB")
+    if caminho: return SqliteWindowLimiter(caminho)
+    return SlidingWindowLimiter()
+
+
+def semear_do_banco(limitador):
+    """Carrega no limitador os votos ainda dentro da janela (roda uma vez, em background)"""
+    import database
+    from datetime import datetime, timezone
+
+    desde = datetime.fromtimestamp(time.time() - limitador.janela, timezone.utc).isoformat()
+    votos = []
+    for ip_address, bloco_id, criado in database.get_votos_recentes(desde):
+        try:
+            ts = datetime.fromisoformat(criado.replace('Z', '+00:00')).timestamp()
+        except (AttributeError, ValueError):
+            continue
+        votos.append(((ip_address, bloco_id), ts))
+    limitador.semear(votos)
+    print(f"Limitador semeado com {len(votos)} votos")
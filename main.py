@@ -1,16 +1,41 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, make_response, url_for
+from markupsafe import Markup
+from flask import Flask, render_template, stream_template, request, jsonify, send_from_directory, url_for, Response, g, has_request_context
 import os
 import json
+import math
+import gzip
+import hashlib
 import time
+import threading
+import uuid
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import database
+from snapshot import StatusEngine
+from armazem import EventStore
+from indices import candidatos_filtros, normalizar_consulta
+from cache import LRUCache
+from curtidas import LikesStore
+from fila_votos import VoteQueue
+from incremental import ler_revisao, arquivo_mudancas
+from snapshot_dados import SNAPSHOT_FILE, carregar_snapshot
+from mapeado import MMAP_FILE, abrir_mapeado, salvar_mapeado, trava
+from limitador import criar_limitador, semear_do_banco
+from clusters import ClusterCache, agrupar, clusters_visiveis, ZOOM_MIN, ZOOM_MAX
+from metricas import METRICAS, Cronometro, Amostrador
+from estaticos import Manifesto, CACHE_IMUTAVEL
 
 app = Flask(__name__)
 app.secret_key = 'carnaval_secret_key'
 
 load_dotenv()
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 @app.context_processor
 def inject_ga():
     return dict(ga_measurement_id=os.environ.get("GA_MEASUREMENT_ID"))
@@ -18,192 +43,575 @@ def inject_ga():
 GOOGLE_MAPS_API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY")
 
 CACHE_TIMEOUT = 300 
+PAGINA_TAMANHO = 60   # cards renderizados no servidor; o resto chega via /api/eventos?cursor=
+ARQUIVOS_DADOS = ('eventos.json', 'ensaios.json')
 DATA_CACHE = {
-    'eventos': [],
+    'eventos': EventStore(),  # colunas paralelas; os dicts só existem na saída (JSON/templates)
     'estilos': [],
-    'last_update': 0
+    'last_update': 0,
+    'arquivos': {},         # conteúdo de cada JSON (para aplicar só as mudanças na próxima carga)
+    'versao': 0,
+    'assinatura': None,     # mtime/tamanho dos JSON na última leitura
+    'marca': None           # hash do conteúdo dos arquivos (a versão é um contador deste processo)
 }
-
-def dated_url_for(endpoint, **values):
-    if endpoint == 'static':
-        filename = values.get('filename', None)
-        if filename:
-            file_path = os.path.join(app.root_path, endpoint, filename)
-            try:
-                values['q'] = int(os.path.getmtime(file_path))
-            except OSError: pass
+# Garante que só uma thread recarrega os dados por vez (single-flight)
+DATA_LOCK = threading.Lock()
+
+# Nome com hash de cada arquivo de static/, calculado uma vez na inicialização
+MANIFESTO = Manifesto(app.static_folder)
+# Lista de pré-cache e versão do service worker saem do mesmo manifesto
+CDN_PRECACHE = [
+    'https://unpkg.com/leaflet@1.9.4/dist/leaflet.css',
+    'https://unpkg.com/leaflet@1.9.4/dist/leaflet.js',
+    'https://fonts.googleapis.com/css2?family=Poppins:wght@400;600;700&display=swap',
+]
+
+def hashed_url_for(endpoint, **values):
+    if endpoint == 'static' and values.get('filename'):
+        values['filename'] = MANIFESTO.nome(values['filename'])
     return url_for(endpoint, **values)
 
 @app.context_processor
 def override_url_for():
-    return dict(url_for=dated_url_for)
+    return dict(url_for=hashed_url_for)
+
+def servir_estatico(filename):
+    """Nomes com hash são imutáveis (cache de um ano); nomes sem hash continuam com o cache curto padrão"""
+    original = MANIFESTO.original(filename)
+    if original is None: return send_from_directory(app.static_folder, filename)
+    response = send_from_directory(app.static_folder, original, max_age=31536000)
+    response.headers['Cache-Control'] = CACHE_IMUTAVEL
+    return response
+
+# Mesma regra /static/<path:filename> (url_for('static') continua valendo), servida pelo manifesto
+app.view_functions['static'] = servir_estatico
 
 def get_brasilia_time():
     utc_now = datetime.utcnow()
     return utc_now - timedelta(hours=3)
 
-def events_status_logic(eventos_raw):
-    eventos = [e.copy() for e in eventos_raw]
-    now = get_brasilia_time()
-    
-    for e in eventos:
-        if not e.get('_dt_obj'): 
-            e['status'] = 'futuro'; e['status_label'] = ''; e['sort_weight'] = 3
-            continue
-            
-        dt = e['_dt_obj']
-        diff = (dt - now).total_seconds() / 3600
-        
-        if 0 < diff <= 2:
-            e['status'] = 'em-breve'; e['status_label'] = 'Em Breve'; e['sort_weight'] = 0
-        elif -3 <= diff <= 0:
-            e['status'] = 'em-andamento'; e['status_label'] = 'Em Andamento'; e['sort_weight'] = 0
-        elif -5 <= diff < -3:
-            e['status'] = 'encerrando'; e['status_label'] = 'Encerrando'; e['sort_weight'] = 1
-        elif diff < -5:
-            e['status'] = 'encerrado'; e['status_label'] = 'Encerrado'; e['sort_weight'] = 4
-        elif dt.date() == now.date():
-            e['status'] = 'hoje'; e['status_label'] = 'Hoje'; e['sort_weight'] = 2
-        else:
-            e['status'] = 'futuro'; e['status_label'] = ''; e['sort_weight'] = 3
-            
-    eventos.sort(key=lambda x: (x['sort_weight'], x['_dt_obj'] if x['_dt_obj'] else datetime.max))
-    return eventos
-
-def load_raw_data_cached():
-    global DATA_CACHE
-    now_ts = time.time()
-
-    if DATA_CACHE['eventos'] and (now_ts - DATA_CACHE['last_update'] < CACHE_TIMEOUT):
-        return DATA_CACHE['eventos'], DATA_CACHE['estilos']
-
-    todos_eventos = []
-    estilos_set = set()
+STATUS_ENGINE = StatusEngine(get_brasilia_time)
+CLUSTER_CACHE = ClusterCache()
+# Curtidas ficam fora do snapshot: mudam a toda hora e não devem forçar recarga dos eventos
+LIKES_STORE = LikesStore()
+# Votos vão para o banco em lote; cada voto confirmado ajusta a contagem local
+# Limite de votos por IP/bloco checado em memória (ou no SQLite local em RATE_LIMIT_DB), antes da fila
+LIMITADOR = criar_limitador()
+if os.environ.get("RATE_LIMIT_SEED"):
+    threading.Thread(target=semear_do_banco, args=(LIMITADOR,), daemon=True).start()
+FILA_VOTOS = VoteQueue(database.aplicar_votos, ao_confirmar=LIKES_STORE.aplicar,
+                       ao_liberar=lambda ip, bloco_id: LIMITADOR.liberar((ip, bloco_id)))
+FILTROS_CACHE = LRUCache(max_itens=1024)
+FILTROS_GERACAO = None
+# (ETag, corpo JSON já serializado e comprimido), por (geração, versão das curtidas, consulta, encoding)
+RESPOSTAS_CACHE = LRUCache(max_itens=512, max_bytes=64 * 1024 * 1024, tamanho=lambda guardado: len(guardado[1]))
+# HTML de cada card já renderizado, por (id, status, curtidas, versão dos dados)
+FRAGMENTOS_CACHE = LRUCache(max_itens=20000, max_bytes=32 * 1024 * 1024, tamanho=lambda html: len(html.encode('utf-8')))
+FRAGMENTOS_VERSAO = None
+# Profiler por amostragem das requisições lentas (só liga com PROFILE_SLOW_MS)
+AMOSTRADOR = Amostrador()
+# Protege o /metrics quando definido (Authorization: Bearer <token>)
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+METRICAS.declarar('carnaval_dados_cache_total', 'counter', 'Consultas ao DATA_CACHE: hit, stale (servindo o antigo enquanto recarrega) ou miss')
+METRICAS.declarar('carnaval_dados_recarga_seconds', 'histogram', 'Tempo de recarga dos dados de eventos')
+for _nome, _tipo, _ajuda in (
+        ('carnaval_eventos', 'gauge', 'Eventos carregados'),
+        ('carnaval_dados_versao', 'gauge', 'Versão do DATA_CACHE'),
+        ('carnaval_dados_idade_seconds', 'gauge', 'Tempo desde a última recarga dos dados'),
+        ('carnaval_snapshot_eventos', 'gauge', 'Eventos no snapshot de status atual'),
+        ('carnaval_snapshot_geracao', 'gauge', 'Snapshots de status calculados'),
+        ('carnaval_curtidas_blocos', 'gauge', 'Blocos com contagem de curtidas em memória'),
+        ('carnaval_votos_pendentes', 'gauge', 'Votos na fila esperando o próximo lote'),
+        ('carnaval_votos_gravados_total', 'counter', 'Votos gravados pela fila'),
+        ('carnaval_votos_rejeitados_total', 'counter', 'Votos recusados com a fila cheia'),
+        ('carnaval_votos_descartados_total', 'counter', 'Votos aceitos que a fila desistiu de gravar depois de falhas seguidas do banco'),
+        ('carnaval_cache_hits_total', 'counter', 'Hits dos caches LRU'),
+        ('carnaval_cache_misses_total', 'counter', 'Misses dos caches LRU'),
+        ('carnaval_cache_evictions_total', 'counter', 'Itens removidos dos caches LRU por falta de espaço'),
+        ('carnaval_cache_itens', 'gauge', 'Itens nos caches LRU'),
+        ('carnaval_cache_bytes', 'gauge', 'Bytes nos caches LRU'),
+        ('carnaval_cache_hit_ratio', 'gauge', 'Proporção de hits dos caches LRU')):
+    METRICAS.declarar(_nome, _tipo, _ajuda)
+
+@contextmanager
+def etapa(nome):
+    """Cronometra um trecho da requisição atual: entra no Server-Timing e no histograma da etapa"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        cronometro = g.get('cronometro') if has_request_context() else None
+        if cronometro is not None: cronometro.registrar(nome, time.perf_counter() - inicio)
+
+@app.before_request
+def iniciar_cronometro():
+    if app.debug: MANIFESTO.verificar()
+    g.cronometro = Cronometro()
+    if AMOSTRADOR.ligado: g.amostra = AMOSTRADOR.iniciar()
+
+def _finalizar_requisicao(cronometro, rota, status, amostra, descricao):
+    total = cronometro.finalizar(rota, status)
+    if amostra is not None: AMOSTRADOR.terminar(amostra, total, descricao)
+    return total
+
+@app.after_request
+def registrar_tempos(response):
+    cronometro = g.get('cronometro')
+    if cronometro is None: return response
+    rota = request.endpoint or 'desconhecida'
+    amostra = g.get('amostra')
+    descricao = f"{request.method} {request.full_path}" if amostra is not None else None
+
+    if response.is_streamed:
+        # O corpo ainda vai ser gerado (render dos cards): o cabeçalho leva só as etapas até aqui,
+        # e o tempo do streaming entra nos histogramas como etapa 'render' quando a resposta fecha
+        response.headers['Server-Timing'] = cronometro.server_timing()
+        fim_view = time.perf_counter()
+        def ao_fechar():
+            cronometro.registrar('render', time.perf_counter() - fim_view)
+            _finalizar_requisicao(cronometro, rota, response.status_code, amostra, descricao)
+        response.call_on_close(ao_fechar)
+    else:
+        total = _finalizar_requisicao(cronometro, rota, response.status_code, amostra, descricao)
+        response.headers['Server-Timing'] = cronometro.server_timing(total)
+    return response
 
-    if os.path.exists('eventos.json'):
+@METRICAS.medidor
+def _medidores():
+    """Tamanhos e stats que já existem em outros objetos, lidos na hora da exportação"""
+    cache = DATA_CACHE
+    snap = STATUS_ENGINE.atual
+    yield 'carnaval_eventos', {}, len(cache['eventos'])
+    yield 'carnaval_dados_versao', {}, cache['versao']
+    yield 'carnaval_dados_idade_seconds', {}, round(time.time() - cache['last_update'], 3) if cache['last_update'] else -1
+    yield 'carnaval_snapshot_eventos', {}, len(snap.eventos) if snap else 0
+    yield 'carnaval_snapshot_geracao', {}, snap.geracao if snap else 0
+    yield 'carnaval_curtidas_blocos', {}, len(LIKES_STORE.contagens)
+    yield 'carnaval_votos_pendentes', {}, FILA_VOTOS.pendentes()
+    yield 'carnaval_votos_gravados_total', {}, FILA_VOTOS.gravados
+    yield 'carnaval_votos_rejeitados_total', {}, FILA_VOTOS.rejeitados
+    yield 'carnaval_votos_descartados_total', {}, FILA_VOTOS.descartados
+    for nome, lru in (('filtros', FILTROS_CACHE), ('respostas', RESPOSTAS_CACHE), ('fragmentos', FRAGMENTOS_CACHE)):
+        stats = lru.stats()
+        for campo in ('hits', 'misses', 'evictions'): yield f'carnaval_cache_{campo}_total', {'cache': nome}, stats[campo]
+        yield 'carnaval_cache_itens', {'cache': nome}, stats['itens']
+        yield 'carnaval_cache_bytes', {'cache': nome}, stats['bytes']
+        yield 'carnaval_cache_hit_ratio', {'cache': nome}, stats['hit_ratio']
+
+def _assinatura_arquivos():
+    """(nome, mtime, tamanho) de cada JSON: se nada mudou, não há por que reler"""
+    assinatura = []
+    for nome in ARQUIVOS_DADOS + (SNAPSHOT_FILE,):
         try:
-            with open('eventos.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                todos_eventos.extend(data.get('eventos', []))
-                for est in data.get('estilos', []): estilos_set.add(est)
-        except: pass
-
-    if os.path.exists('ensaios.json'):
+            st = os.stat(nome)
+            assinatura.append((nome, st.st_mtime_ns, st.st_size))
+        except OSError:
+            assinatura.append((nome, None, None))
+    return tuple(assinatura)
+
+def _marca_dados(assinatura):
+    """Hash do conteúdo dos arquivos de dados: o mesmo em todos os workers e depois de um reinício"""
+    h = hashlib.sha1()
+    for nome, mtime, _ in assinatura:
+        if mtime is None: continue
+        h.update(nome.encode('utf-8'))
         try:
-            with open('ensaios.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                todos_eventos.extend(data.get('eventos', []))
-        except: pass
-
-    for e in todos_eventos:
-        if e.get('dt_iso'): e['_dt_obj'] = datetime.fromisoformat(e['dt_iso'])
-        else: e['_dt_obj'] = None
+            with open(nome, 'rb') as f:
+                for bloco in iter(lambda: f.read(1 << 20), b''): h.update(bloco)
+        except OSError:
+            pass
+    return h.hexdigest()[:16]
+
+def _ler_arquivo(nome):
+    """Conteúdo de um JSON de dados: {'eventos', 'estilos', 'revisao'}"""
+    try:
+        with open(nome, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except: return {'eventos': EventStore(), 'estilos': [], 'revisao': None}
+    return {'eventos': EventStore(data.get('eventos', [])), 'estilos': data.get('estilos', []),
+            'revisao': data.get('revisao')}
+
+def _aplicar_mudancas(nome, atual):
+    """
+    Aplica o manifesto gerado pela ingestão incremental (eventos.changes.json) sobre o
+    conteúdo já carregado, sem reler o JSON inteiro. None se o manifesto não servir
+    (não existe, ou não liga a revisão carregada à revisão que está no arquivo agora).
+    """
+    if atual is None or not atual['revisao']: return None
+    revisao = ler_revisao(nome)
+    try:
+        with open(arquivo_mudancas(nome), 'r', encoding='utf-8') as f:
+            mudancas = json.load(f)
+    except: return None
+    if mudancas.get('base') != atual['revisao'] or mudancas.get('revisao') != revisao: return None
 
+    por_id = {e['id']: e for e in atual['eventos']}
+    for e in mudancas['adicionados'] + mudancas['atualizados']: por_id[e['id']] = e
+    try:
+        eventos = EventStore(por_id[i] for i in mudancas['ordem'])
+    except KeyError:
+        return None
+    return {'eventos': eventos, 'estilos': mudancas.get('estilos', atual['estilos']), 'revisao': revisao}
+
+def _montar_store(atual, assinatura):
+    """(store, estilos, arquivos) lidos do snapshot da ingestão ou dos JSON"""
+    # Snapshot do pipeline (python ingestao.py): já vem com datas e textos de busca prontos.
+    # Só vale se for mais novo que os JSON (gerar_dados.py pode ter rodado sozinho depois)
+    _, gerado, _ = assinatura[-1]
+    if gerado is not None and all(mtime is None or mtime <= gerado for _, mtime, _ in assinatura[:-1]):
+        carregado = carregar_snapshot(SNAPSHOT_FILE)
+        if carregado is not None:
+            eventos, estilos, _ = carregado
+            return EventStore(eventos), estilos, {}
+
+    # Só relê os arquivos que mudaram; se a ingestão deixou um manifesto, aplica só a diferença
+    anteriores = dict(zip(ARQUIVOS_DADOS, atual['assinatura'] or ()))
+    arquivos = {}
+    for nome, assinatura_arquivo in zip(ARQUIVOS_DADOS, assinatura):
+        conteudo = atual['arquivos'].get(nome)
+        if conteudo is None or anteriores.get(nome) != assinatura_arquivo:
+            conteudo = _aplicar_mudancas(nome, conteudo) or _ler_arquivo(nome)
+        arquivos[nome] = conteudo
+
+    estilos = set()
+    for nome in ARQUIVOS_DADOS: estilos.update(arquivos[nome]['estilos'])
+    return EventStore.juntar(arquivos[nome]['eventos'] for nome in ARQUIVOS_DADOS), sorted(estilos), arquivos
+
+def _carregar_compartilhado(atual, assinatura):
+    """
+    (store, estilos, arquivos) a partir do arquivo mapeado em memória (SHARED_SNAPSHOT_FILE),
+    compartilhado por todos os workers. Se ele não corresponde aos JSON atuais, o primeiro
+    worker que chegar monta o store e grava um arquivo novo; os demais esperam a trava e só mapeiam.
+    """
+    origem = [list(a) for a in assinatura]
+    mapeado = abrir_mapeado(MMAP_FILE)
+    if mapeado is None or mapeado['origem'] != origem:
+        with trava(MMAP_FILE):
+            mapeado = abrir_mapeado(MMAP_FILE)     # outro worker pode ter acabado de gravar
+            if mapeado is None or mapeado['origem'] != origem:
+                store, estilos, _ = _montar_store(atual, assinatura)
+                try:
+                    salvar_mapeado(MMAP_FILE, store, estilos, origem)
+                except OSError as e:
+                    print(f"Erro ao gravar {MMAP_FILE}: {e}")
+                    return store, estilos, {}
+                mapeado = abrir_mapeado(MMAP_FILE)
+                if mapeado is None: return store, estilos, {}
+    # O conteúdo por arquivo não é guardado: ficaria uma cópia privada dos eventos em cada worker
+    return mapeado['store'], mapeado['estilos'], {}
+
+def _recarregar_dados():
+    """Monta um DATA_CACHE novo e publica de uma vez só. Deve rodar com DATA_LOCK adquirido."""
+    global DATA_CACHE
+    inicio = time.perf_counter()
+    atual = DATA_CACHE
+    assinatura = _assinatura_arquivos()
+
+    # JSON iguais: só renova o prazo, sem trocar a versão (e sem recalcular snapshot/índices)
+    if assinatura == atual['assinatura']:
+        DATA_CACHE = dict(atual, last_update=time.time())
+        METRICAS.observar('carnaval_dados_recarga_seconds', time.perf_counter() - inicio, resultado='inalterado')
+        return
+
+    if MMAP_FILE: store, estilos, arquivos = _carregar_compartilhado(atual, assinatura)
+    else: store, estilos, arquivos = _montar_store(atual, assinatura)
+
+    DATA_CACHE = {
+        'eventos': store,
+        'estilos': estilos,
+        'arquivos': arquivos,
+        'last_update': time.time(),
+        'versao': atual['versao'] + 1,
+        'assinatura': assinatura,
+        'marca': _marca_dados(assinatura),
+    }
+    METRICAS.observar('carnaval_dados_recarga_seconds', time.perf_counter() - inicio, resultado='recarregado')
+
+def _recarregar_em_background():
     try:
-        likes_map = database.get_all_likes()
-        for e in todos_eventos:
-            eid = e['id']
-            e['likes'] = likes_map.get(eid, 0)
-    except: pass 
+        _recarregar_dados()
+    except Exception as e:
+        print(f"Erro ao recarregar dados: {e}")
+    finally:
+        DATA_LOCK.release()
+
+def _dados_cacheados():
+    """
+    Stale-while-revalidate com single-flight: na primeira carga todos esperam a mesma leitura;
+    depois, quando o cache expira, só uma thread recarrega em background e as demais
+    continuam servindo o DATA_CACHE antigo.
+    """
+    cache = DATA_CACHE
+    if cache['last_update'] == 0:
+        METRICAS.contar('carnaval_dados_cache_total', resultado='miss')
+        with DATA_LOCK:
+            if DATA_CACHE['last_update'] == 0: _recarregar_dados()
+        cache = DATA_CACHE
+    elif time.time() - cache['last_update'] >= CACHE_TIMEOUT:
+        METRICAS.contar('carnaval_dados_cache_total', resultado='stale')
+        if DATA_LOCK.acquire(blocking=False):
+            threading.Thread(target=_recarregar_em_background, daemon=True).start()
+    else:
+        METRICAS.contar('carnaval_dados_cache_total', resultado='hit')
+    return cache
 
-    DATA_CACHE['eventos'] = todos_eventos
-    DATA_CACHE['estilos'] = sorted(list(estilos_set))
-    DATA_CACHE['last_update'] = now_ts
-    return DATA_CACHE['eventos'], DATA_CACHE['estilos']
+def load_raw_data_cached():
+    cache = _dados_cacheados()
+    return cache['eventos'], cache['estilos'], cache['versao']
 
 def fetch_carnival_data():
-    eventos_raw, estilos = load_raw_data_cached()
-    return events_status_logic(eventos_raw), estilos
-
-def filtrar_eventos(eventos_todos, args):
-    has_active_filters = False
-    filtro_data = args.get('data_filtro')
-    filtro_bairro = args.get('bairro')
-    filtro_estilo = args.get('categoria')
-    quick_filters = args.getlist('quick_filter') 
-    busca = args.get('q', '').lower()
-    ne_lat = args.get('ne_lat')
-    
-    if filtro_data or filtro_bairro or filtro_estilo or quick_filters or busca or ne_lat: has_active_filters = True
-    eventos_filtrados = eventos_todos
-    now = get_brasilia_time()
-
-    if quick_filters:
-        target_dates = []
-        target_sizes = []
-        target_periods = []
-        if 'sab_oficial' in quick_filters: target_dates.append(datetime(2026, 2, 14).date())
-        if 'dom_oficial' in quick_filters: target_dates.append(datetime(2026, 2, 15).date())
-        if 'seg_oficial' in quick_filters: target_dates.append(datetime(2026, 2, 16).date())
-        if 'ter_oficial' in quick_filters: target_dates.append(datetime(2026, 2, 17).date())
-        if 'hoje' in quick_filters: target_dates.append(now.date())
-        if 'amanha' in quick_filters: target_dates.append(now.date() + timedelta(days=1))
-        
-        target_statuses = [s for s in ['em-andamento', 'em-breve', 'encerrando'] if s in quick_filters]
-        if 'grande' in quick_filters: target_sizes.append(3)
-        if 'medio' in quick_filters: target_sizes.append(2)
-        if 'pequeno' in quick_filters: target_sizes.append(1)
-        if 'manha' in quick_filters: target_periods.append('manha')
-        if 'tarde' in quick_filters: target_periods.append('tarde')
-        if 'noite' in quick_filters: target_periods.append('noite')
-        
-        if target_dates: eventos_filtrados = [e for e in eventos_filtrados if e['_dt_obj'] and e['_dt_obj'].date() in target_dates]
-        if target_statuses: eventos_filtrados = [e for e in eventos_filtrados if e['status'] in target_statuses]
-        if target_sizes: eventos_filtrados = [e for e in eventos_filtrados if e['tamanho'] in target_sizes]
-        if target_periods:
-            def check_period(dt):
-                h = dt.hour
-                matches = []
-                if 'manha' in target_periods: matches.append(5 <= h < 12)
-                if 'tarde' in target_periods: matches.append(12 <= h < 18)
-                if 'noite' in target_periods: matches.append(18 <= h or h < 5)
-                return any(matches)
-            eventos_filtrados = [e for e in eventos_filtrados if e['_dt_obj'] and check_period(e['_dt_obj'])]
-
-    if filtro_data:
-        try:
-            target = datetime.strptime(filtro_data, '%Y-%m-%d').date()
-            eventos_filtrados = [e for e in eventos_filtrados if e['_dt_obj'] and e['_dt_obj'].date() == target]
-        except: pass
-
-    if filtro_bairro: eventos_filtrados = [e for e in eventos_filtrados if e['local'] == filtro_bairro]
-    if filtro_estilo: eventos_filtrados = [e for e in eventos_filtrados if filtro_estilo.lower() in e['categoria'].lower()]
-    if busca: eventos_filtrados = [e for e in eventos_filtrados if busca in e['titulo'].lower() or busca in e['endereco'].lower()]
-        
-    ne_lng = args.get('ne_lng')
-    sw_lat = args.get('sw_lat')
-    sw_lng = args.get('sw_lng')
-
-    if ne_lat and ne_lng and sw_lat and sw_lng:
-        try:
-            n_lat = float(ne_lat); n_lng = float(ne_lng); s_lat = float(sw_lat); s_lng = float(sw_lng)
-            eventos_filtrados = [e for e in eventos_filtrados if e['lat'] and e['lon'] and s_lat <= e['lat'] <= n_lat and s_lng <= e['lon'] <= n_lng]
-        except ValueError: pass
-    
-    return eventos_filtrados, has_active_filters
+    LIKES_STORE.garantir_poller()
+    with etapa('dados'):
+        cache = _dados_cacheados()
+    with etapa('status'):
+        snapshot = STATUS_ENGINE.obter(cache['eventos'], cache['versao'], cache['marca'])
+    return snapshot, cache['estilos']
+
+def filtrar_ids(snapshot, consulta):
+    """Índices brutos que passam nos filtros (None = todos)"""
+    if not consulta.tem_filtros: return None
+
+    indice = snapshot.indice
+    ids = candidatos_filtros(indice, snapshot.por_status, consulta)
+    if consulta.busca: ids = indice.busca.contem(consulta.busca, ids)
+
+    if consulta.bbox:
+        s_lat, n_lat, s_lng, n_lng = consulta.bbox
+        hits = indice.espacial.bbox(s_lat, n_lat, s_lng, n_lng)
+        ids = hits if ids is None else hits.intersection(ids)
+
+    return ids
+
+def filtrar_eventos(snapshot, consulta):
+    """(ids, eventos na ordem de exibição), com cache LRU por geração do snapshot + consulta normalizada"""
+    global FILTROS_GERACAO
+    # Snapshot novo (dados recarregados ou fronteira de status): o que estava no cache não serve mais
+    if FILTROS_GERACAO != snapshot.geracao:
+        FILTROS_CACHE.clear()
+        FILTROS_GERACAO = snapshot.geracao
+
+    chave = (snapshot.geracao, consulta)
+    resultado = FILTROS_CACHE.get(chave)
+    if resultado is None:
+        ids = filtrar_ids(snapshot, consulta)
+        eventos = snapshot.eventos if ids is None else tuple(snapshot.materializar(ids))
+        resultado = (ids, eventos)
+        FILTROS_CACHE.set(chave, resultado)
+    return resultado
+
+def marca_lista(snapshot, consulta):
+    """
+    Identifica a ordem da lista filtrada: mesmos dados, mesmo intervalo entre fronteiras de status
+    e mesmo dia (para 'hoje'/'amanhã'). Não depende de contadores do processo, então vale em qualquer worker.
+    """
+    return hashlib.sha1(repr((snapshot.marca, snapshot.proxima_fronteira, consulta.dia)).encode('utf-8')).hexdigest()[:10]
+
+def pagina_eventos(eventos, cursor, marca):
+    """
+    Fatia da lista a partir do cursor ("<posição do próximo card>.<marca da lista>") e o cursor da
+    página seguinte. Se a marca mudou desde a página anterior (fronteira de status, dados novos), a
+    posição antiga não vale mais: um card pode ter passado para antes dela. Aí a fatia vai do início
+    até o fim da página pedida, com reiniciar=True para o navegador trocar os cards que já tinha.
+    Retorna (página, início, próximo cursor, reiniciar).
+    """
+    posicao, _, marca_cursor = (cursor or '').partition('.')
+    try:
+        inicio = max(0, int(posicao or 0))
+    except ValueError:
+        inicio = 0
+    fim = inicio + PAGINA_TAMANHO
+    reiniciar = inicio > 0 and marca_cursor != marca
+    if reiniciar: inicio = 0
+    return eventos[inicio:fim], inicio, (f'{fim}.{marca}' if fim < len(eventos) else None), reiniciar
+
+@app.template_global()
+def card(evento, versao):
+    """
+    HTML do card (card.html). O markup só depende dos dados do evento, do status e das
+    curtidas, então sai do cache até algum deles mudar: uma fronteira de status ou uma
+    curtida nova mudam a chave, e dados novos (versão maior) esvaziam o cache.
+    """
+    global FRAGMENTOS_VERSAO
+    if FRAGMENTOS_VERSAO is None or versao > FRAGMENTOS_VERSAO:
+        FRAGMENTOS_CACHE.clear()
+        FRAGMENTOS_VERSAO = versao
+
+    curtidas = LIKES_STORE.get(evento['id'])
+    chave = (evento['id'], evento['status'], curtidas, versao)
+    html = FRAGMENTOS_CACHE.get(chave)
+    if html is None:
+        # A contagem vai fixa para o template: o HTML guardado corresponde exatamente à chave
+        html = Markup(app.jinja_env.get_template('card.html').render(evento=evento, curtidas=curtidas))
+        FRAGMENTOS_CACHE.set(chave, html)
+    return html
 
 @app.route('/')
 def mostrar_eventos():
-    eventos_todos, estilos = fetch_carnival_data()
-    eventos_filtrados, has_filters = filtrar_eventos(eventos_todos, request.args)
-    bairros = sorted(list(set([e['local'] for e in eventos_todos if e['local']])))
-    total_ativos = len([e for e in eventos_filtrados if e.get('status') != 'encerrado'])
-
-    response = make_response(render_template('index.html', 
-                           eventos=eventos_filtrados, bairros=bairros, estilos=estilos,
-                           total=total_ativos, has_filters=has_filters,
+    snapshot, estilos = fetch_carnival_data()
+    with etapa('filtros'):
+        consulta = normalizar_consulta(request.args, get_brasilia_time())
+        _, eventos_filtrados = filtrar_eventos(snapshot, consulta)
+        total_ativos = len([e for e in eventos_filtrados if e.get('status') != 'encerrado'])
+    bairros = snapshot.bairros
+
+    pagina, _, proximo_cursor, _ = pagina_eventos(eventos_filtrados, None, marca_lista(snapshot, consulta))
+
+    # Streaming: o navegador recebe o topo da página enquanto os cards ainda são renderizados
+    response = Response(stream_template('index.html', 
+                           eventos=pagina, inicio=0, proximo_cursor=proximo_cursor,
+                           bairros=bairros, estilos=estilos,
+                           total=total_ativos, has_filters=consulta.tem_filtros, versao_dados=snapshot.versao,
                            google_maps_api_key=GOOGLE_MAPS_API_KEY))
     response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
     return response
 
+def evento_publico(e):
+    """Dict serializável do evento (materializado a partir da visão do store) com a curtida atual"""
+    item = dict(e)
+    item['likes'] = LIKES_STORE.get(e['id'])
+    return item
+
+def escolher_encoding():
+    aceitos = request.accept_encodings
+    if brotli is not None and aceitos['br']: return 'br'
+    if aceitos['gzip']: return 'gzip'
+    return 'identity'
+
+def resposta_json_cacheada(snapshot, chave, gerar):
+    """
+    Responde JSON com ETag derivado do próprio corpo: o mesmo conteúdo tem o mesmo ETag em
+    qualquer worker e depois de um reinício. Geração do snapshot e versão das curtidas são
+    contadores deste processo, então só servem de chave do LRU, que guarda ETag e corpo comprimido
+    para que consultas repetidas respondam 304 (ou o corpo pronto) sem serializar nem comprimir de novo.
+    """
+    encoding = escolher_encoding()
+    chave_cache = (snapshot.geracao, LIKES_STORE.versao, chave, encoding)
+    guardado = RESPOSTAS_CACHE.get(chave_cache)
+    if guardado is None:
+        dados = gerar()
+        with etapa('serializar'):
+            corpo = (app.json.dumps(dados) + '\n').encode('utf-8')
+        etag = hashlib.sha1(corpo).hexdigest()[:20]
+        with etapa('comprimir'):
+            if encoding == 'br': corpo = brotli.compress(corpo, quality=5)
+            elif encoding == 'gzip': corpo = gzip.compress(corpo, compresslevel=6)
+        guardado = (etag, corpo)
+        RESPOSTAS_CACHE.set(chave_cache, guardado)
+    etag, corpo = guardado
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(corpo, mimetype='application/json')
+        if encoding != 'identity': response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag, weak=True)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/eventos')
 def api_eventos():
-    eventos_todos, _ = fetch_carnival_data()
-    eventos_filtrados, _ = filtrar_eventos(eventos_todos, request.args)
-    geocoded = [e for e in eventos_filtrados if e['lat'] and e['lon']]
-    for e in geocoded: 
-        if '_dt_obj' in e: del e['_dt_obj']
-    return jsonify(geocoded)
+    snapshot, _ = fetch_carnival_data()
+    consulta = normalizar_consulta(request.args, get_brasilia_time())
+    cursor = request.args.get('cursor')
+
+    def gerar():
+        with etapa('filtros'):
+            _, eventos_filtrados = filtrar_eventos(snapshot, consulta)
+
+        # Com cursor devolve a próxima página de cards da lista (HTML pronto), e não os pontos do mapa
+        if cursor is not None:
+            pagina, inicio, proximo_cursor, reiniciar = pagina_eventos(eventos_filtrados, cursor,
+                                                                       marca_lista(snapshot, consulta))
+            with etapa('render'):
+                html = render_template('cards.html', eventos=pagina, inicio=inicio, versao_dados=snapshot.versao)
+            return {'html': html, 'proximo_cursor': proximo_cursor, 'reiniciar': reiniciar}
+
+        # Os dicts do snapshot são compartilhados: monta a saída sem alterar o original
+        with etapa('montar'):
+            return [evento_publico(e) for e in eventos_filtrados if e['lat'] and e['lon']]
+
+    return resposta_json_cacheada(snapshot, ('eventos', consulta, cursor), gerar)
+
+@app.route('/api/eventos/perto')
+def api_eventos_perto():
+    try:
+        lat = float(request.args['lat']); lon = float(request.args['lon'])
+        # Comparações com nan são sempre falsas, então o intervalo também recusa nan/inf
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180): raise ValueError
+    except (KeyError, ValueError):
+        return jsonify({'status': 'error', 'msg': 'lat/lon inválidos'}), 400
+    try:
+        raio = max(50.0, min(float(request.args.get('raio', 1500)), 20000.0))
+        limite = max(1, min(int(request.args.get('limite', 20)), 100))
+    except ValueError:
+        return jsonify({'status': 'error', 'msg': 'raio/limite inválidos'}), 400
+
+    snapshot, _ = fetch_carnival_data()
+    # Só blocos que ainda vão acontecer ou estão rolando agora
+    proximos = snapshot.indice.espacial.perto(lat, lon, raio, limite, aceitar=lambda i: snapshot.status[i] != 'encerrado')
+    resultado = []
+    for dist, i in proximos:
+        e = snapshot.eventos[snapshot.posicao[i]]
+        item = evento_publico(e)
+        item['distancia'] = round(dist)
+        resultado.append(item)
+    return jsonify(resultado)
+
+@app.route('/api/clusters')
+def api_clusters():
+    try:
+        zoom = float(request.args.get('zoom', 13))
+        if not math.isfinite(zoom): raise ValueError
+        zoom = max(ZOOM_MIN, min(int(zoom), ZOOM_MAX))
+    except ValueError:
+        return jsonify({'status': 'error', 'msg': 'zoom inválido'}), 400
+
+    bbox = None
+    if request.args.get('bbox'):
+        try:
+            bbox = tuple(float(v) for v in request.args['bbox'].split(','))
+            if len(bbox) != 4 or not all(math.isfinite(v) for v in bbox): raise ValueError
+        except ValueError:
+            return jsonify({'status': 'error', 'msg': 'bbox deve ser oeste,sul,leste,norte'}), 400
+
+    snapshot, _ = fetch_carnival_data()
+    ids, _ = filtrar_eventos(snapshot, normalizar_consulta(request.args, get_brasilia_time()))
+    # Sem filtros usa a hierarquia pré-calculada do snapshot; com filtros agrupa só o zoom pedido
+    if ids is None: niveis = CLUSTER_CACHE.niveis(snapshot)[zoom]
+    else: niveis = agrupar(snapshot, ids, zoom)
+    return jsonify(clusters_visiveis(niveis, bbox))
+
+@app.route('/api/busca')
+def api_busca():
+    try:
+        limite = max(1, min(int(request.args.get('limite', 10)), 50))
+    except ValueError:
+        limite = 10
+
+    snapshot, _ = fetch_carnival_data()
+    ids = snapshot.indice.busca.sugerir(request.args.get('q', ''), limite, desempate=snapshot.posicao.__getitem__)
+    sugestoes = []
+    for i in ids:
+        e = snapshot.eventos[snapshot.posicao[i]]
+        sugestoes.append({'id': e['id'], 'titulo': e['titulo'], 'local': e['local'], 'data': e['data'], 'status': e['status']})
+    return jsonify(sugestoes)
+
+@app.route('/api/cache/stats')
+def api_cache_stats():
+    return jsonify({
+        'filtros': FILTROS_CACHE.stats(),
+        'respostas': RESPOSTAS_CACHE.stats(),
+        'fragmentos': FRAGMENTOS_CACHE.stats(),
+    })
+
+@app.route('/metrics')
+def metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return Response(status=401)
+    return Response(METRICAS.exportar(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/like/<id>', methods=['POST'])
 def api_like(id):
@@ -221,12 +629,30 @@ def api_like(id):
         if not user_id:
             return jsonify({'status': 'error', 'msg': 'UUID missing'}), 400
 
-        # Chama o DB com todas as informações
-        if database.update_like(id, user_id, ip_address, acao):
-            return jsonify({'status': 'ok'}), 200
-        else:
-            # Retorna OK mesmo se falhar (ignorado) para não alertar o spammer
+        # Votos que o banco recusaria de qualquer forma nem entram na fila
+        try:
+            uuid.UUID(str(user_id))
+        except ValueError:
+            return jsonify({'status': 'ignored'}), 200
+        if acao not in ('add', 'remove'):
             return jsonify({'status': 'ignored'}), 200
+
+        # --- REGRA DO IP --- (sem consulta ao banco: o limitador guarda a janela de cada IP/bloco)
+        with etapa('limite'):
+            permitido = acao != 'add' or LIMITADOR.permitir((ip_address, id))
+        if not permitido:
+            print(f"[Anti-Spam] IP {ip_address} atingiu limite para bloco {id}")
+            return jsonify({'status': 'ignored'}), 200
+
+        # Write-behind: a gravação no banco acontece em lote, fora do request
+        with etapa('fila'):
+            enfileirado = FILA_VOTOS.enfileirar(id, user_id, ip_address, acao)
+        if not enfileirado:
+            if acao == 'add': LIMITADOR.liberar((ip_address, id))
+            response = jsonify({'status': 'busy'})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        return jsonify({'status': 'ok'}), 200
     except Exception as e:
         return jsonify({'status': 'error', 'msg': str(e)}), 500
 
@@ -236,7 +662,13 @@ def serve_manifest():
 
 @app.route('/sw.js')
 def serve_sw():
-    return send_from_directory('static', 'sw.js', mimetype='application/javascript')
+    # O próprio sw.js não pode ficar em cache: é por ele que o navegador descobre a versão nova
+    precache = ['/', '/manifest.json'] + [hashed_url_for('static', filename=nome) for nome in MANIFESTO.nomes
+                                          if nome != 'manifest.json'] + CDN_PRECACHE
+    response = Response(render_template('sw.js', cache_name=f'carnaval-bh-{MANIFESTO.versao}', precache=precache),
+                        mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from collections.abc import Mapping, Sequence
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:     # Windows: sem trava entre processos (a troca do arquivo continua atômica)
+    fcntl = None
+
+from armazem import EventStore, CAMPOS_TEXTO, CAMPOS_INTERNADOS
+from busca import SearchIndex
+
+# Opcional (ex.: "dados.mmap"): vazio, cada worker monta os próprios dados. Ligado, quem grava
+# o arquivo remonta o store dos JSON inteiros, sem os manifestos da ingestão incremental
+MMAP_FILE = os.environ.get("SHARED_SNAPSHOT_FILE", "")
+FORMATO = 1
+_MAGICO = b'CBMM'
+_PREFIXO = struct.Struct('<4sIQ')        # mágico, formato, tamanho do cabeçalho
+_ALINHAMENTO = 8
+
+
+def _alinhar(n):
+    return (n + _ALINHAMENTO - 1) // _ALINHAMENTO * _ALINHAMENTO
+
+
+class ColunaTexto(Sequence):
+    """
+    Coluna de valores de texto num bloco de bytes: `fins` marca onde cada valor termina.
+    Tipo 0 = None, 1 = str (UTF-8), 2 = outro valor qualquer em JSON. Decodifica só no acesso.
+    """
+    __slots__ = ('_tipos', '_fins', '_dados')
+
+    def __init__(self, tipos, fins, dados):
+        self._tipos = tipos
+        self._fins = fins
+        self._dados = dados
+
+    def __getitem__(self, i):
+        if i < 0: i += len(self._tipos)
+        tipo = self._tipos[i]
+        if tipo == 0: return None
+        trecho = self._dados[self._fins[i - 1] if i else 0:self._fins[i]]
+        return str(trecho, 'utf-8') if tipo == 1 else json.loads(bytes(trecho))
+
+    def __len__(self):
+        return len(self._tipos)
+
+
+class ColunaTabela(Sequence):
+    """Coluna de poucos valores distintos: um código por evento apontando para a tabela (internada)"""
+    __slots__ = ('_tabela', '_codigos')
+
+    def __init__(self, tabela, codigos):
+        self._tabela = tabela
+        self._codigos = codigos
+
+    def __getitem__(self, i):
+        return self._tabela[self._codigos[i]]
+
+    def __len__(self):
+        return len(self._codigos)
+
+
+class Postings(Mapping):
+    """chave -> fatia de `ids` (memoryview), no lugar de um dict de sets"""
+    __slots__ = ('_posicao', '_fins', '_ids')
+
+    def __init__(self, chaves, fins, ids):
+        self._posicao = {chave: j for j, chave in enumerate(chaves)}
+        self._fins = fins
+        self._ids = ids
+
+    def __getitem__(self, chave):
+        j = self._posicao[chave]
+        return self._ids[self._fins[j - 1] if j else 0:self._fins[j]]
+
+    def __iter__(self):
+        return iter(self._posicao)
+
+    def __len__(self):
+        return len(self._posicao)
+
+
+def _texto(valores):
+    tipos, fins, partes, fim = array('B'), array('Q'), [], 0
+    for valor in valores:
+        if valor is None: tipo, dados = 0, b''
+        elif type(valor) is str: tipo, dados = 1, valor.encode('utf-8')
+        else: tipo, dados = 2, json.dumps(valor, ensure_ascii=False).encode('utf-8')
+        partes.append(dados)
+        fim += len(dados)
+        tipos.append(tipo); fins.append(fim)
+    return tipos, fins, array('B', b''.join(partes))
+
+
+def _postings(por_chave):
+    chaves = sorted(por_chave)
+    fins, ids = array('Q'), array('i')
+    for chave in chaves:
+        ids.extend(sorted(por_chave[chave]))
+        fins.append(len(ids))
+    return chaves, fins, ids
+
+
+def salvar_mapeado(caminho, store, estilos, origem):
+    """
+    Grava store + índice de busca num arquivo binário plano, pronto para mmap:
+    um cabeçalho JSON (formas, tabelas, extras, posição de cada seção) e depois as
+    colunas como arrays crus, alinhados em 8 bytes. `origem` identifica os dados de
+    onde o arquivo saiu (a assinatura dos JSON), para os workers saberem se ainda vale.
+    """
+    busca = store.indice_busca if store.indice_busca is not None else SearchIndex(store)
+    secoes = [('forma', store.forma), ('inicio', store.inicio), ('lat', store.lat), ('lon', store.lon),
+              ('tamanho', store.tamanho), ('flags', store.flags)]
+    tabelas = {}
+    for campo in CAMPOS_INTERNADOS:
+        indice, codigos = {}, array('I')
+        for valor in store.textos[campo]:
+            chave = json.dumps(valor)       # a tabela guarda o valor como veio (str, None, ...)
+            codigo = indice.get(chave)
+            if codigo is None:
+                codigo = indice[chave] = len(indice)
+                tabelas.setdefault(campo, []).append(valor)
+            codigos.append(codigo)
+        secoes.append((f'codigos.{campo}', codigos))
+    for campo, valores in [(c, store.textos[c]) for c in CAMPOS_TEXTO] + [('busca', busca.textos), ('titulos', busca.titulos)]:
+        tipos, fins, dados = _texto(valores)
+        secoes += [(f'tipos.{campo}', tipos), (f'fins.{campo}', fins), (f'dados.{campo}', dados)]
+    chaves_postings = {}
+    for nome, por_chave in (('trigramas', busca.por_trigrama), ('tokens', busca.por_token)):
+        chaves, fins, ids = _postings(por_chave)
+        chaves_postings[nome] = chaves
+        secoes += [(f'fins.{nome}', fins), (f'ids.{nome}', ids)]
+
+    posicoes, deslocamento = {}, 0
+    for nome, coluna in secoes:
+        tamanho = len(coluna) * coluna.itemsize
+        posicoes[nome] = [deslocamento, tamanho, coluna.typecode]
+        deslocamento = _alinhar(deslocamento + tamanho)
+
+    cabecalho = json.dumps({
+        'total': len(store), 'origem': origem, 'gerado_em': datetime.now().isoformat(),
+        'estilos': estilos, 'formas': [list(f) for f in store.formas], 'tabelas': tabelas,
+        'extras': {str(i): extras for i, extras in store.extras.items()},
+        'postings': chaves_postings, 'secoes': posicoes,
+    }, ensure_ascii=False).encode('utf-8')
+    inicio_dados = _alinhar(_PREFIXO.size + len(cabecalho))
+
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(_PREFIXO.pack(_MAGICO, FORMATO, len(cabecalho)))
+        f.write(cabecalho)
+        for nome, coluna in secoes:
+            f.seek(inicio_dados + posicoes[nome][0])
+            coluna.tofile(f)
+        f.truncate(inicio_dados + deslocamento)
+        f.flush()
+        os.fsync(f.fileno())
+    # Troca atômica: quem já mapeou o arquivo antigo continua lendo o inode antigo até soltar
+    os.replace(temporario, caminho)
+
+
+def abrir_mapeado(caminho):
+    """
+    Mapeia o arquivo (somente leitura, páginas compartilhadas entre os processos) e devolve
+    {'store', 'estilos', 'origem'}, ou None se não existir ou não servir.
+    """
+    try:
+        with open(caminho, 'rb') as f:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        magico, formato, tamanho = _PREFIXO.unpack_from(mapa, 0)
+        if magico != _MAGICO or formato != FORMATO: return None
+        cab = json.loads(mapa[_PREFIXO.size:_PREFIXO.size + tamanho])
+    except (struct.error, ValueError):
+        return None
+
+    base = _alinhar(_PREFIXO.size + tamanho)
+    visao = memoryview(mapa)
+    def secao(nome):
+        deslocamento, tamanho, typecode = cab['secoes'][nome]
+        bruto = visao[base + deslocamento:base + deslocamento + tamanho]
+        return bruto if typecode == 'B' else bruto.cast(typecode)
+    def texto(campo):
+        return ColunaTexto(secao(f'tipos.{campo}'), secao(f'fins.{campo}'), secao(f'dados.{campo}'))
+
+    textos = {campo: texto(campo) for campo in CAMPOS_TEXTO}
+    for campo in CAMPOS_INTERNADOS:
+        tabela = [sys.intern(v) if type(v) is str else v for v in cab['tabelas'].get(campo, [])]
+        textos[campo] = ColunaTabela(tabela, secao(f'codigos.{campo}'))
+
+    busca = texto('busca')
+    indice_busca = SearchIndex.de_postings(
+        busca, texto('titulos'),
+        Postings(cab['postings']['trigramas'], secao('fins.trigramas'), secao('ids.trigramas')),
+        Postings(cab['postings']['tokens'], secao('fins.tokens'), secao('ids.tokens')))
+    store = EventStore.de_colunas(
+        cab['formas'], secao('forma'), textos, secao('inicio'), secao('lat'), secao('lon'),
+        secao('tamanho'), secao('flags'), busca, {int(i): extras for i, extras in cab['extras'].items()},
+        indice_busca=indice_busca)
+    return {'store': store, 'estilos': cab['estilos'], 'origem': cab['origem']}
+
+
+@contextmanager
+def trava(caminho):
+    """Só um worker monta e grava o arquivo; os outros esperam e depois só mapeiam"""
+    if fcntl is None:
+        yield
+        return
+    with open(caminho + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,250 @@
+import os
+import sys
+import time
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+# Limites dos histogramas em segundos (os mesmos para rotas, etapas e chamadas ao banco)
+BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0)
+
+# Profiler por amostragem: desligado se PROFILE_SLOW_MS não estiver definido
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS") or 0)
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "perfis")
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 50))
+
+
+class Histograma:
+    __slots__ = ('contagens', 'soma', 'total')
+
+    def __init__(self):
+        self.contagens = [0] * (len(BUCKETS) + 1)      # o último é o +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(BUCKETS, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(rotulos):
+    if not rotulos: return ''
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in rotulos) + '}'
+
+
+class Metricas:
+    """
+    Contadores e histogramas em memória, exportados no formato texto do Prometheus.
+    Cada worker tem os seus: o scraper deve coletar de todos (ou somar por instância).
+    Valores que já existem em outro lugar (tamanho dos dados, stats dos caches) entram
+    como medidores: funções chamadas só na hora de exportar.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tipos = {}             # nome -> (tipo, ajuda)
+        self._contadores = {}        # (nome, rótulos) -> valor
+        self._histogramas = {}       # (nome, rótulos) -> Histograma
+        self._medidores = []
+
+    def declarar(self, nome, tipo, ajuda):
+        self._tipos[nome] = (tipo, ajuda)
+
+    def contar(self, nome, valor=1, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, nome, segundos, **rotulos):
+        self.observar_varios([(nome, tuple(sorted(rotulos.items())), segundos)])
+
+    def observar_varios(self, medidas):
+        """[(nome, rótulos já ordenados, segundos)] de uma vez só, com um único lock (fim de cada requisição)"""
+        with self._lock:
+            for nome, rotulos, segundos in medidas:
+                histograma = self._histogramas.get((nome, rotulos))
+                if histograma is None: histograma = self._histogramas[(nome, rotulos)] = Histograma()
+                histograma.observar(segundos)
+
+    def medidor(self, funcao):
+        """Registra funcao() -> [(nome, {rótulos}, valor)], avaliada a cada exportação"""
+        self._medidores.append(funcao)
+        return funcao
+
+    def exportar(self):
+        amostras = {}
+        with self._lock:
+            for (nome, rotulos), valor in self._contadores.items():
+                amostras.setdefault(nome, []).append(f'{nome}{_rotulos(rotulos)} {valor}')
+            for (nome, rotulos), h in self._histogramas.items():
+                linhas = amostras.setdefault(nome, [])
+                acumulado = 0
+                for limite, n in zip(BUCKETS + ('+Inf',), h.contagens):
+                    acumulado += n
+                    linhas.append(f'{nome}_bucket{_rotulos(rotulos + (("le", limite),))} {acumulado}')
+                linhas.append(f'{nome}_sum{_rotulos(rotulos)} {h.soma:.6f}')
+                linhas.append(f'{nome}_count{_rotulos(rotulos)} {h.total}')
+        for funcao in self._medidores:
+            try:
+                for nome, rotulos, valor in funcao():
+                    amostras.setdefault(nome, []).append(f'{nome}{_rotulos(tuple(sorted(rotulos.items())))} {valor}')
+            except Exception as e:
+                print(f"Erro ao exportar métricas: {e}")
+
+        saida = []
+        for nome in sorted(amostras):
+            tipo, ajuda = self._tipos.get(nome, ('untyped', ''))
+            if ajuda: saida.append(f'# HELP {nome} {ajuda}')
+            saida.append(f'# TYPE {nome} {tipo}')
+            saida.extend(amostras[nome])
+        return '\n'.join(saida) + '\n'
+
+
+METRICAS = Metricas()
+METRICAS.declarar('carnaval_requisicao_seconds', 'histogram', 'Latência das requisições por rota')
+METRICAS.declarar('carnaval_requisicoes_total', 'counter', 'Requisições por rota e código HTTP')
+METRICAS.declarar('carnaval_etapa_seconds', 'histogram', 'Tempo de cada etapa dentro das rotas')
+METRICAS.declarar('carnaval_banco_seconds', 'histogram', 'Latência das chamadas ao banco de votos')
+METRICAS.declarar('carnaval_banco_erros_total', 'counter', 'Chamadas ao banco de votos que falharam')
+METRICAS.declarar('carnaval_perfis_total', 'counter', 'Perfis de requisições lentas gravados')
+
+
+def medir_banco(operacao, store):
+    """Decorador: latência e falhas (exceções que escapam) de uma operação do banco de votos"""
+    def decorador(funcao):
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            except Exception:
+                erro_banco(operacao, store)
+                raise
+            finally:
+                METRICAS.observar('carnaval_banco_seconds', time.perf_counter() - inicio, operacao=operacao, store=store)
+        medida.__name__ = funcao.__name__
+        medida.__doc__ = funcao.__doc__
+        return medida
+    return decorador
+
+
+def erro_banco(operacao, store):
+    """Para falhas que o próprio store trata (e engole) sem deixar a exceção subir"""
+    METRICAS.contar('carnaval_banco_erros_total', operacao=operacao, store=store)
+
+
+class Cronometro:
+    """Etapas de uma requisição: vira o cabeçalho Server-Timing e os histogramas por etapa"""
+    __slots__ = ('inicio', 'etapas')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+
+    def registrar(self, nome, segundos):
+        # Etapas repetidas na mesma requisição são somadas
+        self.etapas[nome] = self.etapas.get(nome, 0.0) + segundos
+
+    def server_timing(self, total=None):
+        partes = [f'{nome};dur={segundos * 1000:.2f}' for nome, segundos in self.etapas.items()]
+        if total is not None: partes.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(partes)
+
+    def finalizar(self, rota, status):
+        total = time.perf_counter() - self.inicio
+        medidas = [('carnaval_requisicao_seconds', (('rota', rota),), total)]
+        medidas += [('carnaval_etapa_seconds', (('etapa', nome), ('rota', rota)), segundos)
+                    for nome, segundos in self.etapas.items()]
+        METRICAS.observar_varios(medidas)
+        METRICAS.contar('carnaval_requisicoes_total', rota=rota, status=status)
+        return total
+
+
+def _pilha(frame):
+    partes = []
+    while frame is not None:
+        codigo = frame.f_code
+        partes.append(f'{os.path.basename(codigo.co_filename)}:{codigo.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(partes))
+
+
+class Amostrador:
+    """
+    Profiler por amostragem para requisições lentas (opt-in via PROFILE_SLOW_MS).
+    Uma thread olha a pilha das threads com requisição em andamento a cada `intervalo`;
+    se a requisição passar do limite, as pilhas vão para PROFILE_DIR no formato
+    "collapsed" (uma pilha por linha + contagem), que o flamegraph.pl e o speedscope abrem.
+    Requisições rápidas só custam o registro/remoção da thread.
+    """
+
+    def __init__(self, limite_ms=PROFILE_SLOW_MS, intervalo_ms=PROFILE_INTERVAL_MS, pasta=PROFILE_DIR,
+                 max_arquivos=PROFILE_MAX_FILES):
+        self.limite = limite_ms / 1000
+        self.intervalo = intervalo_ms / 1000
+        self.pasta = pasta
+        self.max_arquivos = max_arquivos
+        self._ativas = {}        # ident da thread -> Counter de pilhas
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def ligado(self):
+        return self.limite > 0
+
+    def iniciar(self):
+        """Começa a amostrar a thread atual; devolve o ident para passar a terminar()"""
+        self._garantir_thread()
+        ident = threading.get_ident()
+        with self._lock:
+            self._ativas[ident] = Counter()
+        return ident
+
+    def terminar(self, ident, segundos, descricao):
+        with self._lock:
+            pilhas = self._ativas.pop(ident, None)
+        if not pilhas or segundos < self.limite: return None
+        return self._gravar(pilhas, segundos, descricao)
+
+    def _gravar(self, pilhas, segundos, descricao):
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            nome = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(segundos * 1000)}ms-{os.getpid()}-{threading.get_ident()}.txt"
+            caminho = os.path.join(self.pasta, nome)
+            with open(caminho, 'w', encoding='utf-8') as f:
+                f.write(f"# {descricao} {segundos * 1000:.1f}ms, {sum(pilhas.values())} amostras a cada {self.intervalo * 1000:g}ms\n")
+                for pilha, n in pilhas.most_common(): f.write(f"{pilha} {n}\n")
+            METRICAS.contar('carnaval_perfis_total')
+            # Mantém só os mais recentes
+            antigos = sorted(os.listdir(self.pasta))[:-self.max_arquivos]
+            for antigo in antigos: os.remove(os.path.join(self.pasta, antigo))
+            return caminho
+        except OSError as e:
+            print(f"Erro ao gravar perfil: {e}")
+            return None
+
+    def _loop(self):
+        while True:
+            time.sleep(self.intervalo)
+            with self._lock:
+                if not self._ativas: continue
+                frames = sys._current_frames()
+                for ident, pilhas in self._ativas.items():
+                    frame = frames.get(ident)
+                    if frame is not None: pilhas[_pilha(frame)] += 1
+
+    def _garantir_thread(self):
+        # Confere o pid porque threads não sobrevivem ao fork dos workers
+        if self._thread is not None and self._pid == os.getpid(): return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid(): return
+            self._pid = os.getpid()
+            self._ativas.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
@@ -0,0 +1,68 @@
+import posixpath
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+import openpyxl
+from openpyxl.utils import range_boundaries
+
+NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PKG = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+def _hyperlinks(arquivo, caminho_planilha):
+    """
+    {linha: {índice da coluna: url}} dos hyperlinks da planilha, lidos direto do XML.
+    No modo read_only o openpyxl não carrega hyperlinks; eles ficam na tag <hyperlinks>
+    (no fim do XML da planilha) apontando para o arquivo de relacionamentos da planilha.
+    """
+    caminho_planilha = caminho_planilha.lstrip('/')
+    pasta, nome = posixpath.split(caminho_planilha)
+    with zipfile.ZipFile(arquivo) as z:
+        try:
+            with z.open(posixpath.join(pasta, '_rels', nome + '.rels')) as f:
+                alvos = {el.get('Id'): el.get('Target') for _, el in iterparse(f) if el.tag == NS_PKG + 'Relationship'}
+        except KeyError:
+            return {}
+
+        links = {}
+        dados = None
+        with z.open(caminho_planilha) as f:
+            for evento, el in iterparse(f, events=('start', 'end')):
+                if evento == 'start':
+                    if el.tag == NS_MAIN + 'sheetData': dados = el
+                    continue
+                if el.tag == NS_MAIN + 'hyperlink':
+                    alvo = alvos.get(el.get(NS_REL + 'id'))
+                    if alvo and el.get('ref'):
+                        min_col, min_lin, max_col, max_lin = range_boundaries(el.get('ref'))
+                        for lin in range(min_lin, max_lin + 1):
+                            por_coluna = links.setdefault(lin, {})
+                            for col in range(min_col, max_col + 1): por_coluna[col - 1] = alvo
+                elif el.tag == NS_MAIN + 'row' and dados is not None:
+                    dados.clear()   # o conteúdo das linhas não interessa aqui: descarta para a memória não crescer
+        return links
+
+
+def _iterar(wb, ws, links):
+    try:
+        # O read_only preenche linhas vazias, então o número da linha é a posição no iterador.
+        # Sem min_row ele começa da linha 1 mesmo quando a planilha começa mais abaixo
+        inicio = ws.min_row or 1
+        for numero, valores in enumerate(ws.iter_rows(min_row=inicio, values_only=True), start=inicio):
+            yield valores, links.get(numero, {})
+    finally:
+        wb.close()
+
+
+def linhas_xlsx(arquivo):
+    """
+    Percorre a planilha ativa em modo read_only (memória constante, sem objetos de célula)
+    e gera (valores, links) por linha: `valores` é a tupla de valores e `links` um dict
+    {índice da coluna: url} com os hyperlinks daquela linha.
+    Abre o arquivo já na chamada, então um Excel inválido dá erro aqui e não no meio do loop.
+    """
+    wb = openpyxl.load_workbook(arquivo, read_only=True)
+    ws = wb.active
+    caminho = getattr(ws, '_worksheet_path', None)
+    return _iterar(wb, ws, _hyperlinks(arquivo, caminho) if caminho else {})
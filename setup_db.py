@@ -1,9 +1,16 @@
 import os
 from dotenv import load_dotenv
-from supabase import create_client
 
 load_dotenv()
 
+# Backend local: o schema (tabelas + triggers) é criado ao abrir o banco
+if os.environ.get("VOTE_STORE", "").lower() == "sqlite":
+    import database
+    print(f"Banco SQLite pronto em {database.SQLITE_PATH}")
+    exit()
+
+from supabase import create_client
+
 URL = os.environ.get("NEXT_PUBLIC_SUPABASE_URL") or os.environ.get("SUPABASE_URL")
 # Use a SERVICE_ROLE_KEY aqui para ter permissão de alterar tabelas
 KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY") 
@@ -27,8 +34,12 @@ CREATE TABLE IF NOT EXISTS votos (
 -- 2. Tabela de Contagem Rápida (Cache)
 CREATE TABLE IF NOT EXISTS likes (
   id TEXT PRIMARY KEY,
-  count INTEGER DEFAULT 0
+  count INTEGER DEFAULT 0,
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now())
 );
+-- Para bancos criados antes da coluna (o app busca só as contagens alteradas desde a última consulta)
+ALTER TABLE likes ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now());
+CREATE INDEX IF NOT EXISTS likes_updated_at_idx ON likes (updated_at);
 
 -- 3. Habilitar Segurança (RLS)
 ALTER TABLE votos ENABLE ROW LEVEL SECURITY;
@@ -40,11 +51,11 @@ CREATE POLICY "Public Read" ON votos FOR SELECT USING (true);
 CREATE OR REPLACE FUNCTION atualizar_contador() RETURNS TRIGGER AS $$
 BEGIN
   IF (TG_OP = 'INSERT') THEN
-    INSERT INTO likes (id, count) VALUES (NEW.bloco_id, 1)
-    ON CONFLICT (id) DO UPDATE SET count = likes.count + 1;
+    INSERT INTO likes (id, count, updated_at) VALUES (NEW.bloco_id, 1, now())
+    ON CONFLICT (id) DO UPDATE SET count = likes.count + 1, updated_at = now();
     RETURN NEW;
   ELSIF (TG_OP = 'DELETE') THEN
-    UPDATE likes SET count = GREATEST(0, likes.count - 1) WHERE id = OLD.bloco_id;
+    UPDATE likes SET count = GREATEST(0, likes.count - 1), updated_at = now() WHERE id = OLD.bloco_id;
     RETURN OLD;
   END IF;
   RETURN NULL;
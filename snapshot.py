@@ -0,0 +1,170 @@
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from armazem import Evento
+from indices import FilterIndex
+
+# Rótulo e peso de ordenação de cada status (mesma regra de sempre da lista)
+STATUS_INFO = {
+    'em-breve': ('Em Breve', 0),
+    'em-andamento': ('Em Andamento', 0),
+    'encerrando': ('Encerrando', 1),
+    'hoje': ('Hoje', 2),
+    'futuro': ('', 3),
+    'encerrado': ('Encerrado', 4),
+}
+
+# As transições "depois de +3h" e "depois de +5h" são estritas (diff < -3 / diff < -5),
+# então a fronteira fica 1 microssegundo depois do instante exato.
+_EPS = timedelta(microseconds=1)
+
+
+def calcular_status(dt, now):
+    if not dt: return 'futuro'
+
+    diff = (dt - now).total_seconds() / 3600
+    if 0 < diff <= 2: return 'em-breve'
+    if -3 <= diff <= 0: return 'em-andamento'
+    if -5 <= diff < -3: return 'encerrando'
+    if diff < -5: return 'encerrado'
+    if dt.date() == now.date(): return 'hoje'
+    return 'futuro'
+
+
+def fronteiras(dt):
+    """Instantes em que o status do evento pode mudar (meia-noite, -2h, início, +3h, +5h)"""
+    if not dt: return ()
+    meia_noite = datetime(dt.year, dt.month, dt.day)
+    return (meia_noite, dt - timedelta(hours=2), dt, dt + timedelta(hours=3) + _EPS, dt + timedelta(hours=5) + _EPS)
+
+
+CAMPOS_STATUS = ('status', 'status_label', 'sort_weight')
+
+
+@lru_cache(maxsize=64)
+def _chaves_com_status(chaves):
+    return chaves + tuple(c for c in CAMPOS_STATUS if c not in chaves)
+
+
+class EventoStatus(Evento):
+    """Visão do evento bruto com os campos de status do snapshot (no lugar de uma cópia do dict)"""
+    __slots__ = ('status',)
+
+    def __init__(self, store, i, status):
+        Evento.__init__(self, store, i)
+        self.status = status
+
+    def __getitem__(self, campo):
+        if campo == 'status': return self.status
+        if campo == 'status_label': return STATUS_INFO[self.status][0]
+        if campo == 'sort_weight': return STATUS_INFO[self.status][1]
+        return self._store.valor(self._i, campo)
+
+    def __iter__(self):
+        return iter(_chaves_com_status(self._store.chaves(self._i)))
+
+    def __len__(self):
+        return len(_chaves_com_status(self._store.chaves(self._i)))
+
+
+class StatusSnapshot:
+    """
+    Foto imutável da lista de eventos com status calculado e já ordenada.
+    É compartilhada entre as requisições; `eventos` são visões somente leitura (EventoStatus).
+    """
+    __slots__ = ('versao', 'geracao', 'marca', 'eventos', 'status', 'ordem', 'posicao', 'bairros', 'indice', 'por_status',
+                 'calculado_em', 'proxima_fronteira')
+
+    def __init__(self, versao, geracao, eventos, status, ordem, bairros, indice, calculado_em, proxima_fronteira, marca=None):
+        self.versao = versao
+        self.geracao = geracao
+        self.marca = marca                      # hash do conteúdo dos dados (o mesmo em todos os workers)
+        self.eventos = eventos                  # tupla ordenada (sort_weight, data)
+        self.status = status                    # status por índice do evento bruto
+        self.ordem = ordem                      # índices brutos na ordem de exibição
+        self.posicao = {raw: pos for pos, raw in enumerate(ordem)}
+        self.bairros = bairros
+        self.indice = indice                    # postings dos dados brutos (um por carga)
+        self.por_status = {}
+        for raw, st in enumerate(status): self.por_status.setdefault(st, set()).add(raw)
+        self.calculado_em = calculado_em
+        self.proxima_fronteira = proxima_fronteira
+
+    def materializar(self, ids):
+        """Converte índices brutos em eventos, preservando a ordem de exibição"""
+        posicoes = sorted(self.posicao[i] for i in ids)
+        return [self.eventos[p] for p in posicoes]
+
+    def valido(self, versao, now):
+        if self.versao != versao: return False
+        return self.proxima_fronteira is None or now < self.proxima_fronteira
+
+
+def construir_snapshot(store, versao, geracao, now, anterior=None, marca=None):
+    # Só reaproveita as visões do snapshot anterior se os dados brutos forem os mesmos
+    if anterior is not None and anterior.versao != versao: anterior = None
+
+    status = []
+    por_raw = []
+    proxima = None
+
+    for i in range(len(store)):
+        dt = store.dt(i)
+        st = calcular_status(dt, now)
+        status.append(st)
+
+        if anterior is not None and anterior.status[i] == st:
+            por_raw.append(anterior.eventos[anterior.posicao[i]])
+        else:
+            por_raw.append(EventoStatus(store, i, st))
+
+        for f in fronteiras(dt):
+            if f > now and (proxima is None or f < proxima): proxima = f
+
+    # Na troca de status a ordem anterior continua quase ordenada, e o timsort aproveita isso
+    # (SEM_DATA é o maior int64: eventos sem data vão para o fim, como datetime.max)
+    inicio = store.inicio
+    base = anterior.ordem if anterior is not None else range(len(store))
+    ordem = sorted(base, key=lambda i: (STATUS_INFO[status[i]][1], inicio[i]))
+
+    if anterior is not None:
+        bairros, indice = anterior.bairros, anterior.indice
+    else:
+        locais = store.textos['local']
+        bairros = tuple(sorted({local for local in locais if local}))
+        indice = FilterIndex(store)
+
+    return StatusSnapshot(versao, geracao, tuple(por_raw[i] for i in ordem), tuple(status), tuple(ordem),
+                          bairros, indice, now, proxima, marca)
+
+
+class StatusEngine:
+    """
+    Mantém o snapshot atual e só recalcula quando os dados mudam ou quando
+    o relógio passa da próxima fronteira de status de algum evento.
+    """
+
+    def __init__(self, relogio):
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._geracao = 0
+
+    @property
+    def atual(self):
+        """Último snapshot calculado (ou None), sem checar se ainda vale"""
+        return self._snapshot
+
+    def obter(self, store, versao, marca=None):
+        now = self._relogio()
+        snap = self._snapshot
+        if snap is not None and snap.valido(versao, now):
+            return snap
+
+        with self._lock:
+            snap = self._snapshot
+            if snap is not None and snap.valido(versao, now):
+                return snap
+            self._geracao += 1
+            self._snapshot = construir_snapshot(store, versao, self._geracao, now, anterior=snap, marca=marca)
+            return self._snapshot
@@ -0,0 +1,82 @@
+import os
+import json
+from datetime import datetime
+
+from busca import CAMPOS_BUSCA, normalizar
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SNAPSHOT_FILE = os.environ.get("SNAPSHOT_FILE", "dados.snapshot")
+FORMATO = 1                         # sobe quando o layout muda; snapshot de outro formato é ignorado
+_MAGICO_MSGPACK = b'CBHS\x01M'
+_MAGICO_JSON = b'CBHS\x01J'
+
+
+def _dt_partes(dt_iso):
+    if not dt_iso: return None
+    dt = datetime.fromisoformat(dt_iso)
+    return [dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second, dt.microsecond]
+
+
+def salvar_snapshot(caminho, eventos, estilos, revisao):
+    """
+    Snapshot compacto de todos os eventos para o app carregar sem reprocessar nada.
+    Layout colunar: os eventos são agrupados pela "forma" (a tupla de chaves, que muda
+    de uma fonte para outra) e cada grupo guarda uma lista por campo, mais a data já
+    quebrada em partes, o texto de busca já normalizado e a posição de cada evento.
+    """
+    grupos = {}
+    for posicao, e in enumerate(eventos):
+        chaves = tuple(e)
+        grupo = grupos.get(chaves)
+        if grupo is None:
+            grupo = grupos[chaves] = {'chaves': list(chaves), 'colunas': [[] for _ in chaves],
+                                      'posicoes': [], 'datas': [], 'busca': []}
+        for coluna, valor in zip(grupo['colunas'], e.values()): coluna.append(valor)
+        grupo['posicoes'].append(posicao)
+        grupo['datas'].append(_dt_partes(e.get('dt_iso')))
+        grupo['busca'].append('\n'.join(normalizar(e.get(c)) for c in CAMPOS_BUSCA))
+
+    dados = {'formato': FORMATO, 'revisao': revisao, 'gerado_em': datetime.now().isoformat(),
+             'estilos': estilos, 'total': len(eventos), 'grupos': list(grupos.values())}
+    if msgpack is not None:
+        corpo = _MAGICO_MSGPACK + msgpack.packb(dados, use_bin_type=True)
+    else:
+        corpo = _MAGICO_JSON + json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(corpo)
+    os.replace(temporario, caminho)
+
+
+def carregar_snapshot(caminho):
+    """(eventos, estilos, revisao) prontos para o app, ou None se o arquivo não existir ou não servir"""
+    try:
+        with open(caminho, 'rb') as f:
+            corpo = f.read()
+    except OSError:
+        return None
+
+    try:
+        if corpo.startswith(_MAGICO_MSGPACK):
+            if msgpack is None: return None
+            dados = msgpack.unpackb(corpo[len(_MAGICO_MSGPACK):], raw=False)
+        elif corpo.startswith(_MAGICO_JSON):
+            dados = json.loads(corpo[len(_MAGICO_JSON):])
+        else:
+            return None
+    except ValueError:
+        return None
+    if dados.get('formato') != FORMATO: return None
+
+    eventos = [None] * dados['total']
+    for grupo in dados['grupos']:
+        chaves = grupo['chaves'] + ['_dt_obj', '_busca']
+        datas = [datetime(*p) if p else None for p in grupo['datas']]
+        for posicao, valores in zip(grupo['posicoes'], zip(*grupo['colunas'], datas, grupo['busca'])):
+            eventos[posicao] = dict(zip(chaves, valores))
+    return eventos, dados['estilos'], dados['revisao']
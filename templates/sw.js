@@ -1,13 +1,6 @@
-const CACHE_NAME = 'carnaval-bh-v12';
-const URLS_TO_CACHE = [
-    '/',
-    '/static/style.css',
-    '/static/manifest.json',
-    '/static/images/carnaval-mask-icon.png',
-    'https://unpkg.com/leaflet@1.9.4/dist/leaflet.css',
-    'https://unpkg.com/leaflet@1.9.4/dist/leaflet.js',
-    'https://fonts.googleapis.com/css2?family=Poppins:wght@400;600;700&display=swap'
-];
+{# Gerado por /sw.js (main.serve_sw): versão e pré-cache vêm do manifesto de static/ (estaticos.py) -#}
+const CACHE_NAME = {{ cache_name|tojson }};
+const URLS_TO_CACHE = {{ precache|tojson }};
 
 // 1. INSTALAÇÃO: Cacheia os arquivos e força a ativação imediata (skipWaiting)
 self.addEventListener('install', event => {
@@ -32,7 +25,7 @@ self.addEventListener('activate', event => {
         caches.keys().then(cacheNames => {
             return Promise.all(
                 cacheNames.map(cache => {
-                    // Se o cache não for o atual (v3), apaga!
+                    // Se o cache não for o da versão atual dos arquivos, apaga!
                     if (cache !== CACHE_NAME) {
                         console.log('[SW] Apagando cache antigo:', cache);
                         return caches.delete(cache);
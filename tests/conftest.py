@@ -0,0 +1,25 @@
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import pytest
+
+
+@pytest.fixture
+def eventos():
+    """Um bloco típico, um ensaio (outra forma de chaves) e valores fora do padrão das colunas"""
+    return [
+        {'id': 'b1', 'titulo': 'Bloco do Leão', 'endereco': 'Praça Sete', 'local': 'Centro',
+         'categoria': 'grande', 'categoria_display': 'Grande', 'data': '14/02', 'descricao': 'Axé na praça',
+         'link_ingresso': None, 'dt_iso': '2026-02-14T09:00:00', 'lat': -19.919, 'lon': -43.938,
+         'tamanho': 3, 'is_kids': True, 'is_lgbt': False, 'is_pet': False},
+        {'titulo': 'Ensaio da Bateria', 'id': 'e1', 'local': 'Santa Tereza', 'categoria': 'ensaio',
+         'categoria_display': 'Ensaio', 'dt_iso': '2026-01-20T19:30:00', 'lat': None, 'lon': None,
+         'tamanho': None, 'is_ensaio': True, 'status': 'confirmado', '_busca': None},
+        {'id': 'b2', 'titulo': 'Baianas Ozadas', 'endereco': None, 'local': None, 'categoria': 'grande',
+         'categoria_display': 'Grande', 'data': None, 'descricao': None, 'link_ingresso': 'https://ingresso',
+         'dt_iso': '2026-02-15T10:00:00-03:00', 'lat': -19, 'lon': -43.95, 'tamanho': 'enorme',
+         'is_kids': False, 'is_lgbt': 'sim', 'is_pet': False},
+    ]
@@ -0,0 +1,32 @@
+import json
+from datetime import datetime
+
+from armazem import EventStore
+
+
+def _publico(e):
+    return {k: v for k, v in e.items() if not k.startswith('_')}
+
+
+def test_eventos_voltam_com_as_mesmas_chaves_ordem_e_valores(eventos):
+    store = EventStore(eventos)
+
+    assert len(store) == len(eventos)
+    for original, evento in zip(eventos, store):
+        # json.dumps distingue ordem das chaves e -19 de -19.0
+        assert json.dumps(dict(evento)) == json.dumps(_publico(original))
+
+
+def test_colunas_tipadas(eventos):
+    store = EventStore(eventos)
+
+    assert store.dt(0) == datetime(2026, 2, 14, 9, 0)
+    assert store.dt(2) is None          # data com fuso fica só no valor original
+    assert store.coordenadas()[1] == (None, None)
+    assert store.coordenadas()[2] == (-19.0, -43.95)
+
+
+def test_juntar_mantem_a_ordem_e_os_extras(eventos):
+    junto = EventStore.juntar([EventStore(eventos[:1]), EventStore(eventos[1:])])
+
+    assert [json.dumps(dict(e)) for e in junto] == [json.dumps(_publico(e)) for e in eventos]
@@ -0,0 +1,19 @@
+import json
+
+from cache_geo import GeocodeCache
+
+
+def test_log_com_lixo_e_linha_cortada_nao_perde_os_registros(tmp_path):
+    caminho = str(tmp_path / 'latlon_cache.json')
+    with open(caminho + 'l', 'wb') as f:
+        f.write(json.dumps({'k': 'praca sete', 'lat': -19.9, 'lon': -43.9}).encode() + b'\n')
+        f.write(b'[1, 2]\n{"k": "sem coordenadas"}\nnull\n')
+        f.write('{"k": "praça da estação", "la'.encode())     # queda no meio da escrita
+
+    cache = GeocodeCache(caminho)
+    cache['Mercado Central'] = {'lat': -19.92, 'lon': -43.94}
+
+    relido = GeocodeCache(caminho)
+    assert relido.get('praca sete') == {'lat': -19.9, 'lon': -43.9}
+    assert relido.get('mercado central') == {'lat': -19.92, 'lon': -43.94}
+    assert len(relido) == 2
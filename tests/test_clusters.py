@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from armazem import EventStore
+from clusters import ZOOM_MAX, ZOOM_MIN, hierarquia
+from snapshot import construir_snapshot
+
+
+def test_tamanho_fora_do_padrao_nao_derruba_os_clusters(eventos):
+    eventos[0]['tamanho'] = 2
+    eventos[2]['lat'] = -19.93       # tamanho 'enorme', perto do primeiro
+    store = EventStore(eventos)
+    snapshot = construir_snapshot(store, 1, 1, datetime(2026, 1, 1))
+
+    niveis = hierarquia(snapshot, range(snapshot.indice.total))
+
+    (raiz,) = niveis[ZOOM_MIN].values()
+    assert raiz.count == 2 and raiz.tamanho == 2
+    assert sorted(cl.tamanho for cl in niveis[ZOOM_MAX].values()) == [0, 2]
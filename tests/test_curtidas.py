@@ -0,0 +1,59 @@
+import database
+from curtidas import LikesStore
+
+
+class TabelaLikes:
+    """likes em memória com o mesmo contrato de database.get_likes_since"""
+
+    def __init__(self):
+        self.linhas = {}
+        self.consultas = []
+
+    def gravar(self, bloco_id, count, updated_at):
+        self.linhas[bloco_id] = (count, updated_at)
+
+    def get_likes_since(self, desde=None, pagina=1000):
+        self.consultas.append(desde)
+        rows = sorted((em, bloco_id, count) for bloco_id, (count, em) in self.linhas.items()
+                      if not desde or em >= desde)
+        return {bloco_id: count for _, bloco_id, count in rows}, rows[-1][0] if rows else desde
+
+
+def test_commit_atrasado_dentro_da_margem_entra_no_poll_seguinte(monkeypatch):
+    tabela = TabelaLikes()
+    monkeypatch.setattr(database, 'get_likes_since', tabela.get_likes_since)
+    store = LikesStore(margem=10)
+
+    tabela.gravar('a', 1, '2026-02-14T12:00:05.000000+00:00')
+    store.atualizar()
+    # Transação que começou antes (now() = 12:00:01) mas só commitou depois da consulta
+    tabela.gravar('b', 3, '2026-02-14T12:00:01.000000+00:00')
+    store.atualizar()
+
+    assert store.contagens == {'a': 1, 'b': 3}
+    assert tabela.consultas[-1] == '2026-02-14T11:59:55+00:00'
+
+
+def test_rodada_sem_novidades_nao_recua_o_cursor(monkeypatch):
+    tabela = TabelaLikes()
+    monkeypatch.setattr(database, 'get_likes_since', tabela.get_likes_since)
+    store = LikesStore(margem=10)
+
+    tabela.gravar('a', 1, '2026-02-14T12:00:05.000000+00:00')
+    store.atualizar()
+    tabela.linhas.clear()
+    store.atualizar()
+    store.atualizar()
+
+    assert tabela.consultas[1] == tabela.consultas[2] == '2026-02-14T11:59:55+00:00'
+
+
+def test_garantir_poller_carrega_as_contagens_antes_de_voltar(monkeypatch):
+    tabela = TabelaLikes()
+    tabela.gravar('a', 7, '2026-02-14T12:00:05.000000+00:00')
+    monkeypatch.setattr(database, 'get_likes_since', tabela.get_likes_since)
+    store = LikesStore(intervalo=3600)
+
+    store.garantir_poller()
+
+    assert store.get('a') == 7
@@ -0,0 +1,138 @@
+import re
+import uuid
+
+import pytest
+
+from database import SupabaseVoteStore
+from fila_votos import VoteQueue
+
+
+class ErroPostgrest(Exception):
+    """Como o APIError do postgrest: o código SQLSTATE em `code`"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class Resposta:
+    def __init__(self, data):
+        self.data = data
+
+
+class Consulta:
+    def __init__(self, cliente, operacao, linhas=None):
+        self.cliente = cliente
+        self.operacao = operacao
+        self.linhas = linhas if isinstance(linhas, list) else [linhas]
+        self.filtros = {}
+
+    def eq(self, campo, valor):
+        self.filtros[campo] = {valor}
+        return self
+
+    def in_(self, campo, valores):
+        self.filtros[campo] = set(valores)
+        return self
+
+    def or_(self, filtro):
+        # Só o formato que aplicar_votos gera, com ids simples: and(bloco_id.eq."b",user_id.in.("u1","u2"))
+        self.cliente.deletes += 1
+        self.filtros['pares'] = {(u, b) for b, usuarios in re.findall(r'and\(bloco_id\.eq\."([^"]*)",user_id\.in\.\(([^)]*)\)\)', filtro)
+                                 for u in usuarios.strip('"').split('","')}
+        return self
+
+    def execute(self):
+        if self.cliente.falha: raise self.cliente.falha
+        votos = self.cliente.votos
+        if self.operacao == 'delete':
+            alvo = [chave for chave in votos if chave in self.filtros.get('pares', ())
+                    or chave[0] in self.filtros.get('user_id', ()) and chave[1] in self.filtros.get('bloco_id', ())]
+            return Resposta([{'user_id': u, 'bloco_id': b, 'ip_address': votos.pop((u, b))} for u, b in alvo])
+        if any(linha['user_id'] == 'invalido' for linha in self.linhas): raise ErroPostgrest('22P02')
+        novas = [linha for linha in self.linhas if (linha['user_id'], linha['bloco_id']) not in votos]
+        if self.operacao == 'insert' and len(novas) < len(self.linhas): raise ErroPostgrest('23505')
+        for linha in novas: votos[(linha['user_id'], linha['bloco_id'])] = linha['ip_address']
+        return Resposta(novas)
+
+
+class ClienteFalso:
+    """O pedaço do cliente do Supabase que aplicar_votos usa; `falha` simula o banco fora do ar"""
+
+    def __init__(self, falha=None):
+        self.falha = falha
+        self.votos = {}
+        self.deletes = 0
+
+    def table(self, nome):
+        cliente = self
+        class Tabela:
+            def upsert(self, linhas, on_conflict, ignore_duplicates): return Consulta(cliente, 'upsert', linhas)
+            def insert(self, linha): return Consulta(cliente, 'insert', linha)
+            def delete(self): return Consulta(cliente, 'delete')
+        return Tabela()
+
+
+def _store(cliente):
+    store = SupabaseVoteStore(url=None)
+    store.cliente = cliente
+    return store
+
+
+def test_banco_fora_do_ar_devolve_o_lote_para_a_fila():
+    cliente = ClienteFalso(falha=ConnectionError('connection refused'))
+    liberadas = []
+    fila = VoteQueue(_store(cliente).aplicar_votos, ao_liberar=lambda ip, bloco_id: liberadas.append(ip),
+                     intervalo=3600, concorrencia=1, tentativas=2)
+    try:
+        for _ in range(5): fila.enfileirar('10', str(uuid.uuid4()), '1.2.3.4', 'add')
+        with pytest.raises(ConnectionError):
+            _store(cliente).aplicar_votos([('u', '10', '1.2.3.4')], [('v', '10')])
+
+        fila.flush()
+        assert fila.pendentes() == 5 and liberadas == []
+
+        cliente.falha = None
+        fila.flush()
+        assert fila.pendentes() == 0 and fila.gravados == 5 and len(cliente.votos) == 5
+    finally:
+        fila.parar()
+
+
+def test_lote_que_nunca_grava_conta_como_descartado():
+    cliente = ClienteFalso(falha=TimeoutError('read timeout'))
+    liberadas = []
+    fila = VoteQueue(_store(cliente).aplicar_votos, ao_liberar=lambda ip, bloco_id: liberadas.append(ip),
+                     intervalo=3600, concorrencia=1, tentativas=2)
+    try:
+        for _ in range(5): fila.enfileirar('10', str(uuid.uuid4()), '1.2.3.4', 'add')
+        for _ in range(3): fila.flush()
+
+        assert fila.pendentes() == 0 and fila.gravados == 0
+        assert fila.descartados == 5 and len(liberadas) == 5
+    finally:
+        fila.parar()
+
+
+def test_linha_invalida_nao_derruba_o_resto_do_lote():
+    cliente = ClienteFalso()
+    cliente.votos[('repetido', '10')] = '1.2.3.4'
+    store = _store(cliente)
+
+    inseridos, removidos = store.aplicar_votos(
+        [('invalido', '10', '1.2.3.4'), ('novo', '10', '1.2.3.4'), ('repetido', '10', '1.2.3.4')],
+        [('repetido', '10'), ('ausente', '11')])
+
+    assert inseridos == [('novo', '10')]
+    assert removidos == [('repetido', '10', '1.2.3.4')]
+
+
+def test_remocoes_de_varios_blocos_saem_num_delete_por_fatia():
+    cliente = ClienteFalso()
+    pares = [(f'u{i}', f'b{i % 7}') for i in range(120)]
+    for par in pares: cliente.votos[par] = '1.2.3.4'
+
+    _, removidos = _store(cliente).aplicar_votos([], pares + [('ausente', 'b1')])
+
+    assert sorted(removidos) == sorted(par + ('1.2.3.4',) for par in pares) and cliente.votos == {}
+    assert cliente.deletes == 3      # 121 pares em fatias de 50
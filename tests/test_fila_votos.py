@@ -0,0 +1,177 @@
+import time
+import uuid
+
+from fila_votos import VoteQueue
+from limitador import SlidingWindowLimiter
+
+
+class BancoFalso:
+    """Tabela votos em memória com a semântica do aplicar_votos dos stores (ON CONFLICT DO NOTHING)"""
+
+    def __init__(self):
+        self.votos = {}
+
+    def aplicar_votos(self, adds, removes):
+        inseridos, removidos = [], []
+        for user_id, bloco_id, ip in adds:
+            if (user_id, bloco_id) not in self.votos:
+                self.votos[(user_id, bloco_id)] = ip
+                inseridos.append((user_id, bloco_id))
+        for user_id, bloco_id in removes:
+            ip = self.votos.pop((user_id, bloco_id), None)
+            if ip is not None: removidos.append((user_id, bloco_id, ip))
+        return inseridos, removidos
+
+
+def _fila(banco, limitador):
+    # Intervalo longo: só grava quando o teste chama flush()
+    return VoteQueue(banco.aplicar_votos, ao_liberar=lambda ip, bloco_id: limitador.liberar((ip, bloco_id)),
+                     intervalo=3600, concorrencia=1)
+
+
+def _votar(fila, limitador, user_id, acao, ip='1.2.3.4', bloco='10'):
+    if acao == 'add' and not limitador.permitir((ip, bloco)): return False
+    return fila.enfileirar(bloco, user_id, ip, acao)
+
+
+def test_curtir_e_descurtir_antes_do_flush_devolve_a_vaga():
+    banco, limitador = BancoFalso(), SlidingWindowLimiter(limite=3)
+    fila = _fila(banco, limitador)
+    try:
+        for _ in range(3):
+            user_id = str(uuid.uuid4())
+            assert _votar(fila, limitador, user_id, 'add')
+            assert _votar(fila, limitador, user_id, 'remove')
+            fila.flush()
+
+        assert banco.votos == {}
+        assert _votar(fila, limitador, str(uuid.uuid4()), 'add')
+    finally:
+        fila.parar()
+
+
+class BancoInstavel(BancoFalso):
+    """Falha nas primeiras `falhas` gravações"""
+
+    def __init__(self, falhas):
+        super().__init__()
+        self.falhas = falhas
+
+    def aplicar_votos(self, adds, removes):
+        if self.falhas:
+            self.falhas -= 1
+            raise ConnectionError('banco fora do ar')
+        return super().aplicar_votos(adds, removes)
+
+
+def test_lote_que_falhou_volta_para_a_fila():
+    banco, limitador = BancoInstavel(falhas=2), SlidingWindowLimiter(limite=3)
+    fila = VoteQueue(banco.aplicar_votos, intervalo=3600, concorrencia=1, tentativas=3)
+    try:
+        user_id = str(uuid.uuid4())
+        assert _votar(fila, limitador, user_id, 'add')
+        fila.flush(); fila.flush()
+        assert fila.pendentes() == 1 and banco.votos == {}
+
+        fila.flush()
+        assert fila.pendentes() == 0 and fila.descartados == 0
+        assert banco.votos == {(user_id, '10'): '1.2.3.4'}
+    finally:
+        fila.parar()
+
+
+def test_lote_descartado_devolve_as_vagas():
+    banco, limitador = BancoInstavel(falhas=10), SlidingWindowLimiter(limite=2)
+    fila = VoteQueue(banco.aplicar_votos, ao_liberar=lambda ip, bloco_id: limitador.liberar((ip, bloco_id)),
+                     intervalo=3600, concorrencia=1, tentativas=1)
+    try:
+        assert _votar(fila, limitador, str(uuid.uuid4()), 'add')
+        assert _votar(fila, limitador, str(uuid.uuid4()), 'add')
+        assert not limitador.permitir(('1.2.3.4', '10'))
+
+        fila.flush(); fila.flush()
+        assert fila.pendentes() == 0 and fila.descartados == 2
+        assert limitador.permitir(('1.2.3.4', '10'))
+    finally:
+        fila.parar()
+
+
+def test_vale_a_ultima_acao_de_cada_voto_pendente():
+    banco, limitador = BancoFalso(), SlidingWindowLimiter(limite=5)
+    deltas = []
+    fila = VoteQueue(banco.aplicar_votos, ao_confirmar=lambda bloco_id, delta: deltas.append((bloco_id, delta)),
+                     intervalo=3600, concorrencia=2)
+    try:
+        ana, bia = str(uuid.uuid4()), str(uuid.uuid4())
+        banco.votos[(bia, '10')] = '5.6.7.8'
+        for acao in ('add', 'remove', 'add'): assert _votar(fila, limitador, ana, acao)
+        for acao in ('add', 'remove'): assert _votar(fila, limitador, bia, acao, ip='5.6.7.8')
+        assert fila.pendentes() == 2
+
+        fila.flush()
+        assert fila.pendentes() == 0 and fila.gravados == 2
+        assert banco.votos == {(ana, '10'): '1.2.3.4'}
+        assert sorted(deltas) == [('10', -1), ('10', 1)]
+    finally:
+        fila.parar()
+
+
+def test_add_repetido_nao_conta_e_devolve_a_vaga():
+    banco, limitador = BancoFalso(), SlidingWindowLimiter(limite=1)
+    deltas = []
+    fila = VoteQueue(banco.aplicar_votos, ao_confirmar=lambda bloco_id, delta: deltas.append(delta),
+                     ao_liberar=lambda ip, bloco_id: limitador.liberar((ip, bloco_id)), intervalo=3600, concorrencia=1)
+    try:
+        user_id = str(uuid.uuid4())
+        banco.votos[(user_id, '10')] = '1.2.3.4'      # já votou antes (outro worker, outra sessão)
+        assert _votar(fila, limitador, user_id, 'add')
+        fila.flush()
+
+        assert deltas == [] and fila.gravados == 0
+        assert _votar(fila, limitador, str(uuid.uuid4()), 'add')
+    finally:
+        fila.parar()
+
+
+def test_fila_cheia_recusa_voto_novo_mas_coalesce_o_pendente():
+    banco, limitador = BancoFalso(), SlidingWindowLimiter(limite=5)
+    fila = VoteQueue(banco.aplicar_votos, intervalo=3600, concorrencia=1, max_pendentes=1)
+    try:
+        user_id = str(uuid.uuid4())
+        assert _votar(fila, limitador, user_id, 'add')
+        assert not _votar(fila, limitador, str(uuid.uuid4()), 'add')
+        assert _votar(fila, limitador, user_id, 'remove')
+        assert fila.rejeitados == 1 and fila.pendentes() == 1
+    finally:
+        fila.parar()
+
+
+def test_lote_cheio_grava_sem_esperar_o_intervalo():
+    banco, limitador = BancoFalso(), SlidingWindowLimiter(limite=5)
+    fila = VoteQueue(banco.aplicar_votos, intervalo=3600, lote=2, concorrencia=1)
+    try:
+        for _ in range(2): assert _votar(fila, limitador, str(uuid.uuid4()), 'add')
+        limite = time.monotonic() + 5
+        while fila.gravados < 2 and time.monotonic() < limite: time.sleep(0.01)
+
+        assert fila.gravados == 2 and len(banco.votos) == 2
+    finally:
+        fila.parar()
+
+
+def test_remocao_devolve_a_vaga_do_ip_que_votou():
+    banco, limitador = BancoFalso(), SlidingWindowLimiter(limite=1)
+    fila = _fila(banco, limitador)
+    try:
+        user_id = str(uuid.uuid4())
+        assert _votar(fila, limitador, user_id, 'add', ip='1.1.1.1')
+        fila.flush()
+        assert not limitador.permitir(('1.1.1.1', '10'))
+
+        # Mesmo usuário, outra rede (ex.: saiu do wi-fi para o 4G)
+        assert _votar(fila, limitador, user_id, 'remove', ip='2.2.2.2')
+        fila.flush()
+        assert banco.votos == {}
+        assert limitador.permitir(('1.1.1.1', '10'))
+    finally:
+        fila.parar()
@@ -0,0 +1,31 @@
+from geocoding import Geocoder
+
+
+class RespostaFalsa:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class SessaoFalsa:
+    """Responde conforme o endereço pedido"""
+    RESPOSTAS = {
+        'praca sete': {'status': 'OK', 'results': [{'geometry': {'location': {'lat': -19.919, 'lng': -43.938}}}]},
+        'sem status': {'error_message': 'The provided API key is invalid.'},
+        'sem resultados': {'status': 'OK', 'results': []},
+        'lista': [],
+    }
+
+    def get(self, url, params, timeout):
+        return RespostaFalsa(self.RESPOSTAS[params['address']])
+
+
+def test_resposta_sem_status_conta_como_falha_sem_parar_as_outras():
+    geocoder = Geocoder('chave', criar_sessao=SessaoFalsa, workers=2)
+    cache = {}
+    pedidos = {'a': 'praca sete', 'b': 'sem status', 'c': 'sem resultados', 'd': 'lista'}
+
+    assert geocoder.resolver(pedidos, cache) == 1
+    assert cache == {'a': {'lat': -19.919, 'lon': -43.938}}
@@ -0,0 +1,70 @@
+import pytest
+
+from limitador import SlidingWindowLimiter, SqliteWindowLimiter
+
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def criar(request, tmp_path):
+    def criar(**kwargs):
+        if request.param == 'memoria': return SlidingWindowLimiter(**kwargs)
+        return SqliteWindowLimiter(str(tmp_path / 'limite.db'), **kwargs)
+    return criar
+
+
+def test_limite_por_chave(criar):
+    limitador = criar(limite=2, janela=60)
+
+    assert limitador.permitir(('1.2.3.4', 'b1'), agora=100)
+    assert limitador.permitir(('1.2.3.4', 'b1'), agora=101)
+    assert not limitador.permitir(('1.2.3.4', 'b1'), agora=102)
+    assert limitador.permitir(('1.2.3.4', 'b2'), agora=102)
+    assert limitador.permitir(('5.6.7.8', 'b1'), agora=102)
+
+
+def test_janela_desliza(criar):
+    limitador = criar(limite=2, janela=60)
+    limitador.permitir('ip', agora=100)
+    limitador.permitir('ip', agora=130)
+
+    assert not limitador.permitir('ip', agora=159)
+    assert limitador.permitir('ip', agora=161)       # o voto de 100 saiu da janela
+    assert not limitador.permitir('ip', agora=162)
+
+
+def test_liberar_devolve_uma_vaga(criar):
+    limitador = criar(limite=1, janela=60)
+    assert limitador.permitir('ip', agora=100)
+    assert not limitador.permitir('ip', agora=101)
+
+    limitador.liberar('ip')
+    assert limitador.permitir('ip', agora=102)
+    limitador.liberar('outro')                       # chave sem votos: nada a devolver
+    assert not limitador.permitir('ip', agora=103)
+
+
+def test_semear_conta_os_votos_existentes(criar):
+    limitador = criar(limite=2, janela=60)
+    limitador.semear([(('1.2.3.4', 'b1'), 90), (('1.2.3.4', 'b1'), 50)])
+
+    assert not limitador.permitir(('1.2.3.4', 'b1'), agora=100)
+    assert limitador.permitir(('1.2.3.4', 'b1'), agora=111)      # o voto de 50 expirou
+
+
+def test_lru_limita_as_chaves_em_memoria():
+    limitador = SlidingWindowLimiter(limite=1, janela=60, shards=1, max_chaves=2)
+    for chave in ('a', 'b', 'c'): limitador.permitir(chave, agora=100)
+
+    # 'a' foi a menos usada e saiu do LRU: volta a ter vaga
+    assert limitador.permitir('a', agora=101)
+    assert not limitador.permitir('c', agora=101)
+
+
+def test_sqlite_limpa_marcas_de_chaves_paradas(tmp_path):
+    limitador = SqliteWindowLimiter(str(tmp_path / 'limite.db'), limite=5, janela=60, limpeza=30)
+    for i in range(100): limitador.permitir(f'ip{i}', agora=100)
+    limitador.permitir('ip0', agora=140)         # limpa, mas tudo ainda está dentro da janela
+
+    total = lambda: limitador._conn().execute("SELECT COUNT(*) FROM limite_votos").fetchone()[0]
+    assert total() == 101
+    limitador.permitir('outro', agora=170)
+    assert total() == 2                          # só o de 140 e o novo
@@ -0,0 +1,31 @@
+import json
+
+from armazem import EventStore
+from busca import SearchIndex
+from mapeado import abrir_mapeado, salvar_mapeado
+
+
+def test_arquivo_mapeado_devolve_o_mesmo_store(tmp_path, eventos):
+    caminho = str(tmp_path / 'dados.mmap')
+    store = EventStore(eventos)
+    origem = [['eventos.json', 123, 456]]
+
+    salvar_mapeado(caminho, store, ['axe', 'samba'], origem)
+    mapeado = abrir_mapeado(caminho)
+
+    assert mapeado['estilos'] == ['axe', 'samba'] and mapeado['origem'] == origem
+    relido = mapeado['store']
+    assert [json.dumps(dict(e)) for e in relido] == [json.dumps(dict(e)) for e in store]
+    assert [relido.dt(i) for i in range(len(relido))] == [store.dt(i) for i in range(len(store))]
+
+    indice = SearchIndex(store)
+    for termo in ('leao', 'ba', 'ensaio da', 'praca sete', 'nada disso'):
+        assert relido.indice_busca.contem(termo) == indice.contem(termo)
+    assert relido.indice_busca.prefixo('ba') == indice.prefixo('ba')
+
+
+def test_arquivo_ausente_ou_de_outro_formato(tmp_path):
+    assert abrir_mapeado(str(tmp_path / 'nao-existe.mmap')) is None
+    lixo = tmp_path / 'lixo.mmap'
+    lixo.write_bytes(b'isto nao e um snapshot')
+    assert abrir_mapeado(str(lixo)) is None
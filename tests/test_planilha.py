@@ -0,0 +1,20 @@
+import openpyxl
+
+from planilha import linhas_xlsx
+
+
+def test_links_ficam_na_linha_certa_quando_a_planilha_nao_comeca_em_a1(tmp_path):
+    caminho = str(tmp_path / 'ensaios.xlsx')
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws['B3'], ws['C3'] = 'BLOCO', 'VALOR'
+    for linha, (bloco, url) in enumerate([('Ensaio A', 'https://a'), ('Ensaio B', None), ('Ensaio C', 'https://c')], start=4):
+        ws.cell(linha, 2, bloco)
+        ws.cell(linha, 3, 'Ingressos')
+        if url: ws.cell(linha, 3).hyperlink = url
+    wb.save(caminho)
+
+    linhas = list(linhas_xlsx(caminho))
+
+    assert [valores[1] for valores, _ in linhas] == ['BLOCO', 'Ensaio A', 'Ensaio B', 'Ensaio C']
+    assert [links for _, links in linhas] == [{}, {2: 'https://a'}, {}, {2: 'https://c'}]